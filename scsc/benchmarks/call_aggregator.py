@@ -0,0 +1,114 @@
+"""
+Micro-benchmark of call tree extraction: the former recursive
+extraction against CallAggregator.add_trace.
+
+    poetry run python -m benchmarks.call_aggregator
+"""
+
+import random
+import timeit
+
+from scsc.traces.call_aggregator import CallAggregator
+
+CONTRACT = "0x000000000000000000000000000000000000c0de"
+
+
+def recursive_extract_all_subcalls(call, calls):
+    calls.append(
+        {"from": call["from"], "to": call["to"], "type": call["type"]}
+    )
+    for subcall in call.get("calls", []):
+        recursive_extract_all_subcalls(subcall, calls)
+
+
+def recursive_extract_calls(call, contract_address, calls):
+    if call["from"].lower() == contract_address.lower():
+        calls.append(
+            {"from": call["from"], "to": call["to"], "type": call["type"]}
+        )
+        for subcall in call.get("calls", []):
+            recursive_extract_all_subcalls(subcall, calls)
+    for subcall in call.get("calls", []):
+        recursive_extract_calls(subcall, contract_address, calls)
+
+
+def recursive_aggregate(traces):
+    calls = []
+    for trace in traces:
+        recursive_extract_calls(trace, CONTRACT, calls)
+    edges = {}
+    for c in calls:
+        types = edges.setdefault((c["from"], c["to"]), {})
+        types[c["type"]] = types.get(c["type"], 0) + 1
+    return edges
+
+
+def aggregator_aggregate(traces):
+    calls = CallAggregator()
+    for trace in traces:
+        calls.add_trace(trace, CONTRACT)
+    return calls
+
+
+def random_tree(rng, addresses, source, depth):
+    target = rng.choice(addresses)
+    call = {
+        "from": source,
+        "to": target,
+        "type": rng.choice(["CALL", "STATICCALL", "DELEGATECALL"]),
+        "gas": "0x5208",
+        "input": "0x" + "00" * 68,
+    }
+    if depth > 0:
+        call["calls"] = [
+            random_tree(rng, addresses, target, depth - 1)
+            for _ in range(rng.randint(1, 3))
+        ]
+    return call
+
+
+def main():
+    rng = random.Random(0)
+    addresses = [CONTRACT] + [f"0x{i:040x}" for i in range(1, 40)]
+    for depth in (4, 8):
+        # Transactions sent to the contract, as returned by trace_filter
+        traces = []
+        for _ in range(200):
+            trace = random_tree(rng, addresses, CONTRACT, depth)
+            traces.append(
+                {
+                    "from": "0x" + "e" * 40,
+                    "to": CONTRACT,
+                    "type": "CALL",
+                    "calls": [trace],
+                }
+            )
+        frames = sum(1 for _ in _frames(traces))
+        old = min(
+            timeit.repeat(
+                lambda traces=traces: recursive_aggregate(traces), number=5
+            )
+        )
+        new = min(
+            timeit.repeat(
+                lambda traces=traces: aggregator_aggregate(traces), number=5
+            )
+        )
+        print(
+            f"depth {depth}, {frames} frames: "
+            f"recursive {old / 5 * 1000:.1f} ms, "
+            f"aggregator {new / 5 * 1000:.1f} ms, "
+            f"speedup {old / new:.1f}x"
+        )
+
+
+def _frames(traces):
+    stack = list(traces)
+    while stack:
+        call = stack.pop()
+        yield call
+        stack.extend(call.get("calls", []))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark of trace requests through web3.py against RPCClient, both
+served recorded traces by a local JSON-RPC server.
+
+    poetry run python -m benchmarks.rpc_client [traces.json]
+
+traces.json is a JSON list of callTracer results, as recorded from a
+node. Without it, random traces are generated.
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from web3 import Web3
+
+from benchmarks.call_aggregator import CONTRACT, random_tree
+from scsc.traces import RPCClient
+from scsc.traces.call_aggregator import CallAggregator
+from scsc.traces.trace_collector import CALL_TRACER
+
+REQUESTS = 200
+
+
+def serve(traces):
+    """
+    Starts a JSON-RPC server answering debug_traceTransaction with the
+    recorded traces and trace_filter with one page of traces.
+    """
+    page = [
+        {
+            "action": {"from": CONTRACT, "to": "0x" + "1" * 40},
+            "blockNumber": i,
+            "transactionHash": "0x" + f"{i:064x}",
+            "type": "call",
+        }
+        for i in range(1000)
+    ]
+    # Pre-encoded results, so the server costs the same for both clients
+    results = {
+        "debug_traceTransaction": [json.dumps(t).encode() for t in traces],
+        "trace_filter": [json.dumps(page).encode()],
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(
+                self.rfile.read(int(self.headers["Content-Length"]))
+            )
+            recorded = results[request["method"]]
+            body = b'{"jsonrpc":"2.0","id":%d,"result":%s}' % (
+                request["id"],
+                recorded[request["id"] % len(recorded)],
+            )
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {elapsed * 1000:.0f} ms")
+    return elapsed
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            traces = json.load(f)
+    else:
+        rng = random.Random(0)
+        addresses = [CONTRACT] + [f"0x{i:040x}" for i in range(1, 40)]
+        traces = [random_tree(rng, addresses, CONTRACT, 6) for _ in range(20)]
+
+    server = serve(traces)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    w3 = Web3(Web3.HTTPProvider(url))
+    rpc = RPCClient(url)
+
+    def web3_traces():
+        calls = CallAggregator()
+        for i in range(REQUESTS):
+            trace = w3.geth.debug.trace_transaction(hex(i), CALL_TRACER)
+            calls.add_trace(trace, CONTRACT)
+
+    def rpc_traces():
+        calls = CallAggregator()
+        for i in range(REQUESTS):
+            trace = rpc.request(
+                "debug_traceTransaction", [hex(i), CALL_TRACER]
+            )
+            calls.add_trace(trace, CONTRACT)
+
+    # web3.py only accepts checksum addresses
+    trace_filter = {"fromAddress": [Web3.to_checksum_address(CONTRACT)]}
+
+    def web3_filter():
+        for _ in range(REQUESTS):
+            w3.tracing.trace_filter(trace_filter)
+
+    def rpc_filter():
+        for _ in range(REQUESTS):
+            rpc.request("trace_filter", [trace_filter])
+
+    for name, old, new in (
+        ("debug_traceTransaction", web3_traces, rpc_traces),
+        ("trace_filter", web3_filter, rpc_filter),
+    ):
+        print(f"{REQUESTS} {name} requests")
+        old_time = timed("  web3.py", old)
+        new_time = timed("  RPCClient", new)
+        print(f"  speedup {old_time / new_time:.1f}x")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Throughput benchmark of the "scan" collection mode, tracing every block
+with debug_traceBlockByNumber, against the "transaction" mode finding
+the matching transactions with trace_filter, and the "plan" mode picking
+one of the served modes, all served by a local JSON-RPC server emulating
+the node's tracing cost.
+
+    poetry run python -m benchmarks.scan [match_rate ...]
+
+match_rate is the fraction of transactions calling the contract, by
+default a sweep from sparse to dense contracts. Scanning costs the
+same whatever the rate, while the transaction mode traces fewer
+transactions the rarer the contract is called.
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.call_aggregator import CONTRACT, random_tree
+from scsc.traces import RPCClient, TraceCollector
+
+BLOCKS = 100
+TXS_PER_BLOCK = 100
+WORKERS = 8
+# Seconds the node spends per request, and per transaction it traces
+REQUEST_LATENCY = 0.005
+TRACE_COST = 0.0002
+# Seconds trace_filter spends per block, served from the trace index
+FILTER_COST = 0.00002
+
+
+def make_chain(rng, match_rate):
+    """
+    Returns the traces of each block, by transaction hash, and the
+    trace_filter results of the contract.
+    """
+    addresses = [CONTRACT] + [f"0x{i:040x}" for i in range(1, 40)]
+    others = addresses[1:]
+    blocks = {}
+    matches = []
+    for b in range(BLOCKS):
+        txs = {}
+        for i in range(TXS_PER_BLOCK):
+            tx_hash = f"0x{b * TXS_PER_BLOCK + i:064x}"
+            if rng.random() < match_rate:
+                txs[tx_hash] = random_tree(rng, addresses, CONTRACT, 4)
+                matches.append(
+                    {
+                        "action": {"from": CONTRACT, "to": others[0]},
+                        "blockNumber": b,
+                        "transactionHash": tx_hash,
+                        "type": "call",
+                    }
+                )
+            else:
+                txs[tx_hash] = random_tree(rng, others, others[0], 4)
+        blocks[b] = txs
+    return blocks, matches
+
+
+def serve(blocks, matches):
+    """
+    Starts a JSON-RPC server answering the requests of both modes,
+    sleeping REQUEST_LATENCY per request and TRACE_COST per traced
+    transaction.
+    """
+    traces = {h: t for txs in blocks.values() for h, t in txs.items()}
+
+    def answer(request):
+        method, params = request["method"], request["params"]
+        cost = REQUEST_LATENCY
+        if method == "trace_filter":
+            start = int(params[0]["fromBlock"], 16)
+            end = int(params[0]["toBlock"], 16)
+            cost += FILTER_COST * (end - start + 1)
+            result = [m for m in matches if start <= m["blockNumber"] <= end]
+            result = result[params[0].get("after", 0) :][
+                : params[0].get("count", len(result))
+            ]
+        elif method == "debug_traceTransaction":
+            cost += TRACE_COST
+            result = traces[params[0]]
+        elif method == "debug_traceBlockByNumber":
+            txs = blocks.get(int(params[0], 16), {})
+            cost += TRACE_COST * len(txs)
+            result = [{"txHash": h, "result": t} for h, t in txs.items()]
+        elif method == "eth_getBlockTransactionCountByNumber":
+            result = hex(len(blocks.get(int(params[0], 16), {})))
+        elif method == "trace_block":
+            error = {"code": -32601, "message": "method not found"}
+            return cost, {
+                "jsonrpc": "2.0",
+                "id": request["id"],
+                "error": error,
+            }
+        elif method == "eth_getCode":
+            result = "0x60806040"
+        else:
+            result = "bench/v1"
+        return cost, {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(
+                self.rfile.read(int(self.headers["Content-Length"]))
+            )
+            if isinstance(request, list):
+                answers = [answer(r) for r in request]
+                time.sleep(sum(cost for cost, _ in answers))
+                body = json.dumps([a for _, a in answers]).encode()
+            else:
+                cost, response = answer(request)
+                time.sleep(cost)
+                body = json.dumps(response).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def collect(url, mode):
+    collector = TraceCollector(
+        url, rpc=RPCClient(url, WORKERS), pool_size=WORKERS
+    )
+    start = time.perf_counter()
+    calls = collector.get_calls_from(
+        0, BLOCKS - 1, CONTRACT, max_workers=WORKERS, mode=mode
+    )
+    return time.perf_counter() - start, len(calls)
+
+
+def main():
+    rates = [float(r) for r in sys.argv[1:]] or [0.001, 0.01, 0.1, 0.5]
+    print(
+        f"{BLOCKS} blocks of {TXS_PER_BLOCK} transactions, "
+        f"{WORKERS} workers"
+    )
+    for rate in rates:
+        blocks, matches = make_chain(random.Random(0), rate)
+        server = serve(blocks, matches)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        print(f"match rate {rate}: {len(matches)} matching transactions")
+        times = {}
+        for mode in ("transaction", "scan", "plan"):
+            elapsed, edges = collect(url, mode)
+            times[mode] = elapsed
+            print(
+                f"  {mode}: {elapsed * 1000:.0f} ms, "
+                f"{BLOCKS / elapsed:.0f} blocks/s, {edges} edges"
+            )
+        print(
+            f"  scan/transaction time {times['scan'] / times['transaction']:.1f}x"
+        )
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
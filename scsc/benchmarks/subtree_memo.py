@@ -0,0 +1,181 @@
+"""
+Micro-benchmark of memoizing call subtrees across transactions: the
+edges below each call made by the contract are cached by the structure
+of the subtree, against walking every subtree with CallAggregator.
+
+    poetry run python -m benchmarks.subtree_memo
+
+A structural key has to visit every frame of the subtree, the same
+frames the walk visits, so a cache hit cannot be cheaper than the walk
+it replaces. The "key only" column is the cost of building the keys
+alone, without looking them up or applying any edges.
+"""
+
+import random
+import timeit
+
+from benchmarks.call_aggregator import CONTRACT, random_tree
+from scsc.traces.call_aggregator import CallAggregator
+
+SENDER = "0x" + "e" * 40
+ROUTER = "0x" + "a" * 40
+
+
+def subtree_key(call):
+    """
+    Returns the caller of a call and the (callee, call type, subcalls)
+    of every frame of its subtree in depth-first order, which determine
+    the edges of the subtree.
+    """
+    key = [call["from"]]
+    push = key.append
+    stack = [call]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        frame = pop()
+        subcalls = frame.get("calls")
+        if subcalls:
+            push((frame["to"], frame["type"], len(subcalls)))
+            extend(reversed(subcalls))
+        else:
+            push((frame["to"], frame["type"], 0))
+    return tuple(key)
+
+
+def contract_calls(trace):
+    """
+    Returns the calls made by the contract in a transaction, the top
+    calls of the subtrees CallAggregator walks.
+    """
+    calls = []
+    stack = [trace]
+    while stack:
+        call = stack.pop()
+        if call["from"] == CONTRACT:
+            calls.append(call)
+        else:
+            stack.extend(call.get("calls", []))
+    return calls
+
+
+def direct_aggregate(traces):
+    calls = CallAggregator()
+    for trace in traces:
+        calls.add_trace(trace, CONTRACT)
+    return calls
+
+
+def memoized_aggregate(traces, cache):
+    calls = CallAggregator()
+    for trace in traces:
+        for call in contract_calls(trace):
+            key = subtree_key(call)
+            contribution = cache.get(key)
+            if contribution is None:
+                part = CallAggregator()
+                part._add_subtree(call, CONTRACT, {})
+                contribution = cache[key] = [
+                    (edge, stats.types, stats.depth)
+                    for edge, stats in part.edges.items()
+                ]
+            for (source, target), types, depth in contribution:
+                for call_type, count in types.items():
+                    calls.add(source, target, call_type, count, depth)
+    return calls
+
+
+def keys_only(traces):
+    for trace in traces:
+        for call in contract_calls(trace):
+            subtree_key(call)
+
+
+def router_swaps(rng, n):
+    """
+    Swaps routed by the contract through one of a few pools: 5-frame
+    subtrees from a small set of shapes, as on DEX aggregators.
+    """
+    pools = [(f"0x{i:040x}", f"0x{i + 100:040x}") for i in range(1, 9)]
+    traces = []
+    for _ in range(n):
+        pool, token = rng.choice(pools)
+        swap = {
+            "from": CONTRACT,
+            "to": ROUTER,
+            "type": "CALL",
+            "calls": [
+                {
+                    "from": ROUTER,
+                    "to": pool,
+                    "type": "CALL",
+                    "calls": [
+                        {"from": pool, "to": token, "type": "CALL"},
+                        {"from": pool, "to": token, "type": "STATICCALL"},
+                    ],
+                },
+                {"from": ROUTER, "to": token, "type": "STATICCALL"},
+            ],
+        }
+        traces.append(
+            {"from": SENDER, "to": CONTRACT, "type": "CALL", "calls": [swap]}
+        )
+    return traces
+
+
+def unique_trees(rng, n, depth=6):
+    addresses = [CONTRACT] + [f"0x{i:040x}" for i in range(1, 40)]
+    return [
+        {
+            "from": SENDER,
+            "to": CONTRACT,
+            "type": "CALL",
+            "calls": [random_tree(rng, addresses, CONTRACT, depth)],
+        }
+        for _ in range(n)
+    ]
+
+
+def repeated_trees(rng, n, shapes=20, depth=4):
+    trees = unique_trees(rng, shapes, depth)
+    return [rng.choice(trees) for _ in range(n)]
+
+
+def main():
+    rng = random.Random(0)
+    workloads = {
+        "router swaps": router_swaps(rng, 5000),
+        "unique trees": unique_trees(rng, 200),
+        "repeated trees": repeated_trees(rng, 1000),
+    }
+    for name, traces in workloads.items():
+        cache = {}
+        assert (
+            memoized_aggregate(traces, cache).to_calls()
+            == direct_aggregate(traces).to_calls()
+        )
+        lookups = sum(len(contract_calls(t)) for t in traces)
+        direct = min(
+            timeit.repeat(
+                lambda traces=traces: direct_aggregate(traces), number=5
+            )
+        )
+        memoized = min(
+            timeit.repeat(
+                lambda traces=traces: memoized_aggregate(traces, {}),
+                number=5,
+            )
+        )
+        keys = min(
+            timeit.repeat(lambda traces=traces: keys_only(traces), number=5)
+        )
+        print(
+            f"{name}: hit rate {1 - len(cache) / lookups:.0%}, "
+            f"direct {direct / 5 * 1000:.1f} ms, "
+            f"memoized {memoized / 5 * 1000:.1f} ms, "
+            f"key only {keys / 5 * 1000:.1f} ms, "
+            f"speedup {direct / memoized:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,28 @@ import logging
 import click
 
 from cli.app import create_app
-from scsc.supply_chain import SupplyChain
+from scsc.graph import AnalysisState
+from scsc.supply_chain import (
+    CHECKPOINT_BLOCKS,
+    FOLLOW_POLL_INTERVAL,
+    SupplyChain,
+)
+from scsc.traces import (
+    CodeCache,
+    RetryPolicy,
+    RPCClient,
+    TokenBucket,
+    TraceCache,
+)
+from scsc.traces.rpc_client import orjson
+from scsc.traces.trace_collector import (
+    AUTO_MODE,
+    COLLECTION_MODES,
+    PLAN_MODE,
+    TRACERS,
+)
+from scsc.traces.trace_stream import ijson
+from scsc.utils import validate_and_convert_block
 
 
 @click.group()
@@ -17,7 +38,8 @@ def main():
     "--url",
     default="http://localhost:8545",
     type=str,
-    help="Ethereum node URL",
+    help="Ethereum node URL: http(s)://, ws(s):// or ipc:///path, or "
+    "several comma separated URLs to spread trace requests over",
 )
 @click.option("--address", required=True, type=str, help="Contract address")
 @click.option(
@@ -29,22 +51,203 @@ def main():
 @click.option("--export-dot", type=str, help="Export call graph to DOT file")
 @click.option("--export-json", type=str, help="Export call graph to JSON file")
 @click.option("--log-level", default="ERROR", type=str, help="Logging level")
+@click.option(
+    "--batch-size",
+    default=1,
+    type=int,
+    help="Transactions traced per JSON-RPC batch request",
+)
+@click.option(
+    "--workers",
+    default=1,
+    type=int,
+    help="Number of threads fetching transaction traces",
+)
+@click.option(
+    "--mode",
+    default=AUTO_MODE,
+    type=click.Choice((AUTO_MODE, PLAN_MODE, *COLLECTION_MODES)),
+    help="Trace each matching transaction or each matching block, fetch "
+    "the flat traces of each matching block, or scan every block on nodes "
+    "without trace_filter; auto probes the node, plan picks the cheapest "
+    "mode per sub-range",
+)
+@click.option(
+    "--cache",
+    type=str,
+    help="SQLite file caching finalized traces and contract code lookups",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Parse transaction traces incrementally, requires the stream "
+    "extra",
+)
+@click.option(
+    "--tracer",
+    default="call",
+    type=click.Choice(list(TRACERS)),
+    help="callTracer, or a minimal tracer returning only the call tree",
+)
+@click.option(
+    "--raw-rpc",
+    is_flag=True,
+    help="Send trace and code requests as raw JSON-RPC, bypassing web3.py, "
+    "requires the orjson extra",
+)
+@click.option(
+    "--trace-rate",
+    type=float,
+    help="Maximum trace requests per second",
+)
+@click.option(
+    "--state-rate",
+    type=float,
+    help="Maximum state requests, such as eth_getCode, per second",
+)
+@click.option(
+    "--retries",
+    default=3,
+    type=int,
+    help="Retries of node requests failing with transient errors",
+)
+@click.option(
+    "--endpoint-stats",
+    is_flag=True,
+    help="Print request counts, latencies and hedges per node endpoint",
+)
+@click.option(
+    "--resume",
+    type=str,
+    help="SQLite file holding the analysis state, only blocks not "
+    "processed yet are collected",
+)
+@click.option(
+    "--checkpoint-blocks",
+    default=CHECKPOINT_BLOCKS,
+    type=int,
+    help="Blocks collected between two checkpoints of the analysis state",
+)
+@click.option(
+    "--follow",
+    is_flag=True,
+    help="Keep collecting the calls of new blocks after to-block, "
+    "printing new dependencies, until interrupted",
+)
+@click.option(
+    "--poll-interval",
+    default=FOLLOW_POLL_INTERVAL,
+    type=float,
+    help="Seconds between two polls for new blocks when following",
+)
+@click.option(
+    "--estimate",
+    is_flag=True,
+    help="Print the collection plan of the range and its expected trace "
+    "requests, without collecting",
+)
 def analyze(
-    url, address, from_block, to_block, export_dot, export_json, log_level
+    url,
+    address,
+    from_block,
+    to_block,
+    export_dot,
+    export_json,
+    log_level,
+    batch_size,
+    workers,
+    mode,
+    cache,
+    stream,
+    tracer,
+    raw_rpc,
+    trace_rate,
+    state_rate,
+    retries,
+    endpoint_stats,
+    resume,
+    checkpoint_blocks,
+    follow,
+    poll_interval,
+    estimate,
 ):
     """Analyze contract calls and generate dependency graph"""
     logging.basicConfig(level=log_level.upper())
     logger = logging.getLogger(__name__)
+    if stream and ijson is None:
+        raise click.UsageError("--stream needs ijson, install scsc[stream].")
+    if raw_rpc and orjson is None:
+        raise click.UsageError("--raw-rpc needs orjson, install scsc[orjson].")
 
+    trace_cache = code_cache = state = None
     try:
-        supply_chain = SupplyChain(url, address)
-        supply_chain.collect_calls(from_block, to_block)
+        trace_cache = TraceCache(cache) if cache else None
+        code_cache = CodeCache(cache) if cache else None
+        # One pooled connection per worker thread
+        pool_size = max(workers, 1)
+        rpc = RPCClient(url, pool_size) if raw_rpc else None
+        rate_limits = {}
+        if trace_rate:
+            rate_limits["trace"] = TokenBucket(trace_rate)
+        if state_rate:
+            rate_limits["state"] = TokenBucket(state_rate)
+        state = AnalysisState(resume) if resume else None
+        supply_chain = SupplyChain(
+            url,
+            address,
+            trace_cache,
+            code_cache,
+            tracer,
+            rpc,
+            pool_size,
+            rate_limits,
+            RetryPolicy(retries),
+            state,
+        )
+        if estimate:
+            _print_estimate(
+                supply_chain.estimate(
+                    from_block, to_block, batch_size, workers
+                )
+            )
+            return
+        supply_chain.collect_calls(
+            from_block,
+            to_block,
+            batch_size,
+            workers,
+            mode,
+            stream,
+            checkpoint_blocks,
+        )
+        if follow:
+            _follow(
+                supply_chain,
+                int(validate_and_convert_block(to_block), 16) + 1,
+                poll_interval,
+                batch_size,
+                workers,
+                mode,
+                stream,
+            )
 
         print(f"Contract address: {address}")
         print("Called addresses:")
         for dep in supply_chain.get_all_dependencies():
             print(dep)
         print(f"Total addresses: {len(supply_chain.get_all_dependencies())}")
+        failed = supply_chain.get_failed_transactions()
+        if failed:
+            print(f"Failed transactions: {len(failed)}")
+        if endpoint_stats:
+            for stats in supply_chain.get_endpoint_stats():
+                print(
+                    f"{stats['url']}: {stats['requests']} requests, "
+                    f"{stats['errors']} errors, "
+                    f"p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, "
+                    f"{stats['hedge_wins']}/{stats['hedges']} hedges won, "
+                    f"{'healthy' if stats['healthy'] else 'unhealthy'}"
+                )
 
         if export_dot:
             supply_chain.export_dot(export_dot)
@@ -55,6 +258,57 @@ def analyze(
             logger.info(f"Call graph exported to JSON file: {export_json}")
     except Exception as e:
         logger.error(f"analyze: {e}")
+    finally:
+        # Closing the trace cache writes the access times of its hits
+        for store in (trace_cache, code_cache, state):
+            if store is not None:
+                store.close()
+
+
+def _print_estimate(estimate):
+    """
+    Prints the segments of a collection plan and its totals.
+    """
+    for segment in estimate["segments"]:
+        print(
+            f"Blocks {segment['from_block']}-{segment['to_block']}: "
+            f"{segment['mode']}, {segment['requests']} requests, "
+            f"{segment['traced_txs']} traced transactions"
+        )
+    if estimate["matching_txs"] is not None:
+        print(f"Matching transactions: {estimate['matching_txs']}")
+    print(
+        f"Expected requests: {estimate['requests']} "
+        f"(cost {estimate['cost']})"
+    )
+    for mode, cost in estimate["modes"].items():
+        print(
+            f"  {mode} only: {cost['requests']} requests "
+            f"(cost {cost['cost']})"
+        )
+
+
+def _follow(supply_chain, from_block, poll_interval, *args):
+    """
+    Prints the new dependencies found in new blocks until interrupted.
+    """
+    print(f"Following blocks from {from_block}, press Ctrl-C to stop.")
+    try:
+        for event in supply_chain.follow(from_block, poll_interval, *args):
+            blocks = f"{event['from_block']}-{event['to_block']}"
+            for edge in event["new_edges"]:
+                new = edge["to"] in event["new_dependencies"]
+                print(
+                    f"Blocks {blocks}: {'new dependency' if new else 'new edge'}"
+                    f" {edge['from']} -> {edge['to']}"
+                )
+            for edge in event["removed_edges"]:
+                print(
+                    f"Blocks {blocks}: edge removed by a reorg"
+                    f" {edge['from']} -> {edge['to']}"
+                )
+    except KeyboardInterrupt:
+        print("Stopped following.")
 
 
 @main.command(name="web")
@@ -62,7 +316,7 @@ def analyze(
     "--url",
     default="http://localhost:8545",
     type=str,
-    help="Ethereum node URL",
+    help="Ethereum node URL: http(s)://, ws(s):// or ipc:///path",
 )
 @click.option("--address", required=True, type=str, help="Contract address")
 @click.option(
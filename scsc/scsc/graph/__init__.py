@@ -1,3 +1,5 @@
+from scsc.graph.analysis_state import AnalysisState
+from scsc.graph.block_deltas import BlockDeltas
 from scsc.graph.call_graph import CallGraph
 
-__all__ = ["CallGraph"]
+__all__ = ["CallGraph", "AnalysisState", "BlockDeltas"]
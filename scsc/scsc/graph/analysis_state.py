@@ -0,0 +1,153 @@
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class AnalysisState:
+    """
+    Persistent SQLite state of incremental analyses, per contract: the
+    aggregated call edges, the transactions that could not be traced,
+    and the block ranges processed so far.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes the AnalysisState.
+        Args:
+            path: SQLite database file
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS block_ranges ("
+            "contract TEXT NOT NULL, first_block INTEGER NOT NULL, "
+            "last_block INTEGER NOT NULL, "
+            "PRIMARY KEY (contract, first_block))"
+        )
+        # States saved before disjoint ranges were kept hold a single
+        # range per contract
+        if self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+            "AND name = 'ranges'"
+        ).fetchone():
+            self._db.execute(
+                "INSERT OR IGNORE INTO block_ranges "
+                "SELECT contract, first_block, last_block FROM ranges"
+            )
+            self._db.execute("DROP TABLE ranges")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS edges ("
+            "contract TEXT NOT NULL, source TEXT NOT NULL, "
+            "target TEXT NOT NULL, type TEXT NOT NULL, "
+            "count INTEGER NOT NULL, "
+            "PRIMARY KEY (contract, source, target, type))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS failed_txs ("
+            "contract TEXT NOT NULL, tx_hash TEXT NOT NULL, "
+            "PRIMARY KEY (contract, tx_hash))"
+        )
+        self._db.commit()
+
+    def processed_ranges(self, contract: str) -> List[Tuple[int, int]]:
+        """
+        Returns the (first, last) block ranges processed for a contract,
+        disjoint and in block order, empty if no block was processed yet.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT first_block, last_block FROM block_ranges "
+                "WHERE contract = ? ORDER BY first_block",
+                (contract.lower(),),
+            ).fetchall()
+        return [(first, last) for first, last in rows]
+
+    def edges(self, contract: str) -> List[Tuple[str, str, str, int]]:
+        """
+        Returns the (source, target, type, count) edges aggregated for a
+        contract.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT source, target, type, count FROM edges "
+                "WHERE contract = ? ORDER BY source, target, type",
+                (contract.lower(),),
+            ).fetchall()
+
+    def failed_transactions(self, contract: str) -> Set[str]:
+        """
+        Returns the transactions of a contract that could not be traced.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT tx_hash FROM failed_txs WHERE contract = ?",
+                (contract.lower(),),
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def checkpoint(
+        self,
+        contract: str,
+        first_block: int,
+        last_block: int,
+        calls: List[Dict],
+        failed_txs: Iterable[str] = (),
+    ) -> None:
+        """
+        Adds the calls and failed transactions of the newly processed
+        blocks first_block-last_block and adds these blocks to the
+        processed ranges, merged with the ranges they overlap or touch.
+        This runs in a single transaction so that an interrupted run
+        resumes from the last checkpoint.
+        Args:
+            contract: Analyzed contract address
+            first_block: First newly processed block
+            last_block: Last newly processed block
+            calls: New edges, as returned by TraceCollector.get_calls_from
+            failed_txs: New transactions that could not be traced
+        """
+        contract = contract.lower()
+        edges = [
+            (contract, c["from"], c["to"], call_type, count)
+            for c in calls
+            for call_type, count in c["types"].items()
+        ]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO edges VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (contract, source, target, type) "
+                "DO UPDATE SET count = count + excluded.count",
+                edges,
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO failed_txs VALUES (?, ?)",
+                [(contract, tx_hash) for tx_hash in failed_txs],
+            )
+            first, last = self._db.execute(
+                "SELECT MIN(first_block), MAX(last_block) FROM block_ranges "
+                "WHERE contract = ? AND first_block <= ? AND last_block >= ?",
+                (contract, last_block + 1, first_block - 1),
+            ).fetchone()
+            first = first_block if first is None else min(first, first_block)
+            last = last_block if last is None else max(last, last_block)
+            self._db.execute(
+                "DELETE FROM block_ranges "
+                "WHERE contract = ? AND first_block BETWEEN ? AND ?",
+                (contract, first, last),
+            )
+            self._db.execute(
+                "INSERT INTO block_ranges VALUES (?, ?, ?)",
+                (contract, first, last),
+            )
+        self.logger.info(
+            f"Checkpointed blocks {first_block}-{last_block} of {contract}."
+        )
+
+    def close(self) -> None:
+        """
+        Closes the underlying database.
+        """
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,102 @@
+from typing import Dict, List, Set
+
+# Blocks behind the head after which a block is considered final
+FINALITY_DEPTH = 64
+
+
+class BlockDelta:
+    """
+    Edge contributions of one block to a call graph.
+    """
+
+    __slots__ = ("number", "block_hash", "parent_hash", "calls", "failed_txs")
+
+    def __init__(
+        self,
+        number: int,
+        block_hash: str,
+        parent_hash: str,
+        calls: List[Dict],
+        failed_txs: Set[str],
+    ):
+        self.number = number
+        self.block_hash = block_hash
+        self.parent_hash = parent_hash
+        self.calls = calls
+        self.failed_txs = failed_txs
+
+
+class BlockDeltas:
+    """
+    Edge contributions of the unfinalized blocks, keyed by block hash,
+    so that the contributions of blocks orphaned by a reorg can be
+    rolled back. Blocks are added in chain order, and compacted away
+    once they are finality_depth blocks behind the head.
+    """
+
+    def __init__(self, finality_depth: int = FINALITY_DEPTH):
+        self.finality_depth = finality_depth
+        self._deltas: Dict[str, BlockDelta] = {}
+        self._hashes: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._deltas)
+
+    def __contains__(self, block_hash: str) -> bool:
+        return block_hash in self._deltas
+
+    @property
+    def tip(self) -> int | None:
+        """
+        Returns the number of the latest block, or None when empty.
+        """
+        return max(self._hashes) if self._hashes else None
+
+    def block_hash(self, number: int) -> str | None:
+        return self._hashes.get(number)
+
+    def extends(self, number: int, parent_hash: str) -> bool:
+        """
+        Returns whether block number with parent_hash extends the chain
+        of the recorded blocks, which is false after a reorg.
+        """
+        previous = self._hashes.get(number - 1)
+        return previous is None or previous == parent_hash
+
+    def add(self, delta: BlockDelta) -> None:
+        """
+        Records the contributions of the block after the tip.
+        Raises:
+            ValueError: If the block does not follow the tip
+        """
+        tip = self.tip
+        if tip is not None and delta.number != tip + 1:
+            raise ValueError(
+                f"Block {delta.number} does not follow block {tip}."
+            )
+        self._deltas[delta.block_hash] = delta
+        self._hashes[delta.number] = delta.block_hash
+
+    def rollback(self, number: int) -> List[BlockDelta]:
+        """
+        Removes the blocks after block number and returns them, newest
+        first, for their contributions to be undone.
+        """
+        removed = []
+        for n in sorted(self._hashes, reverse=True):
+            if n <= number:
+                break
+            removed.append(self._deltas.pop(self._hashes.pop(n)))
+        return removed
+
+    def compact(self, head: int) -> List[BlockDelta]:
+        """
+        Removes the blocks that are final at head and returns them,
+        oldest first.
+        """
+        compacted = []
+        for n in sorted(self._hashes):
+            if n > head - self.finality_depth:
+                break
+            compacted.append(self._deltas.pop(self._hashes.pop(n)))
+        return compacted
@@ -17,22 +17,51 @@ class CallGraph:
         self.G = nx.DiGraph()
         self.contract_address = contract_address
 
-    def _add_labeled_edge(self, u, v, label):
+    def _add_labeled_edge(self, u, v, label, count=1):
         if self.G.has_edge(u, v):
             # If edge already exists, update the label count
             types = self.G[u][v].setdefault("types", {})
-            types[label] = types.get(label, 0) + 1
+            types[label] = types.get(label, 0) + count
         else:
             # New edge with initial label count
-            self.G.add_edge(u, v, types={label: 1})
+            self.G.add_edge(u, v, types={label: count})
 
     def add_call(
-        self, from_address: str, to_address: str, call_type: str
+        self,
+        from_address: str,
+        to_address: str,
+        call_type: str,
+        count: int = 1,
     ) -> None:
         """
-        Adds a call edge to the graph.
+        Adds a call edge to the graph, counting count calls of call_type.
         """
-        self._add_labeled_edge(from_address, to_address, call_type)
+        self._add_labeled_edge(from_address, to_address, call_type, count)
+
+    def remove_call(
+        self,
+        from_address: str,
+        to_address: str,
+        call_type: str,
+        count: int = 1,
+    ) -> None:
+        """
+        Removes count calls of call_type from an edge, undoing add_call.
+        Edges without calls left are removed, and so are the contracts
+        left without edges.
+        """
+        if not self.G.has_edge(from_address, to_address):
+            return
+        types = self.G[from_address][to_address].setdefault("types", {})
+        types[call_type] = types.get(call_type, 0) - count
+        if types[call_type] <= 0:
+            del types[call_type]
+        if types:
+            return
+        self.G.remove_edge(from_address, to_address)
+        for address in {from_address, to_address}:
+            if self.G.degree(address) == 0:
+                self.G.remove_node(address)
 
     def get_all_contracts(self) -> List[str]:
         """
@@ -1,9 +1,26 @@
 import logging
+import time
+from typing import Any, Dict, Iterator, List, Tuple
 
-from scsc.graph import CallGraph
-from scsc.traces import TraceCollector
+from scsc.graph import AnalysisState, CallGraph
+from scsc.graph.block_deltas import FINALITY_DEPTH, BlockDelta, BlockDeltas
+from scsc.traces import (
+    AsyncTraceCollector,
+    CodeCache,
+    RetryPolicy,
+    RPCClient,
+    TokenBucket,
+    TraceCache,
+    TraceCollector,
+)
+from scsc.traces.call_aggregator import CallAggregator
 from scsc.utils import validate_and_convert_address, validate_and_convert_block
 
+# Blocks collected between two checkpoints of a persisted analysis state
+CHECKPOINT_BLOCKS = 1000
+# Seconds between two polls for new blocks in follow mode
+FOLLOW_POLL_INTERVAL = 12.0
+
 
 class SupplyChain:
     """
@@ -11,14 +28,49 @@ class SupplyChain:
     and processes call data from a blockchain.
     """
 
-    def __init__(self, url: str, contract_address: str):
+    def __init__(
+        self,
+        url: str,
+        contract_address: str,
+        cache: TraceCache | None = None,
+        code_cache: CodeCache | None = None,
+        tracer: str = "call",
+        rpc: RPCClient | None = None,
+        pool_size: int = 10,
+        rate_limits: Dict[str, TokenBucket] | None = None,
+        retry: RetryPolicy | None = None,
+        state: AnalysisState | None = None,
+    ):
         """
-        Initializes the SupplyChain with a URL and contract address.
+        Initializes the SupplyChain with a URL and contract address,
+        optional trace and contract code caches, and the tracer asked
+        for transaction traces ("call" or "minimal"). Given an RPCClient,
+        trace and code requests bypass web3.py. The URL scheme selects
+        the transport, see make_provider, and pool_size bounds the HTTP
+        connections kept alive. rate_limits and retry shape the node
+        requests, see TraceCollector. Given an AnalysisState, the call
+        graph starts from the persisted edges and collect_calls only
+        processes blocks that were not processed yet.
         """
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.tc = TraceCollector(url)
+        self.url = url
+        self.tc = TraceCollector(
+            url,
+            cache,
+            code_cache,
+            tracer,
+            rpc,
+            pool_size,
+            rate_limits,
+            retry,
+        )
+        # Transactions whose calls are missing from the graph
+        self.failed_txs = set()
         contract_address = validate_and_convert_address(contract_address)
         self.cg = CallGraph(contract_address)
+        self.state = state
+        if state is not None:
+            self._load_state()
         self.logger.info(
             f"Initialized SupplyChain for contract {contract_address}."
         )
@@ -47,16 +99,32 @@ class SupplyChain:
             "n_nodes": len(self.cg.get_all_contracts()),
             "nodes": self.cg.get_all_contracts(),
             "edges": edges,
+            "n_failed_transactions": len(self.failed_txs),
         }
 
     def collect_calls(
-        self, from_block: str | int, to_block: str | int
+        self,
+        from_block: str | int,
+        to_block: str | int,
+        batch_size: int = 1,
+        max_workers: int = 1,
+        mode: str = "transaction",
+        stream: bool = False,
+        checkpoint_blocks: int = CHECKPOINT_BLOCKS,
     ) -> None:
         """
         Collects calls from the blockchain and adds them to the call graph.
+        With an analysis state, only the blocks outside its processed
+        ranges are collected, checkpointing every checkpoint_blocks.
         Args:
             from_block: Block number in decimal or hex format
             to_block: Block number in decimal or hex format
+            batch_size: Number of transactions traced per JSON-RPC batch
+            max_workers: Number of threads fetching traces
+            mode: "transaction", "block", "scan" or "flat" tracing,
+                "auto", or "plan" to pick the cheapest per sub-range
+            stream: Parse transaction traces as they arrive
+            checkpoint_blocks: Blocks collected between checkpoints
         Raises:
             ValueError: If from_block is greater than to_block
         """
@@ -71,12 +139,459 @@ class SupplyChain:
                 f"from_block ({from_block}) must be less than or equal to to_block ({to_block})"
             )
 
+        self._collect(
+            from_block_hex,
+            to_block_hex,
+            batch_size,
+            max_workers,
+            mode,
+            stream,
+            checkpoint_blocks,
+        )
+
+    def _collect(
+        self,
+        from_block_hex: str,
+        to_block_hex: str,
+        batch_size: int,
+        max_workers: int,
+        mode: str,
+        stream: bool,
+        checkpoint_blocks: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Collects calls of a validated block range, see collect_calls,
+        and returns the edges that were not in the call graph before.
+        """
+        if self.state is None:
+            calls = self.tc.get_calls_from(
+                from_block_hex,
+                to_block_hex,
+                self.cg.contract_address,
+                batch_size,
+                max_workers,
+                mode,
+                stream,
+            )
+            new_edges = self._add_calls(calls)
+            self._record_failures(self.tc.failed_txs)
+            return new_edges
+
+        new_edges = []
+        processed = self.state.processed_ranges(self.cg.contract_address)
+        for chunk in self._pending_chunks(
+            int(from_block_hex, 16),
+            int(to_block_hex, 16),
+            processed,
+            checkpoint_blocks,
+        ):
+            calls = self.tc.get_calls_from(
+                hex(chunk[0]),
+                hex(chunk[1]),
+                self.cg.contract_address,
+                batch_size,
+                max_workers,
+                mode,
+                stream,
+                to_block_hex,
+            )
+            new_edges += self._add_calls(calls)
+            failed = self.tc.failed_txs - self.failed_txs
+            self._record_failures(self.tc.failed_txs)
+            self.state.checkpoint(
+                self.cg.contract_address, *chunk, calls, failed
+            )
+        return new_edges
+
+    def follow(
+        self,
+        from_block: str | int | None = None,
+        poll_interval: float = FOLLOW_POLL_INTERVAL,
+        batch_size: int = 1,
+        max_workers: int = 1,
+        mode: str = "transaction",
+        stream: bool = False,
+        finality_depth: int = FINALITY_DEPTH,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Follows the chain head, collecting the calls of each new block
+        into the call graph. Yields a delta event whenever edges appear
+        or disappear: the block range processed, the new edges, the new
+        dependencies among their callees, the edges removed by a reorg
+        and the number of orphaned blocks. Runs until the caller stops
+        iterating.
+
+        The contributions of the blocks less than finality_depth behind
+        the head are kept per block, so that those of blocks orphaned by
+        a reorg are rolled back before the canonical blocks are replayed.
+        With an analysis state, blocks are checkpointed once final.
+        Args:
+            from_block: First block to follow, by default the block after
+                the last processed range of the analysis state, or the next
+                block to be mined. Blocks the state already covers are
+                skipped
+            poll_interval: Seconds between two polls for new blocks
+            batch_size: Number of transactions traced per JSON-RPC batch
+            max_workers: Number of threads fetching traces
+            mode: "transaction", "block", "scan" or "flat" tracing,
+                "auto", or "plan" to pick the cheapest per sub-range
+            stream: Parse transaction traces as they arrive
+            finality_depth: Blocks behind the head after which a block
+                cannot be reorged anymore
+        Raises:
+            ValueError: If the analysis state holds blocks processed
+                after from_block
+        """
+        processed = []
+        if self.state is not None:
+            processed = self.state.processed_ranges(self.cg.contract_address)
+        if from_block is not None:
+            next_block = int(validate_and_convert_block(from_block), 16)
+        elif processed:
+            next_block = processed[-1][1] + 1
+        else:
+            next_block = self.tc.block_number() + 1
+        for first, last in processed:
+            if first <= next_block <= last:
+                # Already in the call graph, counting them again would
+                # double their calls
+                self.logger.info(
+                    f"Blocks {first}-{last} are already processed, "
+                    f"following from block {last + 1}."
+                )
+                next_block = last + 1
+        if processed and processed[-1][0] > next_block:
+            raise ValueError(
+                f"Blocks {processed[-1][0]}-{processed[-1][1]} after "
+                f"from_block ({from_block}) are already processed, follow "
+                f"from block {processed[-1][1] + 1} or collect the blocks "
+                "before them with collect_calls."
+            )
+        if processed and next_block > processed[-1][1] + 1:
+            self.logger.warning(
+                f"Blocks {processed[-1][1] + 1}-{next_block - 1} are not "
+                "collected, the analysis state keeps them unprocessed."
+            )
+        self.logger.info(f"Following the chain from block {next_block}.")
+        deltas = BlockDeltas(finality_depth)
+        args = (batch_size, max_workers, mode, stream)
+
+        while True:
+            head = self.tc.block_number()
+            # A reorg may replace the tip without the head moving
+            orphaned = self._rollback_reorg(deltas, deltas.tip)
+            if orphaned:
+                next_block = orphaned[-1].number
+            elif head < next_block:
+                time.sleep(poll_interval)
+                continue
+            start = next_block
+            known = set(self.cg.get_all_contracts())
+            known.add(self.cg.contract_address)
+
+            new_edges = []
+            self._compact(deltas, head)
+            final_block = head - finality_depth
+            if next_block <= final_block:
+                # Final blocks cannot be reorged, collect them at once
+                new_edges += self._collect(
+                    hex(next_block),
+                    hex(final_block),
+                    *args,
+                    CHECKPOINT_BLOCKS,
+                )
+                next_block = final_block + 1
+            while next_block <= head:
+                block_hash, parent_hash = self.tc.block_hashes(next_block)
+                if not deltas.extends(next_block, parent_hash):
+                    removed = self._rollback_reorg(deltas, next_block - 1)
+                    orphaned += removed
+                    if removed:
+                        next_block = removed[-1].number
+                    continue
+                new_edges += self._ingest_block(
+                    deltas, next_block, block_hash, parent_hash, args
+                )
+                next_block += 1
+
+            # Edges of orphaned blocks replayed on the canonical chain
+            # are neither new nor removed
+            touched = {(c["from"], c["to"]) for d in orphaned for c in d.calls}
+            new_edges = [
+                c for c in new_edges if (c["from"], c["to"]) not in touched
+            ]
+            removed_edges = [
+                {"from": u, "to": v}
+                for u, v in sorted(touched)
+                if not self.cg.G.has_edge(u, v)
+            ]
+            if new_edges or removed_edges:
+                new_dependencies = []
+                for edge in new_edges:
+                    if edge["to"] not in known:
+                        known.add(edge["to"])
+                        new_dependencies.append(edge["to"])
+                yield {
+                    "from_block": start,
+                    "to_block": head,
+                    "new_edges": new_edges,
+                    "new_dependencies": new_dependencies,
+                    "removed_edges": removed_edges,
+                    "orphaned_blocks": len(orphaned),
+                }
+
+    def _ingest_block(
+        self,
+        deltas: BlockDeltas,
+        number: int,
+        block_hash: str,
+        parent_hash: str,
+        args: Tuple,
+    ) -> List[Dict[str, Any]]:
+        """
+        Collects the calls of an unfinalized block, recording its edge
+        contributions, and returns the new edges.
+        """
         calls = self.tc.get_calls_from(
-            from_block_hex, to_block_hex, self.cg.contract_address
+            hex(number), hex(number), self.cg.contract_address, *args
+        )
+        failed = self.tc.failed_txs - self.failed_txs
+        self._record_failures(self.tc.failed_txs)
+        deltas.add(BlockDelta(number, block_hash, parent_hash, calls, failed))
+        return self._add_calls(calls)
+
+    def _rollback_reorg(
+        self, deltas: BlockDeltas, number: int | None
+    ) -> List[BlockDelta]:
+        """
+        Walks back from block number to the last recorded block still
+        on the canonical chain, undoing the contributions of the blocks
+        after it. Returns the orphaned blocks, newest first.
+        """
+        if number is None:
+            return []
+        while deltas.block_hash(number) is not None:
+            if self.tc.block_hashes(number)[0] == deltas.block_hash(number):
+                break
+            number -= 1
+        orphaned = deltas.rollback(number)
+        for delta in orphaned:
+            for c in delta.calls:
+                for call_type, count in c["types"].items():
+                    self.cg.remove_call(c["from"], c["to"], call_type, count)
+        if orphaned:
+            self.logger.warning(
+                f"Reorg: rolled back blocks {orphaned[-1].number}-"
+                f"{orphaned[0].number}."
+            )
+        return orphaned
+
+    def _compact(self, deltas: BlockDeltas, head: int) -> None:
+        """
+        Drops the edge contributions of the blocks final at head,
+        checkpointing them to the analysis state.
+        """
+        compacted = deltas.compact(head)
+        if not compacted or self.state is None:
+            return
+        self.state.checkpoint(
+            self.cg.contract_address,
+            compacted[0].number,
+            compacted[-1].number,
+            [c for d in compacted for c in d.calls],
+            set().union(*(d.failed_txs for d in compacted)),
         )
+
+    @staticmethod
+    def _pending_chunks(
+        start: int,
+        end: int,
+        processed: List[Tuple[int, int]],
+        chunk_size: int,
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Yields the chunks of start-end left to process, in block order:
+        the blocks outside the processed ranges, split every chunk_size
+        blocks. Blocks outside start-end are never collected, so the
+        processed ranges may be disjoint.
+        """
+        block = start
+        for first, last in processed + [(end + 1, end + 1)]:
+            while block < min(first, end + 1):
+                high = min(first - 1, end, block + chunk_size - 1)
+                yield block, high
+                block = high + 1
+            block = max(block, last + 1)
+            if block > end:
+                return
+
+    def _load_state(self) -> None:
+        contract = self.cg.contract_address
+        edges = self.state.edges(contract)
+        # States saved before addresses were normalized may hold the
+        # same edge in lowercase and in checksum form
+        calls = CallAggregator()
+        for source, target, call_type, count in edges:
+            calls.add(source, target, call_type, count)
+        self._add_calls(calls.to_calls())
+        self.failed_txs |= self.state.failed_transactions(contract)
+        processed = self.state.processed_ranges(contract)
+        if processed:
+            blocks = ", ".join(f"{first}-{last}" for first, last in processed)
+            self.logger.info(
+                f"Resuming with {len(edges)} edges from blocks {blocks}."
+            )
+
+    def _add_calls(
+        self, calls: List[Dict], cg: CallGraph | None = None
+    ) -> List[Dict]:
+        """
+        Adds calls to a call graph, this supply chain's by default, and
+        returns those whose edge was not in it yet.
+        """
+        if cg is None:
+            cg = self.cg
+        new_edges = [c for c in calls if not cg.G.has_edge(c["from"], c["to"])]
         for c in calls:
-            self.cg.add_call(c["from"], c["to"], c["type"])
-        self.logger.info(f"Collected {len(calls)} calls.")
+            for call_type, count in c["types"].items():
+                cg.add_call(c["from"], c["to"], call_type, count)
+        self.logger.info(f"Collected {len(calls)} edges.")
+        return new_edges
+
+    def collect_many(
+        self,
+        addresses: List[str],
+        from_block: str | int,
+        to_block: str | int,
+        batch_size: int = 1,
+        max_workers: int = 1,
+    ) -> Dict[str, CallGraph]:
+        """
+        Collects the calls of several contracts, such as those of a
+        protocol, in a single pass sharing the trace_filter request and
+        the transaction traces, see TraceCollector.get_calls_many.
+        The calls of this supply chain's contract, if among addresses,
+        are added to its call graph.
+        Args:
+            addresses: Contract addresses
+            from_block: Block number in decimal or hex format
+            to_block: Block number in decimal or hex format
+            batch_size: Number of transactions traced per JSON-RPC batch
+            max_workers: Number of threads fetching traces
+        Returns:
+            One call graph per contract, keyed by checksum address
+        Raises:
+            ValueError: If from_block is greater than to_block
+        """
+        self.logger.info(
+            f"Collecting calls of {len(addresses)} contracts from block "
+            f"{from_block} to {to_block}."
+        )
+        from_block_hex = validate_and_convert_block(from_block)
+        to_block_hex = validate_and_convert_block(to_block)
+
+        if int(from_block_hex, 16) > int(to_block_hex, 16):
+            raise ValueError(
+                f"from_block ({from_block}) must be less than or equal to to_block ({to_block})"
+            )
+
+        addresses = list(
+            dict.fromkeys(validate_and_convert_address(a) for a in addresses)
+        )
+        calls = self.tc.get_calls_many(
+            from_block_hex, to_block_hex, addresses, batch_size, max_workers
+        )
+        graphs = {}
+        for address in addresses:
+            if address == self.cg.contract_address:
+                graphs[address] = self.cg
+            else:
+                graphs[address] = CallGraph(address)
+            self._add_calls(calls[address], graphs[address])
+        self._record_failures(self.tc.failed_txs)
+        return graphs
+
+    async def collect_calls_async(
+        self,
+        from_block: str | int,
+        to_block: str | int,
+        max_concurrency: int = 10,
+    ) -> None:
+        """
+        Collects calls with an AsyncTraceCollector and adds them to the
+        call graph.
+        Args:
+            from_block: Block number in decimal or hex format
+            to_block: Block number in decimal or hex format
+            max_concurrency: Maximum number of node requests in flight
+        Raises:
+            ValueError: If from_block is greater than to_block
+        """
+        self.logger.info(
+            f"Collecting calls from block {from_block} to {to_block}."
+        )
+        from_block_hex = validate_and_convert_block(from_block)
+        to_block_hex = validate_and_convert_block(to_block)
+
+        if int(from_block_hex, 16) > int(to_block_hex, 16):
+            raise ValueError(
+                f"from_block ({from_block}) must be less than or equal to to_block ({to_block})"
+            )
+
+        atc = AsyncTraceCollector(self.url, max_concurrency)
+        await atc.connect()
+        calls = await atc.get_calls_from(
+            from_block_hex, to_block_hex, self.cg.contract_address
+        )
+        self._add_calls(calls)
+        self._record_failures(atc.failed_txs)
+
+    def _record_failures(self, failed_txs: set) -> None:
+        if failed_txs - self.failed_txs:
+            self.logger.warning(
+                f"{len(failed_txs - self.failed_txs)} transactions could "
+                "not be traced, their calls are missing."
+            )
+        self.failed_txs |= failed_txs
+
+    def get_failed_transactions(self) -> list:
+        """
+        Returns the transactions that could not be traced, even after
+        retries, so that their calls are missing from the call graph.
+        """
+        return sorted(self.failed_txs)
+
+    def get_endpoint_stats(self) -> list:
+        """
+        Returns the request counts, latencies, hedges and health of
+        each endpoint of a pooled node URL.
+        """
+        return self.tc.endpoint_stats()
+
+    def estimate(
+        self,
+        from_block: str | int,
+        to_block: str | int,
+        batch_size: int = 1,
+        max_workers: int = 1,
+    ) -> Dict[str, Any]:
+        """
+        Returns the plan the "plan" mode would follow to collect a block
+        range, with its expected trace requests, without tracing
+        anything, see TraceCollector.estimate.
+        Args:
+            from_block: Block number in decimal or hex format
+            to_block: Block number in decimal or hex format
+            batch_size: Number of transactions traced per JSON-RPC batch
+            max_workers: Number of threads sampling the range
+        """
+        return self.tc.estimate(
+            validate_and_convert_block(from_block),
+            validate_and_convert_block(to_block),
+            self.cg.contract_address,
+            batch_size,
+            max_workers,
+        )
 
     def get_all_dependencies(self) -> list:
         """
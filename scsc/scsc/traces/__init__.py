@@ -1,3 +1,16 @@
+from scsc.traces.async_trace_collector import AsyncTraceCollector
+from scsc.traces.code_cache import CodeCache
+from scsc.traces.rate_limit import RetryPolicy, TokenBucket
+from scsc.traces.rpc_client import RPCClient
+from scsc.traces.trace_cache import TraceCache
 from scsc.traces.trace_collector import TraceCollector
 
-__all__ = ["TraceCollector"]
+__all__ = [
+    "TraceCollector",
+    "AsyncTraceCollector",
+    "TraceCache",
+    "CodeCache",
+    "RPCClient",
+    "TokenBucket",
+    "RetryPolicy",
+]
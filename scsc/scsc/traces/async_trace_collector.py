@@ -0,0 +1,222 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Set
+
+from web3 import AsyncWeb3, Web3
+from web3.providers.persistent import PersistentConnectionProvider
+from web3.types import RPCEndpoint
+
+from scsc.traces.call_aggregator import CallAggregator
+from scsc.traces.trace_collector import (
+    TRACE_FILTER_CHUNK_SIZE,
+    TRACE_FILTER_PAGE_SIZE,
+    TraceCollector,
+)
+from scsc.utils import make_async_provider, validate_and_convert_block
+
+
+class AsyncTraceCollector:
+    """
+    Asynchronous counterpart of TraceCollector that keeps a bounded
+    number of node requests in flight.
+    """
+
+    # Call tree extraction does no I/O, so it is shared with TraceCollector
+    _extract_calls = TraceCollector._extract_calls
+    _tx_hash = staticmethod(TraceCollector._tx_hash)
+
+    def __init__(self, url: str, max_concurrency: int = 10):
+        """
+        Initializes the AsyncTraceCollector with a node URL, see
+        make_async_provider, and the maximum
+        number of concurrent debug_traceTransaction and eth_getCode requests.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.w3 = AsyncWeb3(make_async_provider(url))
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # Transactions that could not be traced
+        self.failed_txs: Set[str] = set()
+
+        # Reference bytecode for "x0" - this should be the actual bytecode
+        self.x0_bytecode = "x0"  # Replace with actual x0 bytecode
+
+    async def connect(self) -> None:
+        """
+        Opens persistent IPC and WebSocket connections and checks the
+        connection to the Ethereum node.
+        """
+        if isinstance(self.w3.provider, PersistentConnectionProvider):
+            await self.w3.provider.connect()
+        if not await self.w3.is_connected():
+            raise ConnectionError("Failed to connect to the Ethereum node.")
+        self.logger.info("Connected to the Ethereum node.")
+
+    async def _validate_contract(self, address: str, block: str) -> bool:
+        """
+        Validates contract address and checks if it's different from x0
+        """
+        if not Web3.is_address(address):
+            self.logger.error(f"Invalid contract address format: {address}")
+            return False
+
+        try:
+            async with self.semaphore:
+                code = await self.w3.eth.get_code(
+                    Web3.to_checksum_address(address), block_identifier=block
+                )
+            if len(code) == 0:
+                self.logger.error(f"No code at address: {address}")
+                return False
+
+            if code.hex() == self.x0_bytecode:
+                self.logger.info(f"Contract at {address} matches x0 contract")
+                return False
+
+            return True
+        except Exception as e:
+            self.logger.error(f"Error validating contract: {e}")
+            return False
+
+    async def _trace_filter_range(
+        self, start: int, end: int, addresses: List[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Gets the call traces of contracts in a block range, one page of
+        TRACE_FILTER_PAGE_SIZE traces at a time. The range is bisected
+        when the node fails to answer it, see TraceCollector.
+        """
+        traces = []
+        after = 0
+        while True:
+            filter_params = {
+                "fromBlock": hex(start),
+                "toBlock": hex(end),
+                "fromAddress": addresses,
+                "after": after,
+                "count": TRACE_FILTER_PAGE_SIZE,
+            }
+            try:
+                async with self.semaphore:
+                    page = await self.w3.manager.coro_request(
+                        RPCEndpoint("trace_filter"), [filter_params]
+                    )
+                page = page or []
+            except Exception as e:
+                if start == end:
+                    self.logger.error(f"Error filtering transactions: {e}")
+                    raise RuntimeError(
+                        f"trace_filter failed for block {start}."
+                    ) from e
+                mid = (start + end) // 2
+                self.logger.warning(
+                    f"trace_filter failed for blocks {start}-{end}, "
+                    f"splitting at {mid}: {e}"
+                )
+                # Pages fetched so far are covered again by the halves
+                halves = await asyncio.gather(
+                    self._trace_filter_range(start, mid, addresses),
+                    self._trace_filter_range(mid + 1, end, addresses),
+                )
+                return halves[0] + halves[1]
+            traces.extend(r for r in page if r["type"] == "call")
+            if len(page) < TRACE_FILTER_PAGE_SIZE:
+                return traces
+            after += TRACE_FILTER_PAGE_SIZE
+
+    async def _filter_txs_from(
+        self, from_block: str, to_block: str, contract_address: str
+    ) -> Set[str]:
+        """
+        Filters transactions from a given block range and contract address.
+        The range is fetched in chunks of TRACE_FILTER_CHUNK_SIZE blocks.
+        Raises:
+            RuntimeError: If the node fails to filter a single block
+        """
+        self.logger.info(
+            f"Filtering transactions from block {from_block} \
+              to {to_block} for contract {contract_address}."
+        )
+        start = int(validate_and_convert_block(from_block), 16)
+        end = int(validate_and_convert_block(to_block), 16)
+        chunks = await asyncio.gather(
+            *(
+                self._trace_filter_range(
+                    i,
+                    min(i + TRACE_FILTER_CHUNK_SIZE - 1, end),
+                    [contract_address],
+                )
+                for i in range(start, end + 1, TRACE_FILTER_CHUNK_SIZE)
+            )
+        )
+        tx_hashes = {self._tx_hash(r) for traces in chunks for r in traces}
+        self.logger.info(f"Found {len(tx_hashes)} transactions.")
+        return tx_hashes
+
+    async def _get_calls_from_tx(self, tx_hash: str) -> Dict[str, Any]:
+        """
+        Gets calls from a transaction hash.
+        """
+        self.logger.info(f"Tracing transaction {tx_hash}.")
+        try:
+            async with self.semaphore:
+                res = await self.w3.geth.debug.trace_transaction(
+                    tx_hash, {"tracer": "callTracer"}
+                )
+        except Exception as e:
+            self.logger.error(f"Error tracing transaction {tx_hash}: {e}")
+            self.failed_txs.add(tx_hash)
+            return {}
+        return res
+
+    async def get_calls(
+        self, tx_hashes: Set[str], contract_address: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Gets calls for a given set of transaction hashes and contract address.
+        """
+        self.logger.info(f"Getting calls for contract {contract_address}.")
+        results = await asyncio.gather(
+            *(self._get_calls_from_tx(h) for h in tx_hashes)
+        )
+        calls = CallAggregator()
+        for res in results:
+            if res:
+                self._extract_calls(res, contract_address, calls)
+        self.logger.info(f"Extracted {len(calls)} edges.")
+        return calls.to_calls()
+
+    async def _filter_contract_calls(
+        self, calls: List[Dict[str, Any]], to_block
+    ) -> List[Dict[str, Any]]:
+        """
+        Filters calls to contract addresses.
+        """
+        addresses = list({c["to"] for c in calls} | {c["from"] for c in calls})
+        valid = await asyncio.gather(
+            *(self._validate_contract(a, to_block) for a in addresses)
+        )
+        contracts = {a for a, v in zip(addresses, valid, strict=True) if v}
+        return [
+            c for c in calls if c["to"] in contracts and c["from"] in contracts
+        ]
+
+    async def get_calls_from(
+        self, from_block: str, to_block: str, contract_address: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Gets calls from a given block range and contract address.
+        """
+        self.logger.info(
+            f"Getting calls from block {from_block} \
+            to {to_block} for contract {contract_address}."
+        )
+        if not await self._validate_contract(contract_address, to_block):
+            raise ValueError("Invalid contract address or bytecode.")
+        tx_hashes = await self._filter_txs_from(
+            from_block, to_block, contract_address
+        )
+        calls = await self.get_calls(tx_hashes, contract_address)
+        return await self._filter_contract_calls(calls, to_block)
@@ -0,0 +1,259 @@
+from itertools import pairwise
+from typing import Any, Dict, Iterable, List, Tuple
+
+from scsc.utils import normalize_address
+
+
+class EdgeStats:
+    """
+    Call type counts and minimum depth of one caller -> callee edge.
+    """
+
+    __slots__ = ("types", "depth")
+
+    def __init__(self, depth: int):
+        self.types: Dict[str, int] = {}
+        self.depth = depth
+
+
+class CallAggregator:
+    """
+    Aggregates the calls made by a contract, and every call below them,
+    into a (source, target) -> EdgeStats table. Addresses are stored in
+    checksum form, whatever the case the traces hold them in, so that
+    the edges of every collection path, cached trace and resumed state
+    can be merged.
+    """
+
+    def __init__(self):
+        self.edges: Dict[Tuple[str, str], EdgeStats] = {}
+        # Edges by the addresses as given, so that each distinct pair is
+        # normalized once
+        self._given: Dict[Tuple[str, str], EdgeStats] = {}
+
+    def _edge(self, source: str, target: str, depth: int) -> EdgeStats:
+        """
+        Returns the stats of an edge given in any case, created at depth
+        if new.
+        """
+        key = (normalize_address(source), normalize_address(target))
+        stats = self.edges.get(key)
+        if stats is None:
+            stats = self.edges[key] = EdgeStats(depth)
+        self._given[(source, target)] = stats
+        return stats
+
+    def add(
+        self,
+        source: str,
+        target: str,
+        call_type: str,
+        count: int = 1,
+        depth: int = 1,
+    ) -> None:
+        """
+        Adds count calls of call_type from source to target.
+        """
+        stats = self._given.get((source, target))
+        if stats is None:
+            stats = self._edge(source, target, depth)
+        if depth < stats.depth:
+            stats.depth = depth
+        stats.types[call_type] = stats.types.get(call_type, 0) + count
+
+    def add_trace(self, trace: Dict[str, Any], contract_address: str) -> None:
+        """
+        Walks a callTracer tree with an explicit stack. Each frame is
+        counted once for every frame on its path, itself included, whose
+        caller is the contract. Depth is the distance from the nearest
+        such frame, starting at 1.
+        """
+        contract_address = contract_address.lower()
+        # Lowercases each distinct caller once instead of once per frame
+        is_contract: Dict[str, bool] = {}
+        stack = [trace]
+        while stack:
+            call = stack.pop()
+            source = call["from"]
+            match = is_contract.get(source)
+            if match is None:
+                match = is_contract[source] = (
+                    source.lower() == contract_address
+                )
+            if match:
+                self._add_subtree(call, contract_address, is_contract)
+                continue
+            subcalls = call.get("calls")
+            if subcalls:
+                stack.extend(reversed(subcalls))
+
+    def _add_subtree(
+        self,
+        call: Dict[str, Any],
+        contract_address: str,
+        is_contract: Dict[str, bool],
+    ) -> None:
+        """
+        Adds every frame below and including a call made by the contract.
+        """
+        # Bound once, the loop runs for every frame of the subtree
+        get_edge, get_match = self._given.get, is_contract.get
+        # (iterator over sibling frames, matching frames above them,
+        # depth of their parent): one entry per open parent rather than
+        # one per frame, and siblings are resumed in depth-first order
+        stack = [(iter((call,)), 0, 0)]
+        push, pop = stack.append, stack.pop
+        while stack:
+            calls, above, parent_depth = stack[-1]
+            for call in calls:
+                source = call["from"]
+                match = get_match(source)
+                if match is None:
+                    match = is_contract[source] = (
+                        source.lower() == contract_address
+                    )
+                if match:
+                    matches = above + 1
+                    depth = 1
+                else:
+                    matches = above
+                    depth = parent_depth + 1
+                target = call["to"]
+                stats = get_edge((source, target))
+                if stats is None:
+                    stats = self._edge(source, target, depth)
+                elif depth < stats.depth:
+                    stats.depth = depth
+                types = stats.types
+                call_type = call["type"]
+                types[call_type] = types.get(call_type, 0) + matches
+                subcalls = call.get("calls")
+                if subcalls:
+                    push((iter(subcalls), matches, depth))
+                    break
+            else:
+                pop()
+
+    def add_events(
+        self,
+        events: Iterable[Tuple[str, str, str] | None],
+        contract_address: str,
+    ) -> None:
+        """
+        Same as add_trace, over a stream of call events: a (from, to,
+        type) tuple when a frame is entered and None when it is left.
+        Only the counts and depths of the open frames are kept.
+        """
+        contract_address = contract_address.lower()
+        is_contract: Dict[str, bool] = {}
+        # (matches, depth) of the enclosing frames
+        path = []
+        matches = depth = 0
+        for event in events:
+            if event is None:
+                matches, depth = path.pop()
+                continue
+            path.append((matches, depth))
+            source, target, call_type = event
+            match = is_contract.get(source)
+            if match is None:
+                match = is_contract[source] = (
+                    source.lower() == contract_address
+                )
+            if match:
+                matches += 1
+                depth = 1
+            elif matches:
+                depth += 1
+            if matches:
+                self.add(source, target, call_type, matches, depth)
+
+    def add_flat_traces(
+        self, traces: List[Dict[str, Any]], contract_address: str
+    ) -> None:
+        """
+        Same as add_trace, over the flat Parity traces of a transaction,
+        as returned by trace_transaction or trace_block. Each trace sits
+        at len(traceAddress) below the top call, and traces come in
+        depth-first order, so the enclosing frames are the first
+        len(traceAddress) entries of a single path list, without
+        rebuilding the tree.
+        """
+        contract_address = contract_address.lower()
+        is_contract: Dict[str, bool] = {}
+        # (matches, depth) of the enclosing frames
+        path = []
+        if any(
+            a["traceAddress"] > b["traceAddress"] for a, b in pairwise(traces)
+        ):
+            # Nodes send them in order, but the format does not promise it
+            traces = sorted(traces, key=lambda t: t["traceAddress"])
+        for trace in traces:
+            level = len(trace["traceAddress"])
+            del path[level:]
+            matches, depth = path[-1] if path else (0, 0)
+            source, target, call_type = _flat_call(trace)
+            match = is_contract.get(source)
+            if match is None:
+                match = is_contract[source] = (
+                    source is not None and source.lower() == contract_address
+                )
+            if match:
+                matches += 1
+                depth = 1
+            elif matches:
+                depth += 1
+            path.append((matches, depth))
+            if matches and target is not None:
+                self.add(source, target, call_type, matches, depth)
+
+    def merge(self, other: "CallAggregator") -> None:
+        """
+        Adds the edges of another aggregator to this one.
+        """
+        for (source, target), stats in other.edges.items():
+            for call_type, count in stats.types.items():
+                self.add(source, target, call_type, count, stats.depth)
+
+    def add_calls(self, calls: Iterable[Dict[str, Any]]) -> None:
+        """
+        Adds edges in the format of to_calls to this aggregator.
+        """
+        for c in calls:
+            for call_type, count in c["types"].items():
+                self.add(c["from"], c["to"], call_type, count, c["depth"])
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    def to_calls(self) -> List[Dict[str, Any]]:
+        """
+        Returns the edges as {"from", "to", "types", "depth"} dicts.
+        """
+        return [
+            {
+                "from": source,
+                "to": target,
+                "types": dict(stats.types),
+                "depth": stats.depth,
+            }
+            for (source, target), stats in self.edges.items()
+        ]
+
+
+def _flat_call(trace: Dict[str, Any]) -> Tuple[str, str | None, str]:
+    """
+    Returns the caller, callee and callTracer type of a flat Parity
+    trace. The callee of a failed creation is unknown.
+    """
+    action = trace["action"]
+    if trace["type"] == "call":
+        return action["from"], action["to"], action["callType"].upper()
+    if trace["type"] == "create":
+        result = trace.get("result") or {}
+        call_type = action.get("creationMethod", "create").upper()
+        return action["from"], result.get("address"), call_type
+    if trace["type"] == "suicide":
+        return action["address"], action["refundAddress"], "SELFDESTRUCT"
+    # Block and uncle rewards are not part of a transaction
+    return action.get("author"), None, trace["type"].upper()
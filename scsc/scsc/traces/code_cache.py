@@ -0,0 +1,95 @@
+import logging
+import sqlite3
+import threading
+from typing import Dict, Set, Tuple
+
+
+class CodeCache:
+    """
+    Remembers which addresses hold contract code, as "has code since
+    block N" records with an optional block at which the code was found
+    destroyed. Records are kept in memory and, given a path, persisted
+    to SQLite.
+    """
+
+    def __init__(self, path: str | None = None):
+        """
+        Initializes the CodeCache, loading the records stored at path.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._lock = threading.Lock()
+        # address -> (has code since block, code destroyed at block or None)
+        self._records: Dict[str, Tuple[int, int | None]] = {}
+        # (address, block) lookups that found no code, for this run only
+        self._no_code: Set[Tuple[str, int]] = set()
+
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS code ("
+                "address TEXT PRIMARY KEY, since INTEGER NOT NULL, "
+                "destroyed INTEGER)"
+            )
+            self._db.commit()
+            for address, since, destroyed in self._db.execute(
+                "SELECT address, since, destroyed FROM code"
+            ):
+                self._records[address] = (since, destroyed)
+            self.logger.info(f"Loaded {len(self._records)} code records.")
+
+    def has_code(self, address: str, block: int) -> bool | None:
+        """
+        Returns whether address holds code at block, or None when the
+        node has to be asked.
+        """
+        address = address.lower()
+        with self._lock:
+            if (address, block) in self._no_code:
+                return False
+            record = self._records.get(address)
+        if record is None:
+            return None
+        since, destroyed = record
+        if since <= block and (destroyed is None or block < destroyed):
+            return True
+        return None
+
+    def record(self, address: str, block: int, has_code: bool) -> None:
+        """
+        Records the result of an eth_getCode lookup at block.
+        """
+        address = address.lower()
+        with self._lock:
+            record = self._records.get(address)
+            if not has_code:
+                self._no_code.add((address, block))
+                if record is None or block < record[0]:
+                    return
+                # Code seen earlier is gone, e.g. after a self-destruct
+                since, destroyed = record
+                if destroyed is not None and destroyed <= block:
+                    return
+                record = (since, block)
+            elif record is None:
+                record = (block, None)
+            elif block < record[0]:
+                record = (block, record[1])
+            else:
+                return
+            self._records[address] = record
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO code VALUES (?, ?, ?)",
+                    (address, *record),
+                )
+                self._db.commit()
+
+    def close(self) -> None:
+        """
+        Closes the underlying database.
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
@@ -0,0 +1,112 @@
+import math
+from typing import Any, Dict, Iterable, List
+
+# Relative cost of a node request and of each transaction the node
+# traces, from benchmarks/scan.py: about 5 ms per request and 0.2 ms
+# per traced transaction
+REQUEST_COST = 1.0
+TRACE_COST = 0.04
+# trace_block runs no debug tracer, assumed to cost half as much
+FLAT_TRACE_COST = 0.02
+
+# Blocks per planned sub-range, and blocks per sub-range whose
+# transactions are counted to estimate the cost of tracing whole blocks
+PLAN_SEGMENT_SIZE = 1000
+PLAN_SAMPLES = 3
+
+
+class RangeSample:
+    """
+    Sampled density of a block range: the matching transactions per
+    block, as found by trace_filter, and the mean transactions per block.
+    """
+
+    __slots__ = ("start", "end", "matching", "txs_per_block")
+
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        matching: Dict[int, int] | None,
+        txs_per_block: float,
+    ):
+        """
+        Initializes the RangeSample.
+        Args:
+            start: First block of the range
+            end: Last block of the range
+            matching: Matching transactions of each block holding one,
+                None when trace_filter is not served
+            txs_per_block: Mean transactions per block of the sample
+        """
+        self.start = start
+        self.end = end
+        self.matching = matching
+        self.txs_per_block = txs_per_block
+
+
+def strategy_cost(
+    mode: str, sample: RangeSample, batch_size: int = 1
+) -> Dict[str, Any]:
+    """
+    Estimates the trace requests, traced transactions and cost of
+    collecting a sampled range in a collection mode.
+    Raises:
+        ValueError: If the mode needs trace_filter and the sample has
+            no matching transactions, or if the mode is unknown
+    """
+    if mode == "scan":
+        requests = sample.end - sample.start + 1
+        traced = requests * sample.txs_per_block
+    elif sample.matching is None:
+        raise ValueError(f"Mode {mode} needs trace_filter.")
+    elif mode == "transaction":
+        traced = sum(sample.matching.values())
+        requests = math.ceil(traced / batch_size)
+    elif mode in ("block", "flat"):
+        requests = len(sample.matching)
+        # A block holds at least its matching transactions
+        traced = sum(
+            max(n, sample.txs_per_block) for n in sample.matching.values()
+        )
+    else:
+        raise ValueError(f"Unknown collection mode: {mode}")
+    trace_cost = FLAT_TRACE_COST if mode == "flat" else TRACE_COST
+    return {
+        "requests": requests,
+        "traced_txs": round(traced),
+        "cost": round(requests * REQUEST_COST + traced * trace_cost, 2),
+    }
+
+
+def plan_range(
+    samples: Iterable[RangeSample],
+    modes: List[str],
+    batch_size: int = 1,
+) -> List[Dict[str, Any]]:
+    """
+    Picks the cheapest of modes for each sampled sub-range, the first
+    one listed on ties, and merges consecutive sub-ranges of the same
+    mode. Returns the {"from_block", "to_block", "mode", "requests",
+    "traced_txs", "cost"} segments of the plan, in block order.
+    """
+    plan = []
+    for sample in samples:
+        costs = [(strategy_cost(m, sample, batch_size), m) for m in modes]
+        estimate, mode = min(costs, key=lambda c: c[0]["cost"])
+        last = plan[-1] if plan else None
+        if last is not None and last["mode"] == mode:
+            last["to_block"] = sample.end
+            for key in ("requests", "traced_txs", "cost"):
+                last[key] += estimate[key]
+            last["cost"] = round(last["cost"], 2)
+            continue
+        plan.append(
+            {
+                "from_block": sample.start,
+                "to_block": sample.end,
+                "mode": mode,
+                **estimate,
+            }
+        )
+    return plan
@@ -0,0 +1,112 @@
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable
+
+import requests
+
+from scsc.utils.endpoint_pool import (
+    TRANSIENT_STATUSES,
+    is_transient_message,
+    is_transient_response,
+)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing rate requests per second on
+    average, with bursts of up to burst requests.
+    """
+
+    def __init__(self, rate: float, burst: int | None = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1) -> None:
+        """
+        Blocks until tokens requests may be sent. Requests beyond the
+        capacity, such as large batches, wait for a full bucket.
+        """
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                # Waiting with the lock held keeps requests in order
+                time.sleep((tokens - self._tokens) / self.rate)
+
+
+class RetryPolicy:
+    """
+    Retries transient node errors, such as 429s and timeouts, with
+    jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+    ):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @staticmethod
+    def is_transient(error: Exception) -> bool:
+        """
+        Returns whether a request failing with error may succeed later.
+        """
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        if isinstance(error, TimeoutError):
+            return True
+        response = getattr(error, "response", None)
+        if isinstance(error, requests.HTTPError) and response is not None:
+            return response.status_code in TRANSIENT_STATUSES
+        # Web3RPCError keeps the JSON-RPC response it was raised for
+        rpc_response = getattr(error, "rpc_response", None)
+        if isinstance(rpc_response, dict) and rpc_response.get("error"):
+            return is_transient_response(rpc_response)
+        return is_transient_message(str(error))
+
+    def delay(self, attempt: int) -> float:
+        """
+        Returns a random delay before retry attempt, starting at 0,
+        drawn up to an exponentially growing cap ("full jitter").
+        """
+        cap = min(self.max_delay, self.base_delay * 2**attempt)
+        return random.uniform(0, cap)
+
+    def call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Returns fn(*args), retrying transient errors up to max_retries
+        times. The last error is raised.
+        """
+        attempt = 0
+        while True:
+            try:
+                return fn(*args)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_transient(e):
+                    raise
+                delay = self.delay(attempt)
+                self.logger.warning(
+                    f"Transient error, retrying in {delay:.2f}s: {e}"
+                )
+                time.sleep(delay)
+                attempt += 1
@@ -0,0 +1,128 @@
+import itertools
+import logging
+from typing import Any, Dict, List, Tuple
+
+from scsc.utils.endpoint_pool import EndpointPool, is_transient_response
+from scsc.utils.providers import HTTP_SCHEMES, make_http_session, split_urls
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HEADERS = {"Content-Type": "application/json"}
+
+
+class RPCClient:
+    """
+    Lean JSON-RPC client for trace_filter, debug_trace* and eth_getCode.
+    Requests are encoded once and posted over a pooled keep-alive
+    session, results are decoded by orjson into plain dicts and lists,
+    skipping the web3.py middlewares and result formatters: addresses
+    keep the case the node sends them in, and are checksummed by
+    CallAggregator as the edges are aggregated. Given several comma
+    separated URLs, requests are spread over them by an EndpointPool.
+    """
+
+    def __init__(self, url: str, pool_size: int = 10, timeout: float = 30):
+        """
+        Initializes the RPCClient.
+        Args:
+            url: HTTP endpoint of the node, or comma separated endpoints
+            pool_size: Maximum number of kept-alive connections, at
+                least the number of threads sending requests
+            timeout: Seconds to wait for a response
+        Raises:
+            ValueError: If an endpoint is not an HTTP URL
+            ImportError: If orjson is not installed
+        """
+        if orjson is None:
+            raise ImportError(
+                "The raw JSON-RPC client needs orjson, install scsc[orjson]."
+            )
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.urls = split_urls(url)
+        for u in self.urls:
+            if not u.startswith(HTTP_SCHEMES):
+                raise ValueError(f"RPCClient needs an HTTP node URL: {u}")
+        self.url = self.urls[0]
+        self.timeout = timeout
+        # One session per endpoint, each keeping its own connections
+        self.sessions = [make_http_session(pool_size) for _ in self.urls]
+        self.session = self.sessions[0]
+        self.pool = EndpointPool(self.urls) if len(self.urls) > 1 else None
+        self._ids = itertools.count(1)
+
+    def _post_to(self, index: int, body: bytes) -> Any:
+        response = self.sessions[index].post(
+            self.urls[index], data=body, headers=HEADERS, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
+    def _post(self, body: bytes) -> Any:
+        if self.pool is None:
+            return self._post_to(0, body)
+        return self.pool.call(
+            lambda i: self._post_to(i, body), is_transient_response
+        )
+
+    def request(self, method: str, params: List[Any]) -> Any:
+        """
+        Sends a single request and returns its result.
+        Raises ValueError on JSON-RPC errors.
+        """
+        response = self._post(
+            orjson.dumps(
+                {
+                    "jsonrpc": "2.0",
+                    "id": next(self._ids),
+                    "method": method,
+                    "params": params,
+                }
+            )
+        )
+        if response.get("error"):
+            raise ValueError(response["error"])
+        return response.get("result")
+
+    def make_batch_request(
+        self, requests: List[Tuple[str, List[Any]]]
+    ) -> List[Dict[str, Any]] | Dict[str, Any]:
+        """
+        Sends requests as a single batch, like
+        web3.provider.make_batch_request: returns the responses sorted
+        by id, which follows the order of requests, or the error
+        response when the node rejects the batch as a whole.
+        """
+        body = orjson.dumps(
+            [
+                {
+                    "jsonrpc": "2.0",
+                    "id": next(self._ids),
+                    "method": method,
+                    "params": params,
+                }
+                for method, params in requests
+            ]
+        )
+        responses = self._post(body)
+        if not isinstance(responses, list):
+            return responses
+        return sorted(responses, key=lambda r: r.get("id") or 0)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Returns the per-endpoint stats of the pool, empty for a single
+        endpoint.
+        """
+        return [] if self.pool is None else self.pool.stats()
+
+    def close(self) -> None:
+        """
+        Closes the pooled connections.
+        """
+        for session in self.sessions:
+            session.close()
+        if self.pool is not None:
+            self.pool.close()
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, Iterable
+
+from web3 import Web3
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# First bytes of a zstd frame, used to tell codecs apart when reading
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# Keys looked up per query by get_many, below SQLite's variable limit
+MAX_QUERY_KEYS = 500
+
+
+class TraceCache:
+    """
+    Persistent SQLite cache of call traces, keyed by transaction hash
+    and tracer config. Entries are compressed and evicted least recently
+    used first once the cache grows past max_bytes. Access times of
+    cache hits are written with the next put, get_many or close.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 1 << 30,
+        finality_depth: int = 64,
+    ):
+        """
+        Initializes the TraceCache.
+        Args:
+            path: SQLite database file
+            max_bytes: Maximum size of the stored, compressed traces
+            finality_depth: Blocks behind the head after which a block
+                is considered final and its traces can be cached
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.max_bytes = max_bytes
+        self.finality_depth = finality_depth
+
+        self._lock = threading.Lock()
+        # Access times of cache hits not yet written, by key
+        self._accessed: Dict[str, int] = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS traces ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, accessed INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS traces_accessed ON traces (accessed)"
+        )
+        self._db.commit()
+        self._clock, self._size = self._db.execute(
+            "SELECT COALESCE(MAX(accessed), 0), COALESCE(SUM(size), 0) "
+            "FROM traces"
+        ).fetchone()
+        if zstandard is None:
+            self.logger.info("zstandard not installed, using zlib.")
+
+    @staticmethod
+    def _key(tx_hash: str, tracer_config: Dict[str, Any]) -> str:
+        """
+        Returns the cache key of a transaction trace.
+        """
+        config = json.dumps(tracer_config, sort_keys=True).encode()
+        digest = hashlib.sha256(config).hexdigest()[:16]
+        return f"{tx_hash.lower()}:{digest}"
+
+    @staticmethod
+    def _compress(data: bytes) -> bytes:
+        if zstandard is None:
+            return zlib.compress(data)
+        return zstandard.compress(data)
+
+    @staticmethod
+    def _decompress(data: bytes) -> bytes:
+        if data.startswith(ZSTD_MAGIC):
+            if zstandard is None:
+                raise ValueError("zstd compressed entry, zstandard missing.")
+            return zstandard.decompress(data)
+        return zlib.decompress(data)
+
+    def get(
+        self, tx_hash: str, tracer_config: Dict[str, Any]
+    ) -> Dict[str, Any] | None:
+        """
+        Returns the cached trace of a transaction, or None.
+        """
+        key = self._key(tx_hash, tracer_config)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM traces WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(key)
+        return self._load(tx_hash, row[0])
+
+    def get_many(
+        self, tx_hashes: Iterable[str], tracer_config: Dict[str, Any]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the cached traces of the given transactions by
+        transaction hash, leaving out those not in the cache. The access
+        times of the hits are written in a single transaction.
+        """
+        hashes = {self._key(h, tracer_config): h for h in tx_hashes}
+        keys = list(hashes)
+        rows = []
+        with self._lock:
+            for i in range(0, len(keys), MAX_QUERY_KEYS):
+                chunk = keys[i : i + MAX_QUERY_KEYS]
+                rows.extend(
+                    self._db.execute(
+                        "SELECT key, value FROM traces WHERE key IN "
+                        f"({', '.join('?' * len(chunk))})",
+                        chunk,
+                    )
+                )
+            for key, _ in rows:
+                self._touch(key)
+            self._flush()
+            self._db.commit()
+        traces = {}
+        for key, value in rows:
+            trace = self._load(hashes[key], value)
+            if trace is not None:
+                traces[hashes[key]] = trace
+        return traces
+
+    def _load(self, tx_hash: str, value: bytes) -> Dict[str, Any] | None:
+        """
+        Returns the trace stored in value, or None if it cannot be read.
+        """
+        try:
+            return json.loads(self._decompress(value))
+        except Exception as e:
+            self.logger.error(f"Error reading cached trace {tx_hash}: {e}")
+            return None
+
+    def _touch(self, key: str) -> None:
+        """
+        Marks an entry as the most recently used one. Must be called with
+        the lock held.
+        """
+        self._clock += 1
+        self._accessed[key] = self._clock
+
+    def _flush(self) -> None:
+        """
+        Writes the pending access times, without committing. Must be
+        called with the lock held.
+        """
+        if self._accessed:
+            self._db.executemany(
+                "UPDATE traces SET accessed = ? WHERE key = ?",
+                [(clock, key) for key, clock in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def put(
+        self,
+        tx_hash: str,
+        tracer_config: Dict[str, Any],
+        trace: Dict[str, Any],
+    ) -> None:
+        """
+        Stores the trace of a transaction from a finalized block.
+        """
+        key = self._key(tx_hash, tracer_config)
+        value = self._compress(Web3.to_json(trace).encode())
+        with self._lock:
+            self._flush()
+            old = self._db.execute(
+                "SELECT size FROM traces WHERE key = ?", (key,)
+            ).fetchone()
+            self._clock += 1
+            self._db.execute(
+                "INSERT OR REPLACE INTO traces VALUES (?, ?, ?, ?)",
+                (key, value, len(value), self._clock),
+            )
+            self._size += len(value) - (old[0] if old else 0)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        """
+        Removes least recently used entries until the cache fits max_bytes.
+        Must be called with the lock held.
+        """
+        while self._size > self.max_bytes:
+            row = self._db.execute(
+                "SELECT key, size FROM traces ORDER BY accessed LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM traces WHERE key = ?", (row[0],))
+            self._size -= row[1]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM traces").fetchone()[
+                0
+            ]
+
+    def close(self) -> None:
+        """
+        Writes the pending access times and closes the underlying
+        database.
+        """
+        with self._lock:
+            self._flush()
+            self._db.commit()
+            self._db.close()
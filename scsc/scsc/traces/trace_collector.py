@@ -1,18 +1,156 @@
+import asyncio
+import itertools
 import logging
-from typing import Any, Dict, List, Set
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Set,
+    Tuple,
+)
 
 from hexbytes import HexBytes
-from web3 import Web3
+from web3 import HTTPProvider, Web3
+from web3.exceptions import MethodUnavailable
+from web3.types import RPCEndpoint
+
+from scsc.traces.call_aggregator import CallAggregator
+from scsc.traces.code_cache import CodeCache
+from scsc.traces.collection_planner import (
+    PLAN_SAMPLES,
+    PLAN_SEGMENT_SIZE,
+    RangeSample,
+    plan_range,
+    strategy_cost,
+)
+from scsc.traces.rate_limit import RetryPolicy, TokenBucket
+from scsc.traces.rpc_client import RPCClient
+from scsc.traces.trace_cache import TraceCache
+from scsc.traces.trace_stream import call_events, ijson
+from scsc.utils import validate_and_convert_block
+from scsc.utils.providers import (
+    PooledProvider,
+    make_http_session,
+    make_provider,
+)
+
+COLLECTION_MODES = ("transaction", "block", "scan", "flat")
+# Mode resolved to "transaction" on nodes serving trace_filter, and to
+# "scan" on nodes only serving debug_traceBlockByNumber, such as Geth
+AUTO_MODE = "auto"
+# Mode sampling the range and picking the cheapest of the modes served
+# by the node for each sub-range, see estimate
+PLAN_MODE = "plan"
+# Substrings of the errors of nodes not serving a method
+UNSUPPORTED_METHOD_ERRORS = (
+    "-32601",
+    "method not found",
+    "does not exist",
+    "not available",
+    "not supported",
+    "unsupported",
+)
+# Rate limited method families: trace_* and debug_trace* requests, and
+# state reads such as eth_getCode
+METHOD_FAMILIES = ("trace", "state")
+
+CALL_TRACER = {"tracer": "callTracer"}
+# JS tracer returning callTracer frames with only the fields the call
+# graph uses, so that nodes serialize and send far less
+MINIMAL_TRACER = {
+    "tracer": "{"
+    "stack: [{calls: []}],"
+    "enter: function(f) {"
+    "this.stack.push({type: f.getType(), from: toHex(f.getFrom()),"
+    " to: toHex(f.getTo()), calls: []});"
+    "},"
+    "exit: function(r) {"
+    "var c = this.stack.pop();"
+    "if (!c.calls.length) delete c.calls;"
+    "this.stack[this.stack.length - 1].calls.push(c);"
+    "},"
+    "fault: function(log, db) {},"
+    "result: function(ctx, db) {"
+    "var c = {type: ctx.type, from: toHex(ctx.from), to: toHex(ctx.to),"
+    " calls: this.stack[0].calls};"
+    "if (!c.calls.length) delete c.calls;"
+    "return c;"
+    "}"
+    "}"
+}
+TRACERS = {"call": CALL_TRACER, "minimal": MINIMAL_TRACER}
+# Cache key of the flat Parity traces of trace_block, which take no tracer
+FLAT_TRACES = {"tracer": "parity"}
+
+# Addresses 0x00..00 to 0x00..0f are precompiles and never hold code
+PRECOMPILE_PREFIX = "0x000000000000000000000000000000000000000"
+# Addresses per eth_getCode batch request
+CODE_BATCH_SIZE = 100
+
+# Blocks per trace_filter request, and traces per page of a request
+TRACE_FILTER_CHUNK_SIZE = 1000
+TRACE_FILTER_PAGE_SIZE = 10000
+
+# Jobs in flight per worker thread of _map_ordered, which bounds the
+# results held in memory when the consumer is slower than the node
+MAP_WINDOW = 2
 
 
 class TraceCollector:
-    def __init__(self, url: str):
+    def __init__(
+        self,
+        url: str,
+        cache: TraceCache | None = None,
+        code_cache: CodeCache | None = None,
+        tracer: str = "call",
+        rpc: RPCClient | None = None,
+        pool_size: int = 10,
+        rate_limits: Dict[str, TokenBucket] | None = None,
+        retry: RetryPolicy | None = None,
+    ):
         """
-        Initializes the TraceCollector with a URL and log level.
+        Initializes the TraceCollector with a node URL, see make_provider,
+        the number of HTTP connections kept alive, an optional cache for
+        the traces of finalized transactions and an optional persisted
+        cache of contract code existence. The "minimal" tracer asks the
+        node for the call tree only, falling back to callTracer on nodes
+        without custom tracers. Given an RPCClient, trace and code
+        requests go through it instead of web3.py. Node requests are
+        rate limited per method family by rate_limits, and transient
+        errors are retried by the retry policy.
         """
         self.logger = logging.getLogger(self.__class__.__name__)
+        if tracer not in TRACERS:
+            raise ValueError(f"Unknown tracer: {tracer}")
+        self.tracer_config = TRACERS[tracer]
+        # Whether the node is known to support tracer_config
+        self._tracer_checked = self.tracer_config is CALL_TRACER
+        unknown = set(rate_limits or {}) - set(METHOD_FAMILIES)
+        if unknown:
+            raise ValueError(f"Unknown method families: {sorted(unknown)}")
+        self.rate_limits = rate_limits or {}
+        self.retry = retry
+        # Transactions that could not be traced, even after retries
+        self.failed_txs: Set[str] = set()
+        # Blocks that could not be traced in "scan" mode
+        self.failed_blocks: Set[int] = set()
+        # Methods served by the node, probed once by capabilities
+        self._capabilities: Dict[str, bool] | None = None
+        self._capabilities_lock = threading.Lock()
+        self.cache = cache
+        self.rpc = rpc
+        self.code_cache = code_cache if code_cache is not None else CodeCache()
 
-        self.w3 = Web3(Web3.HTTPProvider(url))
+        self.w3 = Web3(make_provider(url, pool_size))
+        # Streamed traces bypass web3, which reads whole responses
+        self._session = make_http_session(pool_size)
         if not self.w3.is_connected():
             raise ConnectionError("Failed to connect to the Ethereum node.")
         self.logger.info("Connected to the Ethereum node.")
@@ -20,6 +158,29 @@ class TraceCollector:
         # Reference bytecode for "x0" - this should be the actual bytecode
         self.x0_bytecode = "x0"  # Replace with actual x0 bytecode
 
+    def _request(
+        self,
+        family: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        tokens: int = 1,
+    ) -> Any:
+        """
+        Returns fn(*args), a node request of a method family, once the
+        family's rate limit allows tokens requests, retrying transient
+        errors when a retry policy is set.
+        """
+
+        def send() -> Any:
+            bucket = self.rate_limits.get(family)
+            if bucket is not None:
+                bucket.acquire(tokens)
+            return fn(*args)
+
+        if self.retry is None:
+            return send()
+        return self.retry.call(send)
+
     def _validate_contract(self, address: str, block: str) -> bool:
         """
         Validates contract address and checks if it's different from x0
@@ -29,22 +190,145 @@ class TraceCollector:
             return False
 
         try:
-            code = self.w3.eth.get_code(address, block_identifier=block)
+            block_number = int(validate_and_convert_block(block), 16)
+        except ValueError:
+            # Block tags such as "latest" cannot be cached
+            block_number = None
+        if block_number is not None:
+            has_code = self.code_cache.has_code(address, block_number)
+            if has_code is not None:
+                return has_code
+
+        try:
+            if self.rpc is not None:
+                code = HexBytes(
+                    self._request(
+                        "state",
+                        self.rpc.request,
+                        "eth_getCode",
+                        [address, block],
+                    )
+                )
+            else:
+                code = self._request(
+                    "state", self.w3.eth.get_code, address, block
+                )
             if len(code) == 0:
                 self.logger.error(f"No code at address: {address}")
+                if block_number is not None:
+                    self.code_cache.record(address, block_number, False)
                 return False
 
             if code.hex() == self.x0_bytecode:
                 self.logger.info(f"Contract at {address} matches x0 contract")
                 return False
 
+            if block_number is not None:
+                self.code_cache.record(address, block_number, True)
             return True
         except Exception as e:
             self.logger.error(f"Error validating contract: {e}")
             return False
 
+    def _trace_filter_range(
+        self, start: int, end: int, addresses: List[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Gets the call traces of contracts in a block range, one page of
+        TRACE_FILTER_PAGE_SIZE traces at a time. The range is bisected
+        when the node fails to answer it.
+        """
+        traces = []
+        after = 0
+        while True:
+            filter_params = {
+                "fromBlock": hex(start),
+                "toBlock": hex(end),
+                "fromAddress": addresses,
+                "after": after,
+                "count": TRACE_FILTER_PAGE_SIZE,
+            }
+            try:
+                if self.rpc is not None:
+                    page = self._request(
+                        "trace",
+                        self.rpc.request,
+                        "trace_filter",
+                        [filter_params],
+                    )
+                else:
+                    page = self._request(
+                        "trace", self.w3.tracing.trace_filter, filter_params
+                    )
+                page = page or []
+            except Exception as e:
+                if start == end:
+                    self.logger.error(f"Error filtering transactions: {e}")
+                    raise RuntimeError(
+                        f"trace_filter failed for block {start}."
+                    ) from e
+                mid = (start + end) // 2
+                self.logger.warning(
+                    f"trace_filter failed for blocks {start}-{end}, "
+                    f"splitting at {mid}: {e}"
+                )
+                # Pages fetched so far are covered again by the halves
+                return self._trace_filter_range(
+                    start, mid, addresses
+                ) + self._trace_filter_range(mid + 1, end, addresses)
+            traces.extend(r for r in page if r["type"] == "call")
+            if len(page) < TRACE_FILTER_PAGE_SIZE:
+                return traces
+            after += TRACE_FILTER_PAGE_SIZE
+
+    def _trace_filter(
+        self,
+        from_block: str,
+        to_block: str,
+        contract_address: str | List[str],
+        max_workers: int = 1,
+    ) -> List[Dict[str, Any]]:
+        """
+        Gets the traces of calls made by a contract, or by any of a list
+        of contracts, in a given block range. The range is fetched in
+        chunks of TRACE_FILTER_CHUNK_SIZE blocks, in a thread pool when
+        max_workers is above 1.
+        """
+        addresses = (
+            [contract_address]
+            if isinstance(contract_address, str)
+            else list(contract_address)
+        )
+        start = int(validate_and_convert_block(from_block), 16)
+        end = int(validate_and_convert_block(to_block), 16)
+        chunks = [
+            (i, min(i + TRACE_FILTER_CHUNK_SIZE - 1, end))
+            for i in range(start, end + 1, TRACE_FILTER_CHUNK_SIZE)
+        ]
+        traces = []
+        for res in self._map_ordered(
+            lambda c: self._trace_filter_range(*c, addresses),
+            chunks,
+            max_workers,
+        ):
+            traces.extend(res)
+        return traces
+
+    @staticmethod
+    def _tx_hash(trace: Dict[str, Any]) -> str:
+        """
+        Returns the transaction hash of a trace as a hex string.
+        web3.py formats it as HexBytes, the RPCClient leaves it a string.
+        """
+        tx_hash = trace["transactionHash"]
+        return tx_hash.to_0x_hex() if type(tx_hash) is HexBytes else tx_hash
+
     def _filter_txs_from(
-        self, from_block: str, to_block: str, contract_address: str
+        self,
+        from_block: str,
+        to_block: str,
+        contract_address: str,
+        max_workers: int = 1,
     ) -> Set[str]:
         """
         Filters transactions from a given block range and contract address.
@@ -53,117 +337,1306 @@ class TraceCollector:
             f"Filtering transactions from block {from_block} \
               to {to_block} for contract {contract_address}."
         )
-        filter_params = {
-            "fromBlock": from_block,
-            "toBlock": to_block,
-            "fromAddress": [contract_address],
-        }
-        try:
-            res = self.w3.tracing.trace_filter(filter_params)
-        except Exception as e:
-            self.logger.error(f"Error filtering transactions: {e}")
-            return set()
-
-        if res is None:
-            return set()
-        tx_hashes = {
-            (
-                r["transactionHash"].to_0x_hex()
-                if type(r["transactionHash"]) is HexBytes
-                else r["transactionHash"]
-            )
-            for r in res
-            if r["type"] == "call"
-        }
+        res = self._trace_filter(
+            from_block, to_block, contract_address, max_workers
+        )
+        tx_hashes = {self._tx_hash(r) for r in res}
         self.logger.info(f"Found {len(tx_hashes)} transactions.")
         return tx_hashes
 
+    def _filter_blocks_from(
+        self,
+        from_block: str,
+        to_block: str,
+        contract_address: str,
+        max_workers: int = 1,
+    ) -> Dict[int, Set[str]]:
+        """
+        Filters transactions from a given block range and contract address,
+        grouped by block number.
+        """
+        self.logger.info(
+            f"Filtering blocks from block {from_block} \
+              to {to_block} for contract {contract_address}."
+        )
+        blocks = {}
+        for r in self._trace_filter(
+            from_block, to_block, contract_address, max_workers
+        ):
+            blocks.setdefault(r["blockNumber"], set()).add(self._tx_hash(r))
+        self.logger.info(f"Found {len(blocks)} blocks.")
+        return blocks
+
+    def _trace_transaction(
+        self, tx_hash: str, tracer_config: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Sends debug_traceTransaction, through the RPCClient if any.
+        """
+        if self.rpc is not None:
+            return self._request(
+                "trace",
+                self.rpc.request,
+                "debug_traceTransaction",
+                [tx_hash, tracer_config],
+            )
+        return self._request(
+            "trace",
+            self.w3.geth.debug.trace_transaction,
+            tx_hash,
+            tracer_config,
+        )
+
     def _get_calls_from_tx(self, tx_hash: str) -> Dict[str, Any]:
         """
         Gets calls from a transaction hash.
         """
         self.logger.info(f"Tracing transaction {tx_hash}.")
         try:
-            res = self.w3.geth.debug.trace_transaction(
-                tx_hash, {"tracer": "callTracer"}
-            )
+            res = self._trace_transaction(tx_hash, self.tracer_config)
         except Exception as e:
             self.logger.error(f"Error tracing transaction {tx_hash}: {e}")
+            self.failed_txs.add(tx_hash)
             return {}
         return res
 
-    def _extract_all_subcalls(
-        self, call: Dict[str, Any], calls: List[Dict[str, str]]
-    ) -> None:
+    def _check_tracer(self, tx_hash: str) -> None:
+        """
+        Checks once that the node runs the custom tracer by tracing
+        tx_hash with it, and falls back to callTracer if only that works.
+        """
+        if self._tracer_checked:
+            return
+        self._tracer_checked = True
+        try:
+            self._trace_transaction(tx_hash, self.tracer_config)
+        except Exception as e:
+            try:
+                self._trace_transaction(tx_hash, CALL_TRACER)
+            except Exception:
+                # The transaction is at fault, not the tracer
+                return
+            self.logger.warning(
+                f"Custom tracer failed ({e}), falling back to callTracer."
+            )
+            self.tracer_config = CALL_TRACER
+
+    def _stream_calls_from_tx(
+        self, tx_hash: str, contract_address: str
+    ) -> CallAggregator | None:
+        """
+        Traces a transaction, parsing the response as it arrives and
+        aggregating its calls without building the call tree.
+        Returns None if the transaction could not be traced.
+        """
+        self.logger.info(f"Streaming trace of transaction {tx_hash}.")
+        provider = self.w3.provider
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "debug_traceTransaction",
+            "params": [tx_hash, self.tracer_config],
+        }
+
+        def stream() -> CallAggregator:
+            # A failed attempt leaves nothing behind in the next one
+            calls = CallAggregator()
+            with self._session.post(
+                provider.endpoint_uri,
+                json=payload,
+                stream=True,
+                **provider.get_request_kwargs(),
+            ) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                calls.add_events(
+                    call_events(ijson.parse(response.raw)), contract_address
+                )
+            return calls
+
+        try:
+            return self._request("trace", stream)
+        except Exception as e:
+            self.logger.error(f"Error tracing transaction {tx_hash}: {e}")
+            self.failed_txs.add(tx_hash)
+            return None
+
+    def _make_batch_request(
+        self, requests: List[Tuple[str, List[Any]]]
+    ) -> List[Any]:
+        """
+        Sends requests as a single JSON-RPC batch request.
+        Returns the result of each request in order, None for failed items.
+        """
+        provider = self.rpc if self.rpc is not None else self.w3.provider
+
+        def send() -> List[Dict[str, Any]]:
+            responses = provider.make_batch_request(requests)
+            if not isinstance(responses, list):
+                # The node rejected the batch as a whole
+                raise ValueError(responses.get("error"))
+            return responses
+
+        family = "state" if requests[0][0] == "eth_getCode" else "trace"
+        try:
+            responses = self._request(family, send, tokens=len(requests))
+        except Exception as e:
+            self.logger.error(f"Error in batch request: {e}")
+            return [None] * len(requests)
+        if len(responses) != len(requests):
+            self.logger.error(
+                f"Batch returned {len(responses)} responses "
+                f"for {len(requests)} requests."
+            )
+            return [None] * len(requests)
+
+        # Responses are sorted by their request id, which follows the
+        # order in which the requests were encoded.
+        results = []
+        for (method, params), r in zip(requests, responses, strict=True):
+            if r.get("error") or not r.get("result"):
+                self.logger.error(
+                    f"Error in {method} {params[0]}: {r.get('error')}"
+                )
+                results.append(None)
+            else:
+                results.append(r["result"])
+        return results
+
+    def _trace_batch(self, tx_hashes: List[str]) -> Dict[str, Any]:
         """
-        Recursively extracts all subcalls from a call.
+        Traces transactions in a single JSON-RPC batch request.
+        Returns the traces keyed by transaction hash, failed items are omitted.
         """
-        calls.append(
-            {"from": call["from"], "to": call["to"], "type": call["type"]}
+        results = self._make_batch_request(
+            [
+                ("debug_traceTransaction", [h, self.tracer_config])
+                for h in tx_hashes
+            ]
         )
-        for subcall in call.get("calls", []):
-            self._extract_all_subcalls(subcall, calls)
+        return {
+            h: res
+            for h, res in zip(tx_hashes, results, strict=True)
+            if res is not None
+        }
+
+    def _get_calls_from_txs(
+        self, tx_hashes: List[str], max_retries: int = 2
+    ) -> Dict[str, Any]:
+        """
+        Gets calls from a batch of transaction hashes, retrying only
+        the items that failed.
+        """
+        self.logger.info(f"Tracing batch of {len(tx_hashes)} transactions.")
+        traces = {}
+        pending = tx_hashes
+        for attempt in range(max_retries + 1):
+            if attempt > 0:
+                self.logger.info(
+                    f"Retrying {len(pending)} transactions "
+                    f"(attempt {attempt}/{max_retries})."
+                )
+                if self.retry is not None:
+                    time.sleep(self.retry.delay(attempt - 1))
+            traces.update(self._trace_batch(pending))
+            pending = [h for h in pending if h not in traces]
+            if not pending:
+                break
+        for h in pending:
+            self.logger.error(f"Giving up on transaction {h}.")
+        self.failed_txs.update(pending)
+        return traces
 
     def _extract_calls(
         self,
         call: Dict[str, Any],
         contract_address: str,
-        calls: List[Dict[str, str]],
+        calls: CallAggregator,
     ) -> None:
         """
         Extracts calls from a call and its subcalls.
         """
-        if call["from"].lower() == contract_address.lower():
-            calls.append(
-                {"from": call["from"], "to": call["to"], "type": call["type"]}
+        calls.add_trace(call, contract_address)
+
+    def _map_ordered(
+        self, fetch: Callable[[Any], Any], jobs: List[Any], max_workers: int
+    ) -> Iterator[Any]:
+        """
+        Yields fetch(job) for each job in order, fetching in a thread pool
+        when max_workers is above 1. At most MAP_WINDOW jobs per thread
+        are in flight, and pending jobs are cancelled when the caller
+        stops iterating.
+        """
+        if max_workers <= 1:
+            for job in jobs:
+                yield fetch(job)
+            return
+        jobs = iter(jobs)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Futures in submission order, whichever finishes first
+            pending = deque(
+                executor.submit(fetch, job)
+                for job in itertools.islice(jobs, max_workers * MAP_WINDOW)
+            )
+            try:
+                while pending:
+                    result = pending.popleft().result()
+                    for job in jobs:
+                        pending.append(executor.submit(fetch, job))
+                        break
+                    yield result
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def endpoint_stats(self) -> List[Dict[str, Any]]:
+        """
+        Returns the per-endpoint stats of a pooled node URL, see
+        EndpointPool.stats, empty for a single endpoint.
+        """
+        if self.rpc is not None:
+            return self.rpc.stats()
+        if isinstance(self.w3.provider, PooledProvider):
+            return self.w3.provider.stats()
+        return []
+
+    def block_number(self) -> int:
+        """
+        Returns the number of the latest block.
+        """
+        return self._request("state", lambda: self.w3.eth.block_number)
+
+    def block_hashes(self, block: int) -> Tuple[str, str]:
+        """
+        Returns the hash and parent hash of a block, as 0x-prefixed hex.
+        """
+        header = self._request("state", self.w3.eth.get_block, block)
+        return (
+            Web3.to_hex(header["hash"]),
+            Web3.to_hex(header["parentHash"]),
+        )
+
+    def _finalized_block(self) -> int:
+        """
+        Returns the highest block whose traces may be cached.
+        """
+        return self.block_number() - self.cache.finality_depth
+
+    def _serves(self, method: str, params: List[Any]) -> bool:
+        """
+        Returns whether the node serves a method, sending it params.
+        Errors other than an unknown method, such as a missing block,
+        still show that the method is served.
+        """
+        try:
+            if self.rpc is not None:
+                self.rpc.request(method, params)
+            else:
+                self.w3.manager.request_blocking(RPCEndpoint(method), params)
+        except MethodUnavailable:
+            return False
+        except Exception as e:
+            message = str(e).lower()
+            return not any(m in message for m in UNSUPPORTED_METHOD_ERRORS)
+        return True
+
+    def capabilities(self) -> Dict[str, bool]:
+        """
+        Returns whether the node serves trace_filter,
+        debug_traceBlockByNumber and trace_block, probed on the genesis
+        block the first time only.
+        """
+        with self._capabilities_lock:
+            if self._capabilities is None:
+                self._capabilities = {
+                    "trace_filter": self._serves(
+                        "trace_filter",
+                        [{"fromBlock": "0x0", "toBlock": "0x0", "count": 1}],
+                    ),
+                    "debug_traceBlockByNumber": self._serves(
+                        "debug_traceBlockByNumber", ["0x0", CALL_TRACER]
+                    ),
+                    "trace_block": self._serves("trace_block", ["0x0"]),
+                }
+                self.logger.info(f"Node capabilities: {self._capabilities}")
+            return self._capabilities
+
+    def resolve_mode(self, mode: str) -> str:
+        """
+        Returns the collection mode to use for mode, probing the node
+        capabilities for AUTO_MODE. PLAN_MODE is planned per sub-range
+        by iter_calls.
+        Raises:
+            ValueError: If the mode is unknown, or if the node serves
+                neither trace_filter nor debug_traceBlockByNumber
+        """
+        if mode != AUTO_MODE:
+            if mode not in (*COLLECTION_MODES, PLAN_MODE):
+                raise ValueError(f"Unknown collection mode: {mode}")
+            return mode
+        capabilities = self.capabilities()
+        if capabilities["trace_filter"]:
+            return "transaction"
+        if capabilities["debug_traceBlockByNumber"]:
+            self.logger.info(
+                "trace_filter is not served, scanning blocks instead."
+            )
+            return "scan"
+        raise ValueError(
+            "The node serves neither trace_filter nor "
+            "debug_traceBlockByNumber."
+        )
+
+    def served_modes(self) -> List[str]:
+        """
+        Returns the collection modes the node serves, from its
+        capabilities, in the order of COLLECTION_MODES.
+        """
+        capabilities = self.capabilities()
+        filters = capabilities["trace_filter"]
+        served = {
+            "transaction": filters,
+            "block": filters and capabilities["debug_traceBlockByNumber"],
+            "scan": capabilities["debug_traceBlockByNumber"],
+            "flat": filters and capabilities["trace_block"],
+        }
+        return [m for m in COLLECTION_MODES if served[m]]
+
+    def _sample_range(
+        self,
+        start: int,
+        end: int,
+        blocks: Dict[int, Set[str]] | None,
+        max_workers: int = 1,
+    ) -> List[RangeSample]:
+        """
+        Splits a block range into sub-ranges of PLAN_SEGMENT_SIZE blocks
+        and samples each: the matching transactions of its blocks, from
+        the trace_filter results in blocks, and the mean transaction
+        count of PLAN_SAMPLES of its blocks.
+        """
+        segments = [
+            (i, min(i + PLAN_SEGMENT_SIZE - 1, end))
+            for i in range(start, end + 1, PLAN_SEGMENT_SIZE)
+        ]
+        matching = None
+        if blocks is not None:
+            matching = [{} for _ in segments]
+            for block, txs in blocks.items():
+                matching[(block - start) // PLAN_SEGMENT_SIZE][block] = len(
+                    txs
+                )
+
+        def sample(segment: Tuple[int, int]) -> float:
+            first, last = segment
+            steps = max(PLAN_SAMPLES - 1, 1)
+            sampled = {
+                first + (last - first) * i // steps
+                for i in range(PLAN_SAMPLES)
+            }
+            counts = [
+                self._request(
+                    "state", self.w3.eth.get_block_transaction_count, b
+                )
+                for b in sorted(sampled)
+            ]
+            return sum(counts) / len(counts)
+
+        return [
+            RangeSample(
+                first,
+                last,
+                None if matching is None else matching[i],
+                txs_per_block,
+            )
+            for i, ((first, last), txs_per_block) in enumerate(
+                zip(
+                    segments,
+                    self._map_ordered(sample, segments, max_workers),
+                    strict=True,
+                )
+            )
+        ]
+
+    def _plan(
+        self,
+        start: int,
+        end: int,
+        contract_address: str,
+        batch_size: int = 1,
+        max_workers: int = 1,
+    ) -> Tuple[
+        List[Dict[str, Any]], List[RangeSample], Dict[int, Set[str]] | None
+    ]:
+        """
+        Plans the collection of a block range, see plan_range. Returns
+        the plan, the samples and the matching transactions by block,
+        None when the node does not serve trace_filter.
+        Raises:
+            ValueError: If the node serves no collection mode
+        """
+        modes = self.served_modes()
+        if not modes:
+            raise ValueError(
+                "The node serves neither trace_filter nor "
+                "debug_traceBlockByNumber."
+            )
+        blocks = None
+        if self.capabilities()["trace_filter"]:
+            blocks = self._filter_blocks_from(
+                hex(start), hex(end), contract_address, max_workers
+            )
+        samples = self._sample_range(start, end, blocks, max_workers)
+        plan = plan_range(samples, modes, batch_size)
+        self.logger.info(f"Collection plan: {plan}")
+        return plan, samples, blocks
+
+    def estimate(
+        self,
+        from_block: str,
+        to_block: str,
+        contract_address: str,
+        batch_size: int = 1,
+        max_workers: int = 1,
+    ) -> Dict[str, Any]:
+        """
+        Plans the collection of a block range as PLAN_MODE would,
+        without tracing anything, and returns the plan:
+        - "segments": the {"from_block", "to_block", "mode", "requests",
+          "traced_txs", "cost"} sub-ranges, in block order
+        - "requests" and "cost": the totals of the segments
+        - "matching_txs": the transactions calling the contract, None
+          when the node does not serve trace_filter
+        - "modes": the {"requests", "traced_txs", "cost"} estimate of
+          each served mode used for the whole range
+        Costs are relative, in requests, see collection_planner.
+        """
+        start = int(validate_and_convert_block(from_block), 16)
+        end = int(validate_and_convert_block(to_block), 16)
+        plan, samples, blocks = self._plan(
+            start, end, contract_address, batch_size, max_workers
+        )
+        modes = {}
+        for mode in self.served_modes():
+            estimates = [strategy_cost(mode, s, batch_size) for s in samples]
+            modes[mode] = {
+                key: round(sum(e[key] for e in estimates), 2)
+                for key in ("requests", "traced_txs", "cost")
+            }
+        return {
+            "segments": plan,
+            "requests": sum(s["requests"] for s in plan),
+            "cost": round(sum(s["cost"] for s in plan), 2),
+            "matching_txs": (
+                None
+                if blocks is None
+                else sum(len(txs) for txs in blocks.values())
+            ),
+            "modes": modes,
+        }
+
+    def _trace_txs(
+        self,
+        tx_hashes: List[str],
+        batch_size: int,
+        max_workers: int,
+        finalized: Set[str] = frozenset(),
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the trace of each transaction in the order of tx_hashes,
+        or an empty dict for transactions that could not be traced.
+        Traces of finalized transactions are read from and written to
+        the cache.
+        """
+        cached = {}
+        if self.cache is not None:
+            hits = self.cache.get_many(
+                (h for h in tx_hashes if h in finalized), self.tracer_config
             )
-            for subcall in call.get("calls", []):
-                self._extract_all_subcalls(subcall, calls)
-        for subcall in call.get("calls", []):
-            self._extract_calls(subcall, contract_address, calls)
+            cached = {h: trace for h, trace in hits.items() if trace}
+            self.logger.info(f"Found {len(cached)} cached traces.")
+        misses = [h for h in tx_hashes if h not in cached]
+
+        if batch_size > 1:
+            jobs = [
+                misses[i : i + batch_size]
+                for i in range(0, len(misses), batch_size)
+            ]
+
+            def fetch(batch: List[str]) -> List[Dict[str, Any]]:
+                traces = self._get_calls_from_txs(batch)
+                return [traces.get(h, {}) for h in batch]
+
+        else:
+            jobs = [[h] for h in misses]
+
+            def fetch(batch: List[str]) -> List[Dict[str, Any]]:
+                return [self._get_calls_from_tx(batch[0])]
+
+        def fetch_and_cache(batch: List[str]) -> List[Dict[str, Any]]:
+            traces = fetch(batch)
+            if self.cache is not None:
+                for h, trace in zip(batch, traces, strict=True):
+                    if trace and h in finalized:
+                        self.cache.put(h, self.tracer_config, trace)
+            return traces
+
+        fetched = (
+            trace
+            for traces in self._map_ordered(fetch_and_cache, jobs, max_workers)
+            for trace in traces
+        )
+        for h in tx_hashes:
+            yield cached[h] if h in cached else next(fetched)
 
     def get_calls(
-        self, tx_hashes: Set[str], contract_address: str
-    ) -> List[Dict[str, str]]:
+        self,
+        tx_hashes: Set[str],
+        contract_address: str,
+        batch_size: int = 1,
+        max_workers: int = 1,
+        finalized: Set[str] = frozenset(),
+        stream: bool = False,
+    ) -> List[Dict[str, Any]]:
         """
         Gets calls for a given set of transaction hashes and contract address.
+        With a batch_size above 1, transactions are traced in JSON-RPC
+        batches of that size instead of one request per transaction.
+        With max_workers above 1, traces are fetched in a thread pool while
+        the calling thread extracts them in transaction hash order.
+        Traces of the finalized transactions go through the cache.
+        With stream, each trace is parsed as it arrives, see _stream_calls,
+        and batch_size is ignored.
         """
         self.logger.info(f"Getting calls for contract {contract_address}.")
-        calls = []
-        for h in tx_hashes:
-            res = self._get_calls_from_tx(h)
-            if res:
-                self._extract_calls(res, contract_address, calls)
-        self.logger.info(f"Extracted {len(calls)} calls.")
+        if tx_hashes:
+            self._check_tracer(min(tx_hashes))
+        if self._can_stream(stream):
+            calls = self._stream_calls(
+                sorted(tx_hashes), contract_address, max_workers, finalized
+            )
+        else:
+            calls = CallAggregator()
+            for res in self._trace_txs(
+                sorted(tx_hashes), batch_size, max_workers, finalized
+            ):
+                if res:
+                    self._extract_calls(res, contract_address, calls)
+        self.logger.info(f"Extracted {len(calls)} edges.")
+        return calls.to_calls()
+
+    def _can_stream(self, stream: bool) -> bool:
+        """
+        Returns whether traces asked to be streamed can be, warning when
+        the provider cannot stream them.
+        Raises:
+            ImportError: If streaming is asked for without ijson installed
+        """
+        if stream and ijson is None:
+            raise ImportError(
+                "Streaming traces needs ijson, install scsc[stream]."
+            )
+        if stream and not isinstance(self.w3.provider, HTTPProvider):
+            self.logger.warning(
+                "Traces are only streamed over a single HTTP endpoint."
+            )
+            return False
+        return stream
+
+    def _stream_calls(
+        self,
+        tx_hashes: List[str],
+        contract_address: str,
+        max_workers: int,
+        finalized: Set[str],
+    ) -> CallAggregator:
+        """
+        Streams the trace of each transaction, one request per
+        transaction, so that memory stays flat however large a trace is.
+        Cached traces of finalized transactions are still used, but
+        streamed traces are not cached as no tree is built.
+        """
+        calls = CallAggregator()
+        for tx_calls in self._iter_stream_calls(
+            tx_hashes, contract_address, max_workers, finalized
+        ):
+            if tx_calls is not None:
+                calls.merge(tx_calls)
         return calls
 
+    def _iter_stream_calls(
+        self,
+        tx_hashes: List[str],
+        contract_address: str,
+        max_workers: int,
+        finalized: Set[str],
+    ) -> Iterator[CallAggregator | None]:
+        """
+        Yields the calls of each transaction in order, streamed as in
+        _stream_calls, or None if it could not be traced.
+        """
+
+        def fetch(tx_hash: str) -> CallAggregator | None:
+            if self.cache is not None and tx_hash in finalized:
+                trace = self.cache.get(tx_hash, self.tracer_config)
+                if trace:
+                    tx_calls = CallAggregator()
+                    self._extract_calls(trace, contract_address, tx_calls)
+                    return tx_calls
+            return self._stream_calls_from_tx(tx_hash, contract_address)
+
+        return self._map_ordered(fetch, tx_hashes, max_workers)
+
+    def _debug_trace_block(
+        self, block: int, tracer_config: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Sends debug_traceBlockByNumber for a block with a tracer config.
+        """
+        params = [hex(block), tracer_config]
+        if self.rpc is not None:
+            return self._request(
+                "trace",
+                self.rpc.request,
+                "debug_traceBlockByNumber",
+                params,
+            )
+        return self._request(
+            "trace",
+            self.w3.manager.request_blocking,
+            RPCEndpoint("debug_traceBlockByNumber"),
+            params,
+        )
+
+    def _get_calls_from_block(self, block: int) -> List[Dict[str, Any]]:
+        """
+        Gets calls from every transaction in a block.
+        Returns a list of {"txHash": ..., "result": ...} items.
+        """
+        self.logger.info(f"Tracing block {block}.")
+        try:
+            res = self._debug_trace_block(block, self.tracer_config)
+        except Exception as e:
+            self.logger.error(f"Error tracing block {block}: {e}")
+            self.failed_blocks.add(block)
+            return []
+        if res and "txHash" not in res[0]:
+            # Older nodes omit the hash, the traces follow the block order
+            tx_hashes = self._request("state", self.w3.eth.get_block, block)[
+                "transactions"
+            ]
+            res = [
+                {"txHash": self._tx_hash({"transactionHash": h}), **r}
+                for h, r in zip(tx_hashes, res, strict=True)
+            ]
+        return res
+
+    def _trace_block(
+        self, block: int, tx_hashes: Set[str], finalized: bool
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the traces of the given transactions of a block, in
+        transaction hash order. A finalized block is only traced when
+        one of its transactions is missing from the cache, and all of
+        its traces are cached afterwards.
+        """
+        tx_hashes = sorted(tx_hashes)
+        if self.cache is not None and finalized:
+            cached = self.cache.get_many(tx_hashes, self.tracer_config)
+            if all(cached.get(h) for h in tx_hashes):
+                return [cached[h] for h in tx_hashes]
+
+        traces = {
+            t["txHash"]: t.get("result")
+            for t in self._get_calls_from_block(block)
+        }
+        if self.cache is not None and finalized:
+            for h, trace in traces.items():
+                if trace:
+                    self.cache.put(h, self.tracer_config, trace)
+        self.failed_txs.update(h for h in tx_hashes if not traces.get(h))
+        return [traces.get(h) or {} for h in tx_hashes]
+
+    def _get_flat_traces_from_block(
+        self, block: int
+    ) -> Dict[str, List[Dict[str, Any]]] | None:
+        """
+        Gets the flat Parity traces of every transaction in a block with
+        a single trace_block request, grouped by transaction hash.
+        Returns None if the block could not be traced.
+        """
+        self.logger.info(f"Tracing block {block} with trace_block.")
+        try:
+            if self.rpc is not None:
+                res = self._request(
+                    "trace", self.rpc.request, "trace_block", [hex(block)]
+                )
+            else:
+                res = self._request(
+                    "trace",
+                    self.w3.manager.request_blocking,
+                    RPCEndpoint("trace_block"),
+                    [hex(block)],
+                )
+        except Exception as e:
+            self.logger.error(f"Error tracing block {block}: {e}")
+            return None
+        traces = {}
+        for t in res or []:
+            # Block rewards belong to no transaction
+            if t.get("transactionHash"):
+                traces.setdefault(self._tx_hash(t), []).append(t)
+        return traces
+
+    def _trace_flat_block(
+        self, block: int, tx_hashes: Set[str], finalized: bool
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Same as _trace_block, returning the flat traces of each given
+        transaction, an empty list for those that could not be traced.
+        """
+        tx_hashes = sorted(tx_hashes)
+        if self.cache is not None and finalized:
+            cached = self.cache.get_many(tx_hashes, FLAT_TRACES)
+            if all(cached.get(h) for h in tx_hashes):
+                return [cached[h] for h in tx_hashes]
+
+        traces = self._get_flat_traces_from_block(block) or {}
+        if self.cache is not None and finalized:
+            for h, trace in traces.items():
+                self.cache.put(h, FLAT_TRACES, trace)
+        self.failed_txs.update(h for h in tx_hashes if not traces.get(h))
+        return [traces.get(h) or [] for h in tx_hashes]
+
+    def get_calls_by_block(
+        self,
+        blocks: Dict[int, Set[str]],
+        contract_address: str,
+        max_workers: int = 1,
+        finalized_block: int = -1,
+    ) -> List[Dict[str, Any]]:
+        """
+        Gets calls for the given transactions by tracing their whole blocks
+        in one request per block. Other transactions of the blocks are
+        skipped. Blocks up to finalized_block go through the cache.
+        """
+        self.logger.info(f"Getting calls for contract {contract_address}.")
+        if blocks:
+            self._check_tracer(min(blocks[min(blocks)]))
+        calls = CallAggregator()
+        for traces in self._map_ordered(
+            lambda b: self._trace_block(b, blocks[b], b <= finalized_block),
+            sorted(blocks),
+            max_workers,
+        ):
+            for res in traces:
+                if res:
+                    self._extract_calls(res, contract_address, calls)
+        self.logger.info(f"Extracted {len(calls)} edges.")
+        return calls.to_calls()
+
+    @staticmethod
+    def _touches(trace: Dict[str, Any], contract_address: str) -> bool:
+        """
+        Returns whether a frame of a call tree is a call made by the
+        contract, the frames trace_filter matches.
+        """
+        stack = [trace]
+        while stack:
+            call = stack.pop()
+            if call["from"].lower() == contract_address:
+                return True
+            stack.extend(call.get("calls") or ())
+        return False
+
+    def _check_block_tracer(self, first: int, last: int) -> None:
+        """
+        Same as _check_tracer, tracing whole blocks from first to last
+        until one returns traces, since the tracer is not run on an
+        empty block. Blocks that callTracer cannot trace either are at
+        fault, not the tracer, and are skipped as well. Transient
+        errors, such as timeouts, say nothing of the tracer and are
+        raised.
+        """
+        if self._tracer_checked:
+            return
+        for block in range(first, last + 1):
+            try:
+                if not self._debug_trace_block(block, self.tracer_config):
+                    continue
+            except Exception as e:
+                if RetryPolicy.is_transient(e):
+                    raise
+                try:
+                    self._debug_trace_block(block, CALL_TRACER)
+                except Exception as fallback_error:
+                    if RetryPolicy.is_transient(fallback_error):
+                        raise
+                    continue
+                self.logger.warning(
+                    f"Custom tracer failed ({e}), falling back to callTracer."
+                )
+                self.tracer_config = CALL_TRACER
+            self._tracer_checked = True
+            return
+
+    def _scan_block(
+        self, block: int, contract_address: str, finalized: bool
+    ) -> List[Dict[str, Any]]:
+        """
+        Traces every transaction of a block and returns the call trees
+        touching the contract, in block order. The traces of a finalized
+        block are cached, so that later collections of the contract can
+        skip the node.
+        """
+        contract_address = contract_address.lower()
+        traces = []
+        for t in self._get_calls_from_block(block):
+            res = t.get("result")
+            if not res:
+                # The node failed to trace this transaction only
+                self.failed_txs.add(t["txHash"])
+            elif self._touches(res, contract_address):
+                traces.append(res)
+                if self.cache is not None and finalized:
+                    self.cache.put(t["txHash"], self.tracer_config, res)
+        return traces
+
+    def _validate_contracts(self, addresses: Set[str], block) -> Set[str]:
+        """
+        Returns the addresses holding contract code at block. Precompiles
+        are ruled out without I/O, known addresses are answered by the
+        code cache and the rest are looked up in JSON-RPC batches of
+        eth_getCode, falling back to _validate_contract for failed items.
+        """
+        try:
+            block_number = int(validate_and_convert_block(block), 16)
+            block_id = hex(block_number)
+        except ValueError:
+            block_number = None
+            block_id = block
+
+        contracts = set()
+        lookups = []
+        unresolved = []
+        for address in sorted(addresses):
+            if address.lower().startswith(PRECOMPILE_PREFIX):
+                continue
+            if not Web3.is_address(address):
+                unresolved.append(address)
+                continue
+            if block_number is not None:
+                has_code = self.code_cache.has_code(address, block_number)
+                if has_code is not None:
+                    if has_code:
+                        contracts.add(address)
+                    continue
+            lookups.append(address)
+
+        self.logger.info(
+            f"Validating {len(lookups)} of {len(addresses)} addresses."
+        )
+        for i in range(0, len(lookups), CODE_BATCH_SIZE):
+            batch = lookups[i : i + CODE_BATCH_SIZE]
+            results = self._make_batch_request(
+                [
+                    ("eth_getCode", [Web3.to_checksum_address(a), block_id])
+                    for a in batch
+                ]
+            )
+            for address, code in zip(batch, results, strict=True):
+                if code is None:
+                    unresolved.append(address)
+                    continue
+                code = code.hex() if isinstance(code, bytes) else code[2:]
+                if code == self.x0_bytecode:
+                    continue
+                if block_number is not None:
+                    self.code_cache.record(address, block_number, bool(code))
+                if code:
+                    contracts.add(address)
+
+        for address in unresolved:
+            if self._validate_contract(address, block):
+                contracts.add(address)
+        return contracts
+
     def _filter_contract_calls(
-        self, calls: List[Dict[str, str]], to_block
-    ) -> List[Dict[str, str]]:
+        self,
+        calls: List[Dict[str, Any]],
+        to_block,
+        validated: Dict[str, bool] | None = None,
+    ) -> List[Dict[str, Any]]:
         """
-        Filters calls to contract addresses.
+        Filters calls to contract addresses. Addresses in validated, a
+        memo of the addresses already checked at to_block, are not
+        looked up again, and the others are added to it, so that
+        filtering the edges of each transaction of a range validates
+        each address once.
         """
+        if validated is None:
+            validated = {}
+        addresses = {c["to"] for c in calls} | {c["from"] for c in calls}
+        unknown = addresses - validated.keys()
+        if unknown:
+            contracts = self._validate_contracts(unknown, to_block)
+            validated.update((a, a in contracts) for a in unknown)
         return [
-            c
-            for c in calls
-            if self._validate_contract(c["to"], to_block)
-            and self._validate_contract(c["from"], to_block)
+            c for c in calls if validated[c["to"]] and validated[c["from"]]
         ]
 
-    def get_calls_from(
-        self, from_block: str, to_block: str, contract_address: str
-    ) -> List[Dict[str, str]]:
+    def get_calls_many(
+        self,
+        from_block: str,
+        to_block: str,
+        contract_addresses: List[str],
+        batch_size: int = 1,
+        max_workers: int = 1,
+    ) -> Dict[str, List[Dict[str, Any]]]:
         """
-        Gets calls from a given block range and contract address.
+        Gets the calls of several contracts in a block range in a single
+        pass: one trace_filter over all the contracts, one trace per
+        matching transaction, and the calls of every contract that made
+        calls in a transaction extracted from its trace.
+        Returns the calls keyed by contract address, as given.
+        Raises:
+            ValueError: If a contract has no code at to_block
+        """
+        self.logger.info(
+            f"Getting calls from block {from_block} to {to_block} "
+            f"for {len(contract_addresses)} contracts."
+        )
+        invalid = [
+            a
+            for a in contract_addresses
+            if not self._validate_contract(a, to_block)
+        ]
+        if invalid:
+            raise ValueError(f"Invalid contract addresses: {invalid}")
+        finalized_block = -1
+        if self.cache is not None:
+            finalized_block = self._finalized_block()
+
+        contracts = {a.lower(): a for a in contract_addresses}
+        # Contracts making calls in each transaction
+        tx_contracts: Dict[str, Set[str]] = {}
+        finalized = set()
+        for r in self._trace_filter(
+            from_block, to_block, contract_addresses, max_workers
+        ):
+            tx_hash = self._tx_hash(r)
+            source = contracts.get(r["action"]["from"].lower())
+            if source is not None:
+                tx_contracts.setdefault(tx_hash, set()).add(source)
+            if r["blockNumber"] <= finalized_block:
+                finalized.add(tx_hash)
+        self.logger.info(f"Found {len(tx_contracts)} transactions.")
+
+        tx_hashes = sorted(tx_contracts)
+        if tx_hashes:
+            self._check_tracer(tx_hashes[0])
+        calls = {a: CallAggregator() for a in contract_addresses}
+        for tx_hash, res in zip(
+            tx_hashes,
+            self._trace_txs(tx_hashes, batch_size, max_workers, finalized),
+            strict=True,
+        ):
+            if res:
+                for contract_address in tx_contracts[tx_hash]:
+                    self._extract_calls(
+                        res, contract_address, calls[contract_address]
+                    )
+
+        # Callees shared by the contracts are checked for code once
+        edges = {a: c.to_calls() for a, c in calls.items()}
+        valid = self._validate_contracts(
+            {c[k] for e in edges.values() for c in e for k in ("from", "to")},
+            to_block,
+        )
+        return {
+            a: [c for c in e if c["from"] in valid and c["to"] in valid]
+            for a, e in edges.items()
+        }
+
+    def iter_calls(
+        self,
+        from_block: str,
+        to_block: str,
+        contract_address: str,
+        batch_size: int = 1,
+        max_workers: int = 1,
+        mode: str = "transaction",
+        stream: bool = False,
+        code_block: str | None = None,
+        cancel: threading.Event | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Collects calls from a given block range and contract address,
+        yielding records as the traces are processed:
+        - {"kind": "edges", "block": ..., "calls": [...]}, the calls of a
+          traced transaction, or block in "block" mode, as returned by
+          get_calls_from
+        - {"kind": "progress", "blocks_done": ..., "blocks_total": ...,
+          "txs_traced": ..., "txs_total": ..., "rpc_errors": ...}, after
+          the matching transactions are found and after each traced
+          transaction or block. blocks_done counts the blocks before the
+          one being traced, and rpc_errors the transactions, and scanned
+          blocks, that could not be traced.
+        The collection stops, skipping pending requests, once cancel is
+        set or when the caller stops iterating.
+        The "transaction" mode traces each matching transaction, the
+        "block" mode traces each block holding a matching transaction,
+        and the "flat" mode fetches the flat Parity traces of each such
+        block with trace_block instead of running a debug tracer, all
+        found with trace_filter. The "scan" mode traces every block
+        of the range and keeps the call trees touching the contract,
+        which only needs debug_traceBlockByNumber: txs_total is then
+        None, and txs_traced counts the matching transactions found so
+        far. AUTO_MODE picks one from the node capabilities, and
+        PLAN_MODE the cheapest served mode for each sub-range, as
+        reported by estimate.
+        With stream, transaction traces are parsed as they arrive
+        instead of being loaded whole. The contract and its callees
+        must hold code at code_block, to_block by default, which lets
+        a range be collected in chunks checked against the same block.
         """
         self.logger.info(
             f"Getting calls from block {from_block} \
             to {to_block} for contract {contract_address}."
         )
-        if not self._validate_contract(contract_address, to_block):
+        mode = self.resolve_mode(mode)
+        if stream and mode not in ("transaction", PLAN_MODE):
+            raise ValueError(
+                "Streaming is only supported in transaction mode."
+            )
+        if code_block is None:
+            code_block = to_block
+        if not self._validate_contract(contract_address, code_block):
             raise ValueError("Invalid contract address or bytecode.")
-        tx_hashes = self._filter_txs_from(
-            from_block, to_block, contract_address
-        )
-        calls = self.get_calls(tx_hashes, contract_address)
-        return  self._filter_contract_calls(calls, to_block)
+        finalized_block = -1
+        if self.cache is not None:
+            finalized_block = self._finalized_block()
+        start = int(validate_and_convert_block(from_block), 16)
+        end = int(validate_and_convert_block(to_block), 16)
+        if mode == PLAN_MODE:
+            plan, _, blocks = self._plan(
+                start, end, contract_address, batch_size, max_workers
+            )
+            segments = [
+                (s["from_block"], s["to_block"], s["mode"]) for s in plan
+            ]
+        elif mode == "scan":
+            # The transactions are only known once traced
+            segments = [(start, end, mode)]
+            blocks = None
+        else:
+            segments = [(start, end, mode)]
+            blocks = self._filter_blocks_from(
+                from_block, to_block, contract_address, max_workers
+            )
+        txs_total = None
+        if blocks is not None:
+            txs_total = sum(len(txs) for txs in blocks.values())
+
+        failed_before = len(self.failed_txs) + len(self.failed_blocks)
+        # Addresses checked for code at code_block, across records
+        validated: Dict[str, bool] = {}
+        progress = {
+            "kind": "progress",
+            "blocks_done": 0,
+            "blocks_total": end - start + 1,
+            "txs_traced": 0,
+            "txs_total": txs_total,
+            "rpc_errors": 0,
+        }
+        yield dict(progress)
+        for first, last, segment_mode in segments:
+            if segment_mode == "scan":
+                # Every block of the segment
+                segment = dict.fromkeys(range(first, last + 1))
+            else:
+                segment = {
+                    b: txs for b, txs in blocks.items() if first <= b <= last
+                }
+            if segment and segment_mode == "scan":
+                self._check_block_tracer(first, last)
+            elif segment and segment_mode != "flat":
+                self._check_tracer(min(segment[min(segment)]))
+            for block, n_txs, calls in self._iter_block_calls(
+                segment,
+                contract_address,
+                batch_size,
+                max_workers,
+                segment_mode,
+                stream,
+                finalized_block,
+            ):
+                if cancel is not None and cancel.is_set():
+                    self.logger.info("Collection cancelled.")
+                    return
+                calls = self._filter_contract_calls(
+                    calls.to_calls(), code_block, validated
+                )
+                if calls:
+                    yield {"kind": "edges", "block": block, "calls": calls}
+                progress["blocks_done"] = block - start
+                progress["txs_traced"] += n_txs
+                progress["rpc_errors"] = (
+                    len(self.failed_txs)
+                    + len(self.failed_blocks)
+                    - failed_before
+                )
+                yield dict(progress)
+        progress["blocks_done"] = progress["blocks_total"]
+        yield dict(progress)
+        for stats in self.endpoint_stats():
+            self.logger.info(f"Endpoint stats: {stats}")
+
+    def _iter_block_calls(
+        self,
+        blocks: Dict[int, Set[str]],
+        contract_address: str,
+        batch_size: int,
+        max_workers: int,
+        mode: str,
+        stream: bool,
+        finalized_block: int,
+    ) -> Iterator[Tuple[int, int, CallAggregator]]:
+        """
+        Yields the block, number of transactions and calls of each
+        traced transaction, or of each traced block in "block", "scan"
+        and "flat" mode, in block order. Transactions and blocks up to
+        finalized_block go through the cache, scanned blocks are only
+        cached.
+        """
+        if mode == "scan":
+            for block, traces in zip(
+                sorted(blocks),
+                self._map_ordered(
+                    lambda b: self._scan_block(
+                        b, contract_address, b <= finalized_block
+                    ),
+                    sorted(blocks),
+                    max_workers,
+                ),
+                strict=True,
+            ):
+                calls = CallAggregator()
+                for res in traces:
+                    self._extract_calls(res, contract_address, calls)
+                yield block, len(traces), calls
+            return
+
+        if mode == "flat":
+            for block, traces in zip(
+                sorted(blocks),
+                self._map_ordered(
+                    lambda b: self._trace_flat_block(
+                        b, blocks[b], b <= finalized_block
+                    ),
+                    sorted(blocks),
+                    max_workers,
+                ),
+                strict=True,
+            ):
+                calls = CallAggregator()
+                for res in traces:
+                    calls.add_flat_traces(res, contract_address)
+                yield block, len(traces), calls
+            return
+
+        if mode == "block":
+            for block, traces in zip(
+                sorted(blocks),
+                self._map_ordered(
+                    lambda b: self._trace_block(
+                        b, blocks[b], b <= finalized_block
+                    ),
+                    sorted(blocks),
+                    max_workers,
+                ),
+                strict=True,
+            ):
+                calls = CallAggregator()
+                for res in traces:
+                    if res:
+                        self._extract_calls(res, contract_address, calls)
+                yield block, len(traces), calls
+            return
+
+        txs = [(b, h) for b in sorted(blocks) for h in sorted(blocks[b])]
+        tx_hashes = [h for _, h in txs]
+        finalized = {h for b, h in txs if b <= finalized_block}
+        if self._can_stream(stream):
+            results = self._iter_stream_calls(
+                tx_hashes, contract_address, max_workers, finalized
+            )
+        else:
+            results = self._trace_txs(
+                tx_hashes, batch_size, max_workers, finalized
+            )
+        for (block, _), res in zip(txs, results, strict=True):
+            if isinstance(res, CallAggregator):
+                yield block, 1, res
+                continue
+            calls = CallAggregator()
+            if res:
+                self._extract_calls(res, contract_address, calls)
+            yield block, 1, calls
+
+    async def aiter_calls(
+        self, *args: Any, **kwargs: Any
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Asynchronous counterpart of iter_calls, taking the same
+        arguments, which runs the collection in a worker thread.
+        Cancelling the consuming task, or leaving the loop, cancels the
+        collection.
+        """
+        cancel = kwargs.pop("cancel", None) or threading.Event()
+        records = self.iter_calls(*args, cancel=cancel, **kwargs)
+        done = object()
+        try:
+            while True:
+                record = await asyncio.to_thread(next, records, done)
+                if record is done:
+                    return
+                yield record
+        finally:
+            cancel.set()
+            try:
+                records.close()
+            except ValueError:
+                # Still running in its thread, it stops at the next unit
+                pass
+
+    def get_calls_from(
+        self,
+        from_block: str,
+        to_block: str,
+        contract_address: str,
+        batch_size: int = 1,
+        max_workers: int = 1,
+        mode: str = "transaction",
+        stream: bool = False,
+        code_block: str | None = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Gets calls from a given block range and contract address,
+        aggregating the edges yielded by iter_calls, which documents the
+        arguments.
+        """
+        calls = CallAggregator()
+        for record in self.iter_calls(
+            from_block,
+            to_block,
+            contract_address,
+            batch_size,
+            max_workers,
+            mode,
+            stream,
+            code_block,
+        ):
+            if record["kind"] == "edges":
+                calls.add_calls(record["calls"])
+        return calls.to_calls()
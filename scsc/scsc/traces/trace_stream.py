@@ -0,0 +1,65 @@
+from typing import Any, Iterable, Iterator, Tuple
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Prefix of the callTracer frame in a JSON-RPC response, and the suffix
+# of the prefixes of its subcalls
+ROOT_FRAME = "result"
+SUBCALL_SUFFIX = ".calls.item"
+
+# Frame fields the aggregator needs, the rest is skipped
+FRAME_FIELDS = ("from", "to", "type")
+
+
+def _is_frame(prefix: str) -> bool:
+    return prefix == ROOT_FRAME or (
+        prefix.startswith(ROOT_FRAME) and prefix.endswith(SUBCALL_SUFFIX)
+    )
+
+
+def call_events(
+    parser: Iterable[Tuple[str, str, Any]],
+) -> Iterator[Tuple[str, str, str] | None]:
+    """
+    Turns the (prefix, event, value) events of an ijson parser over a
+    debug_traceTransaction response into call events: a (from, to, type)
+    tuple when a frame is entered and None when it is left. Only the
+    fields of the open frames are held, so memory grows with the depth
+    of the trace and not with its size.
+    Raises ValueError on JSON-RPC errors and on frames listing their
+    subcalls before their own fields, which callTracer never does.
+    """
+    # Fields of the open frames, and whether each was entered yet
+    frames = []
+    for prefix, event, value in parser:
+        if event == "start_map":
+            if _is_frame(prefix):
+                frames.append([{}, False])
+        elif event == "end_map":
+            if _is_frame(prefix):
+                fields, entered = frames.pop()
+                if not entered:
+                    yield _enter(fields)
+                yield None
+        elif event == "map_key":
+            if value == "calls" and _is_frame(prefix):
+                frame = frames[-1]
+                frame[1] = True
+                yield _enter(frame[0])
+        elif event == "string":
+            parent, _, key = prefix.rpartition(".")
+            if key in FRAME_FIELDS and _is_frame(parent):
+                frames[-1][0][key] = value
+            elif prefix == "error.message":
+                raise ValueError(value)
+
+
+def _enter(fields: dict) -> Tuple[str, str, str]:
+    try:
+        return fields["from"], fields["to"], fields["type"]
+    except KeyError as e:
+        message = f"Call frame without {e} before its subcalls."
+        raise ValueError(message) from e
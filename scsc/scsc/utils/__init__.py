@@ -1,6 +1,16 @@
+from scsc.utils.endpoint_pool import EndpointPool
 from scsc.utils.eth_utils import (
+    normalize_address,
     validate_and_convert_address,
     validate_and_convert_block,
 )
+from scsc.utils.providers import make_async_provider, make_provider
 
-__all__ = ["validate_and_convert_block", "validate_and_convert_address"]
+__all__ = [
+    "validate_and_convert_block",
+    "validate_and_convert_address",
+    "normalize_address",
+    "make_provider",
+    "make_async_provider",
+    "EndpointPool",
+]
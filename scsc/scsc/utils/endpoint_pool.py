@@ -0,0 +1,314 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List
+
+# Substrings of error messages nodes return for transient failures
+TRANSIENT_ERRORS = (
+    "too many requests",
+    "rate limit",
+    "timeout",
+    "timed out",
+    "busy",
+)
+# HTTP statuses of transient failures
+TRANSIENT_STATUSES = (429, 502, 503, 504)
+# JSON-RPC error codes of transient failures: "limit exceeded", and the
+# HTTP status some providers report as the code
+TRANSIENT_RPC_CODES = (-32005, *TRANSIENT_STATUSES)
+# A transient HTTP status as a word of a message, as in "503 Server
+# Error", rather than digits of a hash or of a longer number
+TRANSIENT_STATUS_PATTERN = re.compile(
+    r"\b(?:" + "|".join(map(str, TRANSIENT_STATUSES)) + r")\b"
+)
+# Weight of the latest request in the latency and error rate averages
+EWMA_ALPHA = 0.2
+# Seconds of latency a fully failing endpoint is penalized with
+ERROR_PENALTY = 1.0
+# Latencies kept per endpoint for the hedging percentile
+LATENCY_SAMPLES = 100
+
+
+def is_transient_message(message: str) -> bool:
+    """
+    Returns whether an error message reports a failure, such as a 429
+    or a timeout, that may go away when the request is sent again.
+    """
+    message = message.lower()
+    if any(e in message for e in TRANSIENT_ERRORS):
+        return True
+    return TRANSIENT_STATUS_PATTERN.search(message) is not None
+
+
+def is_transient_error(error: Any) -> bool:
+    """
+    Returns whether the error object of a JSON-RPC response reports a
+    transient failure, by its code or else by its message.
+    """
+    if not isinstance(error, dict):
+        return is_transient_message(str(error))
+    if error.get("code") in TRANSIENT_RPC_CODES:
+        return True
+    return is_transient_message(str(error.get("message", "")))
+
+
+def is_transient_response(response: Any) -> bool:
+    """
+    Returns whether a JSON-RPC response, or any response of a batch,
+    reports a transient error of its node.
+    """
+    responses = response if isinstance(response, list) else [response]
+    return any(
+        r.get("error") and is_transient_error(r["error"]) for r in responses
+    )
+
+
+class EndpointStats:
+    """
+    Request counters, latency and error rate of one endpoint.
+    """
+
+    __slots__ = (
+        "url",
+        "requests",
+        "errors",
+        "hedges",
+        "hedge_wins",
+        "latency",
+        "error_rate",
+        "latencies",
+        "consecutive_errors",
+        "unhealthy_until",
+    )
+
+    def __init__(self, url: str):
+        self.url = url
+        self.requests = 0
+        self.errors = 0
+        # Duplicates sent to this endpoint, and how many answered first
+        self.hedges = 0
+        self.hedge_wins = 0
+        # Moving averages, in seconds and as a fraction of requests
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.consecutive_errors = 0
+        self.unhealthy_until = 0.0
+
+    def score(self) -> float:
+        """
+        Lower is better: the average latency, penalized by the error
+        rate so that endpoints failing fast do not look fast.
+        """
+        return self.latency + ERROR_PENALTY * self.error_rate
+
+    def percentile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+class EndpointPool:
+    """
+    Spreads requests over several node endpoints, preferring those with
+    a low latency and error rate. Endpoints failing max_failures times
+    in a row are taken out of rotation for cooldown seconds. Requests
+    slower than the hedge_percentile of their endpoint's latencies are
+    duplicated to a second endpoint, and the first answer is used.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        hedge_percentile: float | None = 0.95,
+        hedge_min_samples: int = 20,
+        max_failures: int = 3,
+        cooldown: float = 30.0,
+        max_workers: int = 32,
+    ):
+        """
+        Initializes the EndpointPool.
+        Args:
+            urls: Node endpoints
+            hedge_percentile: Latency percentile after which a request
+                is hedged, None disables hedging
+            hedge_min_samples: Latencies an endpoint needs before its
+                requests are hedged
+            max_failures: Consecutive errors taking an endpoint out of
+                rotation
+            cooldown: Seconds an unhealthy endpoint stays out of rotation
+            max_workers: Threads running hedged requests
+        """
+        if not urls:
+            raise ValueError("EndpointPool needs at least one endpoint.")
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.endpoints = [EndpointStats(url) for url in urls]
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._executor = None
+        if hedge_percentile is not None and len(urls) > 1:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _healthy(self, exclude: int | None = None) -> List[int]:
+        now = time.monotonic()
+        healthy = [
+            i
+            for i, e in enumerate(self.endpoints)
+            if i != exclude and e.unhealthy_until <= now
+        ]
+        if healthy or exclude is not None:
+            return healthy
+        # Every endpoint is down, try the one back the soonest
+        return [
+            min(
+                range(len(self.endpoints)),
+                key=lambda i: self.endpoints[i].unhealthy_until,
+            )
+        ]
+
+    def pick(self, exclude: int | None = None) -> int | None:
+        """
+        Returns the index of the endpoint for the next request: the
+        better of two random healthy endpoints, which spreads the load
+        while avoiding slow and failing ones.
+        """
+        with self._lock:
+            healthy = self._healthy(exclude)
+            if not healthy:
+                return None
+            if len(healthy) == 1:
+                return healthy[0]
+            a, b = random.sample(healthy, 2)
+            if self.endpoints[a].score() <= self.endpoints[b].score():
+                return a
+            return b
+
+    def _record(self, index: int, latency: float, failed: bool) -> None:
+        with self._lock:
+            e = self.endpoints[index]
+            e.requests += 1
+            e.latency += EWMA_ALPHA * (latency - e.latency)
+            e.error_rate += EWMA_ALPHA * (failed - e.error_rate)
+            if not failed:
+                e.latencies.append(latency)
+                e.consecutive_errors = 0
+                return
+            e.errors += 1
+            e.consecutive_errors += 1
+            if e.consecutive_errors >= self.max_failures:
+                e.unhealthy_until = time.monotonic() + self.cooldown
+                e.consecutive_errors = 0
+                self.logger.warning(
+                    f"Taking {e.url} out of rotation for {self.cooldown}s."
+                )
+
+    def _run(
+        self,
+        index: int,
+        fn: Callable[[int], Any],
+        is_error: Callable[[Any], bool] | None,
+    ) -> Any:
+        """
+        Runs fn on an endpoint and records the outcome. Results flagged
+        by is_error count as errors but are still returned.
+        """
+        start = time.monotonic()
+        try:
+            result = fn(index)
+        except Exception:
+            self._record(index, time.monotonic() - start, True)
+            raise
+        failed = is_error is not None and is_error(result)
+        self._record(index, time.monotonic() - start, failed)
+        return result
+
+    def _hedge_after(self, index: int) -> float | None:
+        if self._executor is None:
+            return None
+        with self._lock:
+            e = self.endpoints[index]
+            if len(e.latencies) < self.hedge_min_samples:
+                return None
+            return e.percentile(self.hedge_percentile)
+
+    def call(
+        self,
+        fn: Callable[[int], Any],
+        is_error: Callable[[Any], bool] | None = None,
+    ) -> Any:
+        """
+        Returns fn(index) for the endpoint picked for this request,
+        hedged to a second endpoint when it is slow.
+        """
+        index = self.pick()
+        threshold = self._hedge_after(index)
+        if threshold is None:
+            return self._run(index, fn, is_error)
+
+        primary = self._executor.submit(self._run, index, fn, is_error)
+        done, _ = wait([primary], timeout=threshold)
+        other = None if done else self.pick(exclude=index)
+        if other is None:
+            return primary.result()
+
+        with self._lock:
+            self.endpoints[other].hedges += 1
+        hedge = self._executor.submit(self._run, other, fn, is_error)
+        pending = {primary, hedge}
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    first_error = first_error or future.exception()
+                    continue
+                result = future.result()
+                if pending and is_error is not None and is_error(result):
+                    # The other endpoint may still answer properly
+                    first_error = first_error or result
+                    continue
+                if future is hedge:
+                    with self._lock:
+                        self.endpoints[other].hedge_wins += 1
+                return result
+        if isinstance(first_error, Exception):
+            raise first_error
+        return first_error
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Returns the counters, latencies and health of each endpoint.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "url": e.url,
+                    "requests": e.requests,
+                    "errors": e.errors,
+                    "error_rate": round(e.error_rate, 3),
+                    "latency_ms": round(e.latency * 1000, 1),
+                    "p50_ms": _ms(e.percentile(0.5)),
+                    "p95_ms": _ms(e.percentile(0.95)),
+                    "hedges": e.hedges,
+                    "hedge_wins": e.hedge_wins,
+                    "healthy": e.unhealthy_until <= now,
+                }
+                for e in self.endpoints
+            ]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 1)
@@ -1,5 +1,12 @@
+from functools import lru_cache
+
+from eth_utils import is_hex_address
 from web3 import Web3
 
+# Addresses whose checksum form is kept, so that its keccak hash is
+# computed once per address instead of once per trace frame
+ADDRESS_CACHE_SIZE = 100000
+
 
 def validate_and_convert_block(block: str) -> str:
     """
@@ -38,3 +45,15 @@ def validate_and_convert_address(address: str) -> str:
     if not Web3.is_address(address):
         raise ValueError(f"Invalid Ethereum address: {address}")
     return Web3.to_checksum_address(address)
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def normalize_address(address: str) -> str:
+    """
+    Returns the checksum form of an address, in which web3.py formats
+    trace results, whatever the case the node sent it in. Values that
+    are not 20-byte hex addresses are returned unchanged.
+    """
+    if is_hex_address(address):
+        return Web3.to_checksum_address(address)
+    return address
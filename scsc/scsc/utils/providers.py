@@ -0,0 +1,151 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import (
+    AsyncHTTPProvider,
+    AsyncIPCProvider,
+    HTTPProvider,
+    IPCProvider,
+    LegacyWebSocketProvider,
+    WebSocketProvider,
+)
+from web3.providers import AsyncBaseProvider, BaseProvider, JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from scsc.utils.endpoint_pool import EndpointPool, is_transient_response
+
+IPC_SCHEME = "ipc://"
+WS_SCHEMES = ("ws://", "wss://")
+HTTP_SCHEMES = ("http://", "https://")
+# Separator of the endpoints of a pooled node URL
+URL_SEPARATOR = ","
+# Methods spread over the endpoints of a pool, others go to the first
+POOLED_METHOD_PREFIXES = ("trace_", "debug_trace")
+
+
+def make_http_session(pool_size: int = 10) -> requests.Session:
+    """
+    Returns a requests session keeping up to pool_size connections to
+    the node alive.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    for scheme in HTTP_SCHEMES:
+        session.mount(scheme, adapter)
+    return session
+
+
+class LockedWebSocketProvider(LegacyWebSocketProvider):
+    """
+    LegacyWebSocketProvider safe to share between threads. Its requests
+    go over a single socket on which only one response can be awaited at
+    a time, so they are sent one after the other, as IPCProvider does.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        with self._lock:
+            return super().make_request(method, params)
+
+    def make_batch_request(
+        self, requests: List[Tuple[RPCEndpoint, Any]]
+    ) -> List[RPCResponse]:
+        with self._lock:
+            return super().make_batch_request(requests)
+
+
+class PooledProvider(JSONBaseProvider):
+    """
+    Provider over several node endpoints. Trace requests are spread and
+    hedged over the endpoints by an EndpointPool, other requests go to
+    the first endpoint.
+    """
+
+    def __init__(self, providers: List[BaseProvider], pool: EndpointPool):
+        super().__init__()
+        self.providers = providers
+        self.pool = pool
+
+    @staticmethod
+    def _pooled(method: str) -> bool:
+        return method.startswith(POOLED_METHOD_PREFIXES)
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if not self._pooled(method):
+            return self.providers[0].make_request(method, params)
+        return self.pool.call(
+            lambda i: self.providers[i].make_request(method, params),
+            is_transient_response,
+        )
+
+    def make_batch_request(
+        self, requests: List[Tuple[RPCEndpoint, Any]]
+    ) -> List[RPCResponse] | RPCResponse:
+        if not requests or not self._pooled(requests[0][0]):
+            return self.providers[0].make_batch_request(requests)
+        return self.pool.call(
+            lambda i: self.providers[i].make_batch_request(requests),
+            is_transient_response,
+        )
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Returns the per-endpoint stats of the pool.
+        """
+        return self.pool.stats()
+
+
+def split_urls(url: str) -> List[str]:
+    """
+    Returns the endpoints of a comma separated node URL.
+    """
+    return [u.strip() for u in url.split(URL_SEPARATOR) if u.strip()]
+
+
+def make_provider(
+    url: str, pool_size: int = 10, pool: Optional[EndpointPool] = None
+) -> BaseProvider:
+    """
+    Returns the web3.py provider for a node URL, selected by its scheme:
+    ipc:///path/to/node.ipc, ws(s)://host:port or http(s)://host:port.
+    HTTP connections are pooled, see make_http_session, while IPC and
+    WebSocket requests from several threads are serialized over their
+    single connection. A comma separated list of URLs gives a
+    PooledProvider over all of them, balanced by pool or else by a new
+    EndpointPool over the URLs.
+    """
+    if URL_SEPARATOR in url:
+        urls = split_urls(url)
+        return PooledProvider(
+            [make_provider(u, pool_size) for u in urls],
+            pool or EndpointPool(urls),
+        )
+    if url.startswith(IPC_SCHEME):
+        return IPCProvider(url[len(IPC_SCHEME) :])
+    if url.startswith(WS_SCHEMES):
+        return LockedWebSocketProvider(url)
+    if url.startswith(HTTP_SCHEMES):
+        return HTTPProvider(url, session=make_http_session(pool_size))
+    raise ValueError(f"Unsupported node URL scheme: {url}")
+
+
+def make_async_provider(url: str) -> AsyncBaseProvider:
+    """
+    Asynchronous counterpart of make_provider. IPC and WebSocket
+    providers hold a persistent connection that has to be opened with
+    connect(). Pooled URLs are not supported.
+    """
+    if URL_SEPARATOR in url:
+        raise ValueError(f"Pooled node URLs need a sync provider: {url}")
+    if url.startswith(IPC_SCHEME):
+        return AsyncIPCProvider(url[len(IPC_SCHEME) :])
+    if url.startswith(WS_SCHEMES):
+        return WebSocketProvider(url)
+    if url.startswith(HTTP_SCHEMES):
+        return AsyncHTTPProvider(url)
+    raise ValueError(f"Unsupported node URL scheme: {url}")
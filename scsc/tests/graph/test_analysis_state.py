@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from scsc.graph import AnalysisState
+
+
+class TestAnalysisState(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state.db")
+        self.state = AnalysisState(self.path)
+
+    def tearDown(self):
+        self.state.close()
+        self.tmp.cleanup()
+
+    def test_empty(self):
+        self.assertEqual(self.state.processed_ranges("0xA"), [])
+        self.assertEqual(self.state.edges("0xA"), [])
+        self.assertEqual(self.state.failed_transactions("0xA"), set())
+
+    def test_checkpoint(self):
+        calls = [{"from": "0xa", "to": "0xb", "types": {"CALL": 2}}]
+        self.state.checkpoint("0xA", 10, 19, calls, {"0x1"})
+        self.state.checkpoint(
+            "0xA",
+            20,
+            29,
+            calls + [{"from": "0xa", "to": "0xc", "types": {"STATICCALL": 1}}],
+            {"0x2"},
+        )
+        self.state.close()
+
+        self.state = AnalysisState(self.path)
+        self.assertEqual(self.state.processed_ranges("0xa"), [(10, 29)])
+        self.assertEqual(
+            self.state.edges("0xa"),
+            [("0xa", "0xb", "CALL", 4), ("0xa", "0xc", "STATICCALL", 1)],
+        )
+        self.assertEqual(self.state.failed_transactions("0xA"), {"0x1", "0x2"})
+        self.assertEqual(self.state.processed_ranges("0xB"), [])
+
+    def test_disjoint_ranges(self):
+        for first, last in [(100, 200), (500, 600), (0, 50), (300, 310)]:
+            self.state.checkpoint("0xA", first, last, [])
+        self.assertEqual(
+            self.state.processed_ranges("0xA"),
+            [(0, 50), (100, 200), (300, 310), (500, 600)],
+        )
+        # Filling a gap merges the ranges it touches
+        self.state.checkpoint("0xA", 201, 299, [])
+        self.state.checkpoint("0xA", 550, 650, [])
+        self.assertEqual(
+            self.state.processed_ranges("0xA"),
+            [(0, 50), (100, 310), (500, 650)],
+        )
+
+    def test_single_range_state(self):
+        self.state.close()
+        db = sqlite3.connect(self.path)
+        db.execute("DROP TABLE block_ranges")
+        db.execute(
+            "CREATE TABLE ranges (contract TEXT PRIMARY KEY, "
+            "first_block INTEGER NOT NULL, last_block INTEGER NOT NULL)"
+        )
+        db.execute("INSERT INTO ranges VALUES ('0xa', 10, 29)")
+        db.commit()
+        db.close()
+
+        self.state = AnalysisState(self.path)
+        self.assertEqual(self.state.processed_ranges("0xA"), [(10, 29)])
+        self.state.checkpoint("0xA", 30, 39, [])
+        self.assertEqual(self.state.processed_ranges("0xA"), [(10, 39)])
+
+
+if __name__ == "__main__":
+    unittest.main()
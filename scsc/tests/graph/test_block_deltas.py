@@ -0,0 +1,50 @@
+import unittest
+
+from scsc.graph import BlockDeltas
+from scsc.graph.block_deltas import BlockDelta
+
+
+def delta(number, block_hash, parent_hash):
+    calls = [{"from": "0xa", "to": "0xb", "types": {"CALL": number}}]
+    return BlockDelta(number, block_hash, parent_hash, calls, set())
+
+
+class TestBlockDeltas(unittest.TestCase):
+    def setUp(self):
+        self.deltas = BlockDeltas(finality_depth=2)
+        for n in range(10, 14):
+            self.deltas.add(delta(n, f"h{n}", f"h{n - 1}"))
+
+    def test_add(self):
+        self.assertEqual(len(self.deltas), 4)
+        self.assertEqual(self.deltas.tip, 13)
+        self.assertIn("h12", self.deltas)
+        self.assertEqual(self.deltas.block_hash(12), "h12")
+        with self.assertRaises(ValueError):
+            self.deltas.add(delta(15, "h15", "h14"))
+
+    def test_extends(self):
+        self.assertTrue(self.deltas.extends(14, "h13"))
+        self.assertFalse(self.deltas.extends(14, "x13"))
+        # Blocks before the window cannot be checked
+        self.assertTrue(self.deltas.extends(10, "x9"))
+
+    def test_rollback(self):
+        removed = self.deltas.rollback(11)
+        self.assertEqual([d.number for d in removed], [13, 12])
+        self.assertEqual(self.deltas.tip, 11)
+        self.assertNotIn("h12", self.deltas)
+        self.deltas.add(delta(12, "x12", "h11"))
+        self.assertEqual(self.deltas.rollback(20), [])
+
+    def test_compact(self):
+        compacted = self.deltas.compact(13)
+        self.assertEqual([d.number for d in compacted], [10, 11])
+        self.assertEqual(len(self.deltas), 2)
+        self.assertEqual(self.deltas.compact(13), [])
+        self.assertEqual(len(self.deltas.compact(20)), 2)
+        self.assertIsNone(self.deltas.tip)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -23,6 +23,28 @@ class TestCallGraph(unittest.TestCase):
         edge_data = self.call_graph.G.edges[from_address, to_address]["types"]
         self.assertEqual(edge_data["CALL"], 1)
 
+    def test_add_call_count(self):
+        from_address = "0x123"
+        to_address = "0x456"
+        self.call_graph.add_call(from_address, to_address, "CALL")
+        self.call_graph.add_call(from_address, to_address, "CALL", 3)
+        edge_data = self.call_graph.G.edges[from_address, to_address]["types"]
+        self.assertEqual(edge_data["CALL"], 4)
+
+    def test_remove_call(self):
+        self.call_graph.add_call("0x123", "0x456", "CALL", 3)
+        self.call_graph.add_call("0x123", "0x456", "STATICCALL")
+        self.call_graph.add_call("0x123", "0x789", "CALL")
+        self.call_graph.remove_call("0x123", "0x456", "CALL", 3)
+        edge_data = self.call_graph.G.edges["0x123", "0x456"]["types"]
+        self.assertEqual(edge_data, {"STATICCALL": 1})
+        self.call_graph.remove_call("0x123", "0x456", "STATICCALL")
+        self.assertFalse(self.call_graph.G.has_edge("0x123", "0x456"))
+        self.assertEqual(
+            sorted(self.call_graph.get_all_contracts()), ["0x123", "0x789"]
+        )
+        self.call_graph.remove_call("0x123", "0x456", "CALL")
+
     def test_get_callee_contracts(self):
         from_address = "0x123"
         to_address = "0x456"
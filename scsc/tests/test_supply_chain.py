@@ -0,0 +1,238 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from web3 import Web3
+
+from scsc.graph import AnalysisState
+from scsc.supply_chain import SupplyChain
+
+CONTRACT = Web3.to_checksum_address("0x" + "a" * 40)
+
+
+class TestSupplyChain(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state.db")
+        patcher = patch("scsc.supply_chain.TraceCollector")
+        self.tc = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.tc.failed_txs = set()
+        self.ranges = []
+
+        def get_calls_from(from_block, to_block, *args):
+            self.ranges.append((int(from_block, 16), int(to_block, 16)))
+            return [{"from": CONTRACT, "to": "0xb", "types": {"CALL": 1}}]
+
+        self.tc.get_calls_from.side_effect = get_calls_from
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def supply_chain(self, state):
+        return SupplyChain("http://mock.ethereum.node", CONTRACT, state=state)
+
+    def calls(self, sc):
+        return sc.cg.G.edges[CONTRACT, "0xb"]["types"]["CALL"]
+
+    def test_resume(self):
+        state = AnalysisState(self.path)
+        sc = self.supply_chain(state)
+        sc.collect_calls(100, 124, checkpoint_blocks=10)
+        self.assertEqual(self.ranges, [(100, 109), (110, 119), (120, 124)])
+        self.assertEqual(self.calls(sc), 3)
+        # Every chunk is checked against the requested to_block
+        for call in self.tc.get_calls_from.call_args_list:
+            self.assertEqual(call.args[-1], hex(124))
+        state.close()
+
+        # Extending the range only collects the missing blocks
+        self.ranges.clear()
+        state = AnalysisState(self.path)
+        sc = self.supply_chain(state)
+        self.assertEqual(self.calls(sc), 3)
+        sc.collect_calls(95, 130, checkpoint_blocks=10)
+        self.assertEqual(self.ranges, [(95, 99), (125, 130)])
+        self.assertEqual(self.calls(sc), 5)
+        self.assertEqual(
+            state.processed_ranges(sc.cg.contract_address), [(95, 130)]
+        )
+        state.close()
+
+    def test_resume_disjoint(self):
+        state = AnalysisState(self.path)
+        sc = self.supply_chain(state)
+        sc.collect_calls(100, 200, checkpoint_blocks=1000)
+        # Only the requested blocks are collected, not those in between
+        self.ranges.clear()
+        sc.collect_calls(500, 600, checkpoint_blocks=1000)
+        sc.collect_calls(0, 50, checkpoint_blocks=1000)
+        self.assertEqual(self.ranges, [(500, 600), (0, 50)])
+        self.assertEqual(
+            state.processed_ranges(CONTRACT), [(0, 50), (100, 200), (500, 600)]
+        )
+        # A range spanning the gaps only collects the gaps
+        self.ranges.clear()
+        sc.collect_calls(40, 550, checkpoint_blocks=1000)
+        self.assertEqual(self.ranges, [(51, 99), (201, 499)])
+        self.assertEqual(state.processed_ranges(CONTRACT), [(0, 600)])
+        self.assertEqual(self.calls(sc), 5)
+        state.close()
+
+    def test_resume_mixed_case(self):
+        callee = "0x" + "b" * 40
+        state = AnalysisState(self.path)
+        for address in (callee, Web3.to_checksum_address(callee)):
+            calls = [{"from": CONTRACT, "to": address, "types": {"CALL": 1}}]
+            state.checkpoint(CONTRACT, 1, 2, calls)
+        sc = self.supply_chain(state)
+        self.assertEqual(
+            sc.get_all_dependencies(), [Web3.to_checksum_address(callee)]
+        )
+        self.assertEqual(
+            sc.cg.G.edges[CONTRACT, Web3.to_checksum_address(callee)]["types"],
+            {"CALL": 2},
+        )
+        state.close()
+
+    def test_interrupted(self):
+        state = AnalysisState(self.path)
+        sc = self.supply_chain(state)
+        calls = self.tc.get_calls_from.side_effect
+
+        def fail_late(from_block, to_block, *args):
+            if int(from_block, 16) >= 120:
+                raise ConnectionError("node down")
+            return calls(from_block, to_block, *args)
+
+        self.tc.get_calls_from.side_effect = fail_late
+        with self.assertRaises(ConnectionError):
+            sc.collect_calls(100, 139, checkpoint_blocks=10)
+        self.assertEqual(
+            state.processed_ranges(sc.cg.contract_address), [(100, 119)]
+        )
+        state.close()
+
+    def test_collect_many(self):
+        other = "0x" + "c" * 40
+        sc = self.supply_chain(None)
+        self.tc.get_calls_many.side_effect = lambda f, t, addresses, *args: {
+            a: [{"from": a, "to": "0xb", "types": {"CALL": 1}}]
+            for a in addresses
+        }
+        graphs = sc.collect_many([other, CONTRACT, other.upper()], 1, 2)
+        self.assertEqual(
+            list(graphs), [Web3.to_checksum_address(other), CONTRACT]
+        )
+        self.assertIs(graphs[CONTRACT], sc.cg)
+        self.assertEqual(self.calls(sc), 1)
+        with self.assertRaises(ValueError):
+            sc.collect_many([other], 2, 1)
+
+    def follow_chain(self, chain, heads, callees):
+        """
+        Serves a chain of block hashes by number, with the callee called
+        in each block keyed by hash.
+        """
+        self.tc.block_number.side_effect = lambda: next(heads)
+        self.tc.block_hashes.side_effect = lambda n: (chain[n], chain[n - 1])
+
+        def get_calls_from(from_block, to_block, *args):
+            self.ranges.append((int(from_block, 16), int(to_block, 16)))
+            callee = callees[chain[int(to_block, 16)]]
+            return [{"from": CONTRACT, "to": callee, "types": {"CALL": 1}}]
+
+        self.tc.get_calls_from.side_effect = get_calls_from
+
+    @patch("scsc.supply_chain.time.sleep")
+    def test_follow(self, mock_sleep):
+        chain = {10: "0x0a", 11: "0x0b", 12: "0x0c", 13: "0x0d"}
+        callees = {"0x0b": "0xb", "0x0c": "0xb", "0x0d": "0xc"}
+        self.follow_chain(chain, iter([10, 12, 12, 13]), callees)
+        sc = self.supply_chain(None)
+        events = sc.follow(poll_interval=1)
+        event = next(events)
+        self.assertEqual((event["from_block"], event["to_block"]), (11, 12))
+        self.assertEqual(event["new_dependencies"], ["0xb"])
+        # Block 13 brings a new dependency, after one idle poll
+        event = next(events)
+        self.assertEqual((event["from_block"], event["to_block"]), (13, 13))
+        self.assertEqual(event["new_dependencies"], ["0xc"])
+        self.assertEqual(event["removed_edges"], [])
+        mock_sleep.assert_called_once_with(1)
+        self.assertEqual(self.ranges, [(11, 11), (12, 12), (13, 13)])
+        self.assertEqual(self.calls(sc), 2)
+
+    def test_follow_reorg(self):
+        chain = {10: "0x0a", 11: "0x0b", 12: "0x0c"}
+        callees = {"0x0b": "0xb", "0x0c": "0xc", "0x1c": "0xd", "0x1d": "0xd"}
+        self.follow_chain(chain, iter([10, 12, 13]), callees)
+        sc = self.supply_chain(None)
+        events = sc.follow()
+        next(events)
+        # Block 12 is replaced, and block 13 built on the new one
+        chain.update({12: "0x1c", 13: "0x1d"})
+        event = next(events)
+        self.assertEqual((event["from_block"], event["to_block"]), (12, 13))
+        self.assertEqual(event["orphaned_blocks"], 1)
+        self.assertEqual(
+            event["removed_edges"], [{"from": CONTRACT, "to": "0xc"}]
+        )
+        self.assertEqual(event["new_dependencies"], ["0xd"])
+        self.assertNotIn("0xc", sc.get_all_dependencies())
+        self.assertEqual(sc.cg.G.edges[CONTRACT, "0xd"]["types"], {"CALL": 2})
+
+    def test_follow_checkpoints_final_blocks(self):
+        state = AnalysisState(self.path)
+        chain = {n: hex(n) for n in range(9, 16)}
+        callees = dict.fromkeys(chain.values(), "0xb") | {hex(15): "0xc"}
+        self.follow_chain(chain, iter([10, 13, 15]), callees)
+        sc = self.supply_chain(state)
+        events = sc.follow(finality_depth=2)
+        next(events)
+        self.assertEqual(self.ranges, [(11, 11), (12, 12), (13, 13)])
+        self.assertEqual(state.processed_ranges(CONTRACT), [(11, 11)])
+        next(events)
+        self.assertEqual(state.processed_ranges(CONTRACT), [(11, 13)])
+        self.assertEqual(state.edges(CONTRACT), [(CONTRACT, "0xb", "CALL", 3)])
+        state.close()
+
+    def test_follow_after_gap(self):
+        state = AnalysisState(self.path)
+        state.checkpoint(CONTRACT, 100, 200, [])
+        chain = {n: hex(n) for n in range(999, 1007)}
+        callees = dict.fromkeys(chain.values(), "0xb") | {hex(1006): "0xc"}
+        self.follow_chain(chain, iter([1004, 1006]), callees)
+        sc = self.supply_chain(state)
+        events = sc.follow(1000, finality_depth=2)
+        next(events)
+        self.assertEqual(
+            self.ranges, [(1000, 1002), (1003, 1003), (1004, 1004)]
+        )
+        next(events)
+        # Blocks 201-999 were never collected
+        self.assertEqual(
+            state.processed_ranges(CONTRACT), [(100, 200), (1000, 1004)]
+        )
+        state.close()
+
+    def test_follow_skips_processed_blocks(self):
+        state = AnalysisState(self.path)
+        state.checkpoint(CONTRACT, 100, 200, [])
+        chain = {n: hex(n) for n in range(149, 204)}
+        callees = dict.fromkeys(chain.values(), "0xb")
+        self.follow_chain(chain, iter([202, 204]), callees)
+        sc = self.supply_chain(state)
+        next(sc.follow(150, finality_depth=5))
+        self.assertEqual(self.ranges, [(201, 201), (202, 202)])
+        self.assertEqual(self.calls(sc), 2)
+
+        # Blocks processed after from_block cannot be followed again
+        with self.assertRaises(ValueError):
+            next(sc.follow(50))
+        state.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
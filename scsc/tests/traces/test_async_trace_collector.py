@@ -0,0 +1,128 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from scsc.traces import AsyncTraceCollector
+
+
+class TestAsyncTraceCollector(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.trace_collector = AsyncTraceCollector(
+            url="http://mock.ethereum.node", max_concurrency=2
+        )
+        self.trace_collector.w3 = MagicMock()
+
+    async def test_connect_failure(self):
+        self.trace_collector.w3.is_connected = AsyncMock(return_value=False)
+        with self.assertRaises(ConnectionError):
+            await self.trace_collector.connect()
+
+    async def test_get_calls_bounded_concurrency(self):
+        in_flight = 0
+        max_in_flight = 0
+
+        async def trace_transaction(tx_hash, config):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return {"from": "0x1", "to": "0x2", "type": "CALL"}
+
+        self.trace_collector.w3.geth.debug.trace_transaction = (
+            trace_transaction
+        )
+
+        calls = await self.trace_collector.get_calls(
+            {"0xa", "0xb", "0xc", "0xd", "0xe"}, "0x1"
+        )
+        self.assertEqual(calls[0]["types"], {"CALL": 5})
+        self.assertEqual(max_in_flight, 2)
+
+    async def test_get_calls_from_tx_error(self):
+        self.trace_collector.w3.geth.debug.trace_transaction = AsyncMock(
+            side_effect=Exception("timeout")
+        )
+        res = await self.trace_collector._get_calls_from_tx("0x1")
+        self.assertEqual(res, {})
+
+    @patch("scsc.traces.async_trace_collector.TRACE_FILTER_CHUNK_SIZE", 4)
+    @patch("scsc.traces.async_trace_collector.TRACE_FILTER_PAGE_SIZE", 2)
+    async def test_filter_txs_bisects_and_paginates(self):
+        requested = []
+
+        # Mock a node that fails on ranges wider than 2 blocks
+        async def coro_request(method, params):
+            start = int(params[0]["fromBlock"], 16)
+            end = int(params[0]["toBlock"], 16)
+            requested.append((start, end))
+            if end - start > 1:
+                raise TimeoutError("query timeout exceeded")
+            traces = [
+                {"transactionHash": hex(b) + str(i), "type": "call"}
+                for b in range(start, end + 1)
+                for i in range(2)
+            ]
+            return traces[params[0]["after"] :][: params[0]["count"]]
+
+        self.trace_collector.w3.manager.coro_request = coro_request
+
+        tx_hashes = await self.trace_collector._filter_txs_from(
+            "0x1", "0x6", "0x123"
+        )
+        self.assertEqual(
+            tx_hashes, {hex(b) + str(i) for b in range(1, 7) for i in range(2)}
+        )
+        # The range is chunked before it is bisected
+        self.assertIn((1, 4), requested)
+        self.assertIn((5, 6), requested)
+        self.assertNotIn((1, 6), requested)
+
+    async def test_filter_txs_single_block_failure(self):
+        self.trace_collector.w3.manager.coro_request = AsyncMock(
+            side_effect=Exception("limit")
+        )
+        with self.assertRaises(RuntimeError):
+            await self.trace_collector._filter_txs_from("0x1", "0x2", "0x123")
+
+    @patch.object(
+        AsyncTraceCollector, "_filter_txs_from", return_value={"0x123"}
+    )
+    async def test_get_calls_from(self, mock_filter_txs_from):
+        self.trace_collector.w3.geth.debug.trace_transaction = AsyncMock(
+            return_value={
+                "from": "0xabc",
+                "to": "0xdef",
+                "type": "call",
+                "calls": [{"from": "0xdef", "to": "0x000", "type": "call"}],
+            }
+        )
+
+        async def validate_contract(address, block):
+            return address != "0x000"
+
+        with patch.object(
+            self.trace_collector,
+            "_validate_contract",
+            side_effect=validate_contract,
+        ):
+            result = await self.trace_collector.get_calls_from(
+                "0x1", "0x5", "0xabc"
+            )
+
+        # The call to a non-contract address is filtered out
+        self.assertEqual(
+            result,
+            [
+                {
+                    "from": "0xabc",
+                    "to": "0xdef",
+                    "types": {"call": 1},
+                    "depth": 1,
+                }
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
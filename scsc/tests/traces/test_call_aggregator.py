@@ -0,0 +1,212 @@
+import random
+import unittest
+
+from scsc.traces.call_aggregator import CallAggregator
+
+
+def recursive_calls(call, contract_address, calls):
+    """
+    Reference extraction the aggregator has to agree with.
+    """
+    if call["from"].lower() == contract_address.lower():
+        stack = [call]
+        while stack:
+            c = stack.pop()
+            calls.append((c["from"], c["to"], c["type"]))
+            stack.extend(c.get("calls", []))
+    for subcall in call.get("calls", []):
+        recursive_calls(subcall, contract_address, calls)
+
+
+def tree_events(call):
+    """
+    Call events of a tree, as produced while streaming it.
+    """
+    yield call["from"], call["to"], call["type"]
+    for subcall in call.get("calls", []):
+        yield from tree_events(subcall)
+    yield None
+
+
+def flat_traces(call, trace_address=()):
+    """
+    Flat Parity traces of a tree, as returned by trace_transaction.
+    """
+    yield {
+        "action": {
+            "from": call["from"],
+            "to": call["to"],
+            "callType": call["type"].lower(),
+        },
+        "traceAddress": list(trace_address),
+        "type": "call",
+    }
+    for i, subcall in enumerate(call.get("calls", [])):
+        yield from flat_traces(subcall, (*trace_address, i))
+
+
+def random_tree(rng, source, depth):
+    target = rng.choice(["0xc", "0x1", "0x2", "0x3", "0x4"])
+    call = {
+        "from": source,
+        "to": target,
+        "type": rng.choice(["CALL", "STATICCALL", "DELEGATECALL"]),
+    }
+    if depth > 0:
+        call["calls"] = [
+            random_tree(rng, target, depth - 1)
+            for _ in range(rng.randint(0, 3))
+        ]
+    return call
+
+
+class TestCallAggregator(unittest.TestCase):
+    def test_add_trace(self):
+        calls = CallAggregator()
+        call = {
+            "from": "0xEOA",
+            "to": "0xC",
+            "type": "CALL",
+            "calls": [
+                {
+                    "from": "0xc",
+                    "to": "0x1",
+                    "type": "CALL",
+                    "calls": [{"from": "0x1", "to": "0x2", "type": "CALL"}],
+                },
+                {"from": "0xc", "to": "0x2", "type": "STATICCALL"},
+            ],
+        }
+        calls.add_trace(call, "0xC")
+        self.assertEqual(
+            calls.to_calls(),
+            [
+                {"from": "0xc", "to": "0x1", "types": {"CALL": 1}, "depth": 1},
+                {"from": "0x1", "to": "0x2", "types": {"CALL": 1}, "depth": 2},
+                {
+                    "from": "0xc",
+                    "to": "0x2",
+                    "types": {"STATICCALL": 1},
+                    "depth": 1,
+                },
+            ],
+        )
+
+    def test_matches_recursive_extraction(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            trace = random_tree(rng, "0xeoa", 6)
+            expected = []
+            recursive_calls(trace, "0xc", expected)
+
+            calls = CallAggregator()
+            calls.add_trace(trace, "0xC")
+            counts = {}
+            for source, target, call_type in expected:
+                key = (source, target)
+                types = counts.setdefault(key, {})
+                types[call_type] = types.get(call_type, 0) + 1
+            self.assertEqual(
+                {k: v.types for k, v in calls.edges.items()}, counts
+            )
+
+    def test_add_events_matches_add_trace(self):
+        rng = random.Random(11)
+        for _ in range(50):
+            trace = random_tree(rng, "0xeoa", 6)
+            expected = CallAggregator()
+            expected.add_trace(trace, "0xc")
+            calls = CallAggregator()
+            calls.add_events(tree_events(trace), "0xC")
+            self.assertEqual(calls.to_calls(), expected.to_calls())
+
+    def test_add_flat_traces_matches_add_trace(self):
+        rng = random.Random(13)
+        for _ in range(50):
+            trace = random_tree(rng, "0xeoa", 6)
+            expected = CallAggregator()
+            expected.add_trace(trace, "0xc")
+            traces = list(flat_traces(trace))
+            calls = CallAggregator()
+            calls.add_flat_traces(traces, "0xC")
+            self.assertEqual(calls.to_calls(), expected.to_calls())
+            # Out of order traces give the same edges
+            rng.shuffle(traces)
+            shuffled = CallAggregator()
+            shuffled.add_flat_traces(traces, "0xC")
+            self.assertEqual(
+                {k: (v.types, v.depth) for k, v in shuffled.edges.items()},
+                {k: (v.types, v.depth) for k, v in calls.edges.items()},
+            )
+
+    def test_add_flat_traces_creations(self):
+        calls = CallAggregator()
+        calls.add_flat_traces(
+            [
+                {
+                    "action": {
+                        "from": "0xeoa",
+                        "to": "0xc",
+                        "callType": "call",
+                    },
+                    "traceAddress": [],
+                    "type": "call",
+                },
+                {
+                    "action": {"from": "0xc", "creationMethod": "create2"},
+                    "result": {"address": "0x5"},
+                    "traceAddress": [0],
+                    "type": "create",
+                },
+                {
+                    "action": {"from": "0x5", "creationMethod": "create"},
+                    "result": None,
+                    "traceAddress": [0, 0],
+                    "type": "create",
+                },
+                {
+                    "action": {"address": "0xc", "refundAddress": "0x6"},
+                    "traceAddress": [1],
+                    "type": "suicide",
+                },
+            ],
+            "0xc",
+        )
+        self.assertEqual(
+            [
+                (c["from"], c["to"], c["types"], c["depth"])
+                for c in calls.to_calls()
+            ],
+            [
+                ("0xc", "0x5", {"CREATE2": 1}, 1),
+                ("0xc", "0x6", {"SELFDESTRUCT": 1}, 1),
+            ],
+        )
+
+    def test_deep_trace(self):
+        trace = {"from": "0x1", "to": "0x2", "type": "CALL"}
+        for _ in range(5000):
+            trace = {
+                "from": "0x1",
+                "to": "0x2",
+                "type": "CALL",
+                "calls": [trace],
+            }
+        calls = CallAggregator()
+        calls.add_trace(trace, "0x1")
+        self.assertEqual(calls.edges[("0x1", "0x2")].depth, 1)
+
+    def test_merge(self):
+        a = CallAggregator()
+        a.add("0x1", "0x2", "CALL", depth=2)
+        b = CallAggregator()
+        b.add("0x1", "0x2", "CALL", count=3, depth=1)
+        b.add("0x1", "0x3", "STATICCALL")
+        a.merge(b)
+        self.assertEqual(a.edges[("0x1", "0x2")].types, {"CALL": 4})
+        self.assertEqual(a.edges[("0x1", "0x2")].depth, 1)
+        self.assertEqual(len(a), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import shutil
+import unittest
+
+from scsc.traces import CodeCache
+
+
+class TestCodeCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_output"
+        os.makedirs(self.test_dir, exist_ok=True)
+        self.path = os.path.join(self.test_dir, "code.db")
+        self.cache = CodeCache(self.path)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_has_code_since(self):
+        self.assertIsNone(self.cache.has_code("0xA", 100))
+        self.cache.record("0xA", 100, True)
+        self.assertTrue(self.cache.has_code("0xa", 100))
+        self.assertTrue(self.cache.has_code("0xa", 200))
+
+        # Before the recorded block the node has to be asked
+        self.assertIsNone(self.cache.has_code("0xa", 50))
+        self.cache.record("0xa", 50, True)
+        self.assertTrue(self.cache.has_code("0xa", 60))
+
+    def test_destroyed(self):
+        self.cache.record("0xa", 100, True)
+        self.cache.record("0xa", 300, False)
+        self.assertTrue(self.cache.has_code("0xa", 299))
+        self.assertFalse(self.cache.has_code("0xa", 300))
+        self.assertIsNone(self.cache.has_code("0xa", 301))
+
+    def test_no_code(self):
+        self.cache.record("0xb", 100, False)
+        self.assertFalse(self.cache.has_code("0xb", 100))
+        self.assertIsNone(self.cache.has_code("0xb", 101))
+
+    def test_persisted(self):
+        self.cache.record("0xa", 100, True)
+        self.cache.record("0xb", 100, False)
+        self.cache.close()
+        self.cache = CodeCache(self.path)
+        self.assertTrue(self.cache.has_code("0xa", 150))
+        self.assertIsNone(self.cache.has_code("0xb", 100))
+
+
+if __name__ == "__main__":
+    unittest.main()
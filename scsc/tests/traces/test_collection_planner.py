@@ -0,0 +1,73 @@
+import unittest
+
+from scsc.traces.collection_planner import (
+    RangeSample,
+    plan_range,
+    strategy_cost,
+)
+
+
+class TestCollectionPlanner(unittest.TestCase):
+    def test_strategy_cost(self):
+        # 2 of 10 blocks hold matching transactions, 4 and 30
+        sample = RangeSample(0, 9, {3: 4, 7: 30}, 20)
+        self.assertEqual(
+            strategy_cost("transaction", sample, batch_size=10),
+            {"requests": 4, "traced_txs": 34, "cost": 5.36},
+        )
+        self.assertEqual(
+            strategy_cost("block", sample),
+            {"requests": 2, "traced_txs": 50, "cost": 4.0},
+        )
+        self.assertEqual(
+            strategy_cost("flat", sample),
+            {"requests": 2, "traced_txs": 50, "cost": 3.0},
+        )
+        self.assertEqual(
+            strategy_cost("scan", sample),
+            {"requests": 10, "traced_txs": 200, "cost": 18.0},
+        )
+
+    def test_strategy_cost_without_trace_filter(self):
+        sample = RangeSample(0, 9, None, 20)
+        self.assertEqual(strategy_cost("scan", sample)["requests"], 10)
+        with self.assertRaises(ValueError):
+            strategy_cost("transaction", sample)
+        with self.assertRaises(ValueError):
+            strategy_cost("replay", RangeSample(0, 9, {}, 20))
+
+    def test_plan_range(self):
+        samples = [
+            RangeSample(0, 9, {1: 1}, 100),
+            RangeSample(10, 19, {}, 100),
+            RangeSample(20, 29, {b: 50 for b in range(20, 30)}, 100),
+        ]
+        plan = plan_range(samples, ["transaction", "block", "scan"])
+        self.assertEqual(
+            plan,
+            [
+                {
+                    "from_block": 0,
+                    "to_block": 19,
+                    "mode": "transaction",
+                    "requests": 1,
+                    "traced_txs": 1,
+                    "cost": 1.04,
+                },
+                {
+                    "from_block": 20,
+                    "to_block": 29,
+                    "mode": "block",
+                    "requests": 10,
+                    "traced_txs": 1000,
+                    "cost": 50.0,
+                },
+            ],
+        )
+        # The scan costs as much as tracing every block, listed first
+        plan = plan_range(samples[2:], ["scan", "block"])
+        self.assertEqual(plan[0]["mode"], "scan")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import requests
+
+from scsc.traces import RetryPolicy, TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate(self):
+        bucket = TokenBucket(rate=50, burst=5)
+        start = time.monotonic()
+        for _ in range(10):
+            bucket.acquire()
+        # 5 requests from the burst, 5 more at 50 per second
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_acquire_beyond_capacity(self):
+        bucket = TokenBucket(rate=1000, burst=2)
+        bucket.acquire(100)
+        self.assertLess(bucket._tokens, 1)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def setUp(self):
+        self.retry = RetryPolicy(max_retries=2, base_delay=0)
+
+    def test_retries_transient_errors(self):
+        fn = MagicMock(
+            side_effect=[
+                requests.HTTPError("429 Client Error: Too Many Requests"),
+                requests.Timeout(),
+                "trace",
+            ]
+        )
+        self.assertEqual(self.retry.call(fn, "0xa"), "trace")
+        self.assertEqual(fn.call_count, 3)
+
+    def test_gives_up(self):
+        fn = MagicMock(side_effect=ValueError("request timed out"))
+        with self.assertRaises(ValueError):
+            self.retry.call(fn)
+        self.assertEqual(fn.call_count, 3)
+
+    def test_permanent_error(self):
+        fn = MagicMock(side_effect=ValueError("transaction not found"))
+        with self.assertRaises(ValueError):
+            self.retry.call(fn)
+        self.assertEqual(fn.call_count, 1)
+
+    def test_http_status(self):
+        response = MagicMock(status_code=500)
+        error = requests.HTTPError(
+            "500 Server Error for 0x4290", response=response
+        )
+        self.assertFalse(RetryPolicy.is_transient(error))
+        response.status_code = 503
+        self.assertTrue(RetryPolicy.is_transient(error))
+
+    def test_delay_is_capped(self):
+        retry = RetryPolicy(base_delay=1, max_delay=4)
+        for attempt in range(10):
+            self.assertLessEqual(retry.delay(attempt), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from scsc.traces import RPCClient
+from scsc.traces.rpc_client import orjson
+
+
+@unittest.skipIf(orjson is None, "orjson not installed")
+class TestRPCClient(unittest.TestCase):
+    def setUp(self):
+        self.client = RPCClient("http://mock.ethereum.node", pool_size=2)
+        self.client.session.post = MagicMock()
+
+    def tearDown(self):
+        self.client.close()
+
+    def respond(self, body):
+        response = MagicMock()
+        response.content = json.dumps(body).encode()
+        self.client.session.post.return_value = response
+
+    def test_request(self):
+        self.respond({"jsonrpc": "2.0", "id": 1, "result": {"to": "0x2"}})
+        result = self.client.request("debug_traceTransaction", ["0xa"])
+        self.assertEqual(result, {"to": "0x2"})
+
+        body = json.loads(self.client.session.post.call_args.kwargs["data"])
+        self.assertEqual(body["method"], "debug_traceTransaction")
+        self.assertEqual(body["params"], ["0xa"])
+
+    def test_request_error(self):
+        self.respond(
+            {"jsonrpc": "2.0", "id": 1, "error": {"code": -1, "message": "x"}}
+        )
+        with self.assertRaises(ValueError):
+            self.client.request("trace_filter", [{}])
+
+    def test_make_batch_request(self):
+        def post(url, data, **kwargs):
+            # Answer out of order
+            requests = json.loads(data)
+            response = MagicMock()
+            response.content = json.dumps(
+                [
+                    {"jsonrpc": "2.0", "id": r["id"], "result": r["params"][0]}
+                    for r in reversed(requests)
+                ]
+            ).encode()
+            return response
+
+        self.client.session.post.side_effect = post
+        responses = self.client.make_batch_request(
+            [("eth_getCode", ["0x1"]), ("eth_getCode", ["0x2"])]
+        )
+        self.assertEqual([r["result"] for r in responses], ["0x1", "0x2"])
+
+    def test_http_only(self):
+        with self.assertRaises(ValueError):
+            RPCClient("ipc:///tmp/node.ipc")
+
+    def test_requires_orjson(self):
+        with patch("scsc.traces.rpc_client.orjson", None):
+            with self.assertRaises(ImportError):
+                RPCClient("http://mock.ethereum.node")
+
+    def test_pooled_endpoints(self):
+        client = RPCClient("http://node1:8545,http://node2:8545")
+        responses = [
+            {"jsonrpc": "2.0", "id": 1, "error": {"message": "429"}},
+            {"jsonrpc": "2.0", "id": 1, "result": "0x1"},
+        ]
+        for session in client.sessions:
+            session.post = MagicMock()
+            session.post.return_value.content = json.dumps(
+                responses.pop()
+            ).encode()
+        for _ in range(10):
+            try:
+                client.request("trace_filter", [{}])
+            except ValueError:
+                pass
+        stats = client.stats()
+        self.assertEqual([s["url"] for s in stats], client.urls)
+        self.assertEqual(sum(s["requests"] for s in stats), 10)
+        self.assertEqual(stats[1]["errors"], stats[1]["requests"])
+        self.assertEqual(stats[0]["errors"], 0)
+        client.close()
+
+    def test_make_batch_request_rejected(self):
+        error = {"jsonrpc": "2.0", "id": None, "error": {"message": "batch"}}
+        self.respond(error)
+        self.assertEqual(
+            self.client.make_batch_request([("eth_getCode", ["0x1"])]), error
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import unittest
+
+from scsc.traces import TraceCache
+
+
+class TestTraceCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_output"
+        os.makedirs(self.test_dir, exist_ok=True)
+        self.path = os.path.join(self.test_dir, "traces.db")
+        self.cache = TraceCache(self.path)
+        self.config = {"tracer": "callTracer"}
+        self.trace = {"from": "0x1", "to": "0x2", "type": "CALL", "calls": []}
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_get_put(self):
+        self.assertIsNone(self.cache.get("0xabc", self.config))
+        self.cache.put("0xABC", self.config, self.trace)
+        self.assertEqual(self.cache.get("0xabc", self.config), self.trace)
+
+    def test_get_many(self):
+        self.cache.put("0x1", self.config, self.trace)
+        self.cache.put("0x2", self.config, self.trace)
+        self.assertEqual(
+            self.cache.get_many(["0x1", "0x3", "0X2"], self.config),
+            {"0x1": self.trace, "0X2": self.trace},
+        )
+        self.assertEqual(self.cache.get_many([], self.config), {})
+
+    def test_key_includes_tracer_config(self):
+        self.cache.put("0xabc", self.config, self.trace)
+        self.assertIsNone(
+            self.cache.get("0xabc", {"tracer": "callTracer", "x": 1})
+        )
+
+    def test_persisted(self):
+        self.cache.put("0xabc", self.config, self.trace)
+        self.cache.close()
+        self.cache = TraceCache(self.path)
+        self.assertEqual(self.cache.get("0xabc", self.config), self.trace)
+
+    def test_lru_eviction(self):
+        self.cache.put("0x1", self.config, self.trace)
+        self.cache.max_bytes = 2 * self.cache._size
+        self.cache.put("0x2", self.config, self.trace)
+
+        # Reading 0x1 makes 0x2 the least recently used entry
+        self.cache.get("0x1", self.config)
+        self.cache.put("0x3", self.config, self.trace)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get("0x2", self.config))
+        self.assertIsNotNone(self.cache.get("0x1", self.config))
+        self.assertIsNotNone(self.cache.get("0x3", self.config))
+
+    def test_access_times_written_on_close(self):
+        self.cache.put("0x1", self.config, self.trace)
+        self.cache.put("0x2", self.config, self.trace)
+        size = self.cache._size
+        self.cache.get("0x1", self.config)
+        self.cache.close()
+
+        self.cache = TraceCache(self.path, max_bytes=size)
+        self.cache.put("0x3", self.config, self.trace)
+        self.assertIsNone(self.cache.get("0x2", self.config))
+        self.assertIsNotNone(self.cache.get("0x1", self.config))
+
+
+if __name__ == "__main__":
+    unittest.main()
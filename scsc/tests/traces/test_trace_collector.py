@@ -1,10 +1,20 @@
+import asyncio
+import io
+import json
+import threading
+import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from web3 import Web3
+from web3.providers import BaseProvider
 from web3.providers.eth_tester import EthereumTesterProvider
 
-from scsc.traces import TraceCollector
+from scsc.traces import RetryPolicy, RPCClient, TokenBucket, TraceCollector
+from scsc.traces.call_aggregator import CallAggregator
+from scsc.traces.rpc_client import orjson
+from scsc.traces.trace_collector import CALL_TRACER, MINIMAL_TRACER
+from scsc.traces.trace_stream import ijson
 
 
 class TestTraceCollector(unittest.TestCase):
@@ -28,12 +38,14 @@ class TestTraceCollector(unittest.TestCase):
                 TraceCollector("http://mock.ethereum.node")
 
     @patch.object(
-        TraceCollector, "_filter_txs_from", return_value={"0x123", "0x456"}
+        TraceCollector,
+        "_filter_blocks_from",
+        return_value={1000: {"0x123"}, 1001: {"0x456"}},
     )
     @patch.object(TraceCollector, "_validate_contract", return_value=True)
     @patch("web3.Web3")
     def test_get_calls_from(
-        self, MockWeb3, mock_validate_contract, mock_filter_txs_from
+        self, MockWeb3, mock_validate_contract, mock_filter_blocks_from
     ):
         # Mock tracing.trace_filter to return sample data
         mock_w3_instance = MockWeb3.return_value
@@ -59,14 +71,14 @@ class TestTraceCollector(unittest.TestCase):
             from_block, to_block, contract_address
         )
 
-        # Verify the returned calls
-        self.assertEqual(len(result), 2)
+        # Verify the returned calls of both transactions
+        self.assertEqual(len(result), 1)
         self.assertEqual(result[0]["from"], "0xabc")
         self.assertEqual(result[0]["to"], "0xdef")
-        self.assertEqual(result[0]["type"], "call")
+        self.assertEqual(result[0]["types"], {"call": 2})
 
         # Verify that _validate_contract was called
-        mock_validate_contract.assert_called_with(contract_address, to_block)
+        mock_validate_contract.assert_any_call(contract_address, to_block)
 
     @patch("web3.Web3")
     def test_filter_txs_from(self, MockWeb3):
@@ -84,6 +96,27 @@ class TestTraceCollector(unittest.TestCase):
         tx_hashes = self.trace_collector._filter_txs_from(1, 10, "0x123")
         self.assertEqual(tx_hashes, {"0x1", "0x2"})
 
+    def test_raw_rpc(self):
+        rpc = MagicMock()
+        rpc.request.side_effect = lambda method, params: {
+            "trace_filter": [{"transactionHash": "0xa", "type": "call"}],
+            "debug_traceTransaction": {
+                "from": "0x1",
+                "to": "0x2",
+                "type": "CALL",
+            },
+        }[method]
+        self.trace_collector.rpc = rpc
+        self.trace_collector.w3 = MagicMock()
+
+        tx_hashes = self.trace_collector._filter_txs_from(1, 10, "0x1")
+        calls = self.trace_collector.get_calls(tx_hashes, "0x1")
+        self.assertEqual(calls[0]["types"], {"CALL": 1})
+
+        # web3.py is not used for traces
+        self.trace_collector.w3.tracing.trace_filter.assert_not_called()
+        self.trace_collector.w3.geth.debug.trace_transaction.assert_not_called()
+
     @patch("web3.Web3")
     def test_get_calls_from_tx(self, MockWeb3):
         # Mock geth.debug.trace_transaction to return sample data
@@ -99,21 +132,8 @@ class TestTraceCollector(unittest.TestCase):
         res = self.trace_collector._get_calls_from_tx("0x1")
         self.assertEqual(res, {"calls": []})
 
-    def test_extract_all_subcalls(self):
-        calls = []
-        call = {
-            "from": "0x1",
-            "to": "0x2",
-            "type": "call",
-            "calls": [{"from": "0x2", "to": "0x3", "type": "call"}],
-        }
-        self.trace_collector._extract_all_subcalls(call, calls)
-        self.assertEqual(len(calls), 2)
-        self.assertEqual(calls[0]["from"], "0x1")
-        self.assertEqual(calls[1]["from"], "0x2")
-
     def test_extract_calls(self):
-        calls = []
+        calls = CallAggregator()
         call = {
             "from": "0x1",
             "to": "0x2",
@@ -121,9 +141,13 @@ class TestTraceCollector(unittest.TestCase):
             "calls": [{"from": "0x2", "to": "0x3", "type": "call"}],
         }
         self.trace_collector._extract_calls(call, "0x1", calls)
-        self.assertEqual(len(calls), 2)
-        self.assertEqual(calls[0]["from"], "0x1")
-        self.assertEqual(calls[1]["from"], "0x2")
+        self.assertEqual(
+            calls.to_calls(),
+            [
+                {"from": "0x1", "to": "0x2", "types": {"call": 1}, "depth": 1},
+                {"from": "0x2", "to": "0x3", "types": {"call": 1}, "depth": 2},
+            ],
+        )
 
     @patch("web3.Web3")
     def test_get_calls(self, MockWeb3):
@@ -144,6 +168,1044 @@ class TestTraceCollector(unittest.TestCase):
         self.assertEqual(len(calls), 1)
         self.assertEqual(calls[0]["from"], "0x1")
 
+    def test_stream_without_ijson(self):
+        with patch("scsc.traces.trace_collector.ijson", None):
+            with self.assertRaises(ImportError):
+                self.trace_collector.get_calls({"0xa"}, "0x1", stream=True)
+
+    @unittest.skipIf(ijson is None, "ijson not installed")
+    def test_get_calls_streamed(self):
+        traces = {
+            "0xa": {
+                "from": "0x1",
+                "to": "0x2",
+                "type": "CALL",
+                "calls": [{"from": "0x2", "to": "0x3", "type": "CALL"}],
+            },
+            "0xb": {"from": "0x1", "to": "0x2", "type": "STATICCALL"},
+        }
+
+        def post(url, **kwargs):
+            tx_hash = kwargs["json"]["params"][0]
+            if tx_hash == "0xc":
+                raise ConnectionError("reset")
+            body = {"jsonrpc": "2.0", "id": 1, "result": traces[tx_hash]}
+            response = MagicMock()
+            response.raw = io.BytesIO(json.dumps(body).encode())
+            response.__enter__.return_value = response
+            return response
+
+        self.trace_collector.w3 = Web3(
+            Web3.HTTPProvider("http://mock.ethereum.node")
+        )
+        with patch.object(self.trace_collector._session, "post", post):
+            calls = self.trace_collector.get_calls(
+                {"0xa", "0xb", "0xc"}, "0x1", max_workers=2, stream=True
+            )
+
+        # The transaction that could not be traced is skipped
+        self.assertEqual(
+            calls,
+            [
+                {
+                    "from": "0x1",
+                    "to": "0x2",
+                    "types": {"CALL": 1, "STATICCALL": 1},
+                    "depth": 1,
+                },
+                {"from": "0x2", "to": "0x3", "types": {"CALL": 1}, "depth": 2},
+            ],
+        )
+
+    @patch("web3.Web3")
+    def test_get_calls_batched(self, MockWeb3):
+        # Mock a batch response with one failed item
+        mock_w3_instance = MockWeb3.return_value
+        trace = {"from": "0x1", "to": "0x2", "type": "CALL"}
+        mock_w3_instance.provider.make_batch_request.side_effect = [
+            [
+                {"id": 1, "result": trace},
+                {"id": 2, "error": {"code": -32000, "message": "timeout"}},
+            ],
+            [{"id": 3, "result": trace}],
+        ]
+
+        # Assign the mock Web3 instance to the trace_collector
+        self.trace_collector.w3 = mock_w3_instance
+
+        # Test the get_calls method with batching
+        calls = self.trace_collector.get_calls(
+            ["0xa", "0xb"], "0x1", batch_size=2
+        )
+        self.assertEqual(calls[0]["types"], {"CALL": 2})
+
+        # Verify that only the failed item was retried
+        retried = mock_w3_instance.provider.make_batch_request.call_args
+        self.assertEqual(
+            retried.args[0],
+            [("debug_traceTransaction", ["0xb", {"tracer": "callTracer"}])],
+        )
+
+    @patch("web3.Web3")
+    def test_get_calls_from_txs_gives_up(self, MockWeb3):
+        # Mock a node that rejects every batch
+        mock_w3_instance = MockWeb3.return_value
+        mock_w3_instance.provider.make_batch_request.return_value = {
+            "error": {"code": -32600, "message": "batch too large"}
+        }
+
+        # Assign the mock Web3 instance to the trace_collector
+        self.trace_collector.w3 = mock_w3_instance
+
+        traces = self.trace_collector._get_calls_from_txs(["0xa"], 1)
+        self.assertEqual(traces, {})
+        self.assertEqual(
+            mock_w3_instance.provider.make_batch_request.call_count, 2
+        )
+
+    @patch("web3.Web3")
+    def test_get_calls_parallel_deterministic(self, MockWeb3):
+        # Mock traces that finish in reverse submission order
+        def trace_transaction(tx_hash, config):
+            time.sleep(0.01 * (10 - int(tx_hash, 16)))
+            return {"from": "0x1", "to": tx_hash, "type": "CALL"}
+
+        mock_w3_instance = MockWeb3.return_value
+        mock_w3_instance.geth.debug.trace_transaction.side_effect = (
+            trace_transaction
+        )
+
+        # Assign the mock Web3 instance to the trace_collector
+        self.trace_collector.w3 = mock_w3_instance
+
+        tx_hashes = {hex(i) for i in range(1, 9)}
+        sequential = self.trace_collector.get_calls(tx_hashes, "0x1")
+        parallel = self.trace_collector.get_calls(
+            tx_hashes, "0x1", max_workers=4
+        )
+        self.assertEqual(parallel, sequential)
+        self.assertEqual([c["to"] for c in parallel], sorted(tx_hashes))
+
+    @patch("web3.Web3")
+    def test_filter_blocks_from(self, MockWeb3):
+        # Mock tracing.trace_filter to return sample data
+        mock_w3_instance = MockWeb3.return_value
+        mock_w3_instance.tracing.trace_filter.return_value = [
+            {"transactionHash": "0x1", "blockNumber": 5, "type": "call"},
+            {"transactionHash": "0x2", "blockNumber": 5, "type": "call"},
+            {"transactionHash": "0x3", "blockNumber": 7, "type": "call"},
+            {"transactionHash": "0x4", "blockNumber": 8, "type": "create"},
+        ]
+
+        # Assign the mock Web3 instance to the trace_collector
+        self.trace_collector.w3 = mock_w3_instance
+
+        blocks = self.trace_collector._filter_blocks_from(1, 10, "0x123")
+        self.assertEqual(blocks, {5: {"0x1", "0x2"}, 7: {"0x3"}})
+
+    @patch("web3.Web3")
+    def test_get_calls_by_block(self, MockWeb3):
+        # Mock a block trace holding a matching and an unrelated transaction
+        mock_w3_instance = MockWeb3.return_value
+        mock_w3_instance.manager.request_blocking.return_value = [
+            {
+                "txHash": "0xa",
+                "result": {"from": "0x1", "to": "0x2", "type": "CALL"},
+            },
+            {
+                "txHash": "0xb",
+                "result": {"from": "0x1", "to": "0x3", "type": "CALL"},
+            },
+        ]
+
+        # Assign the mock Web3 instance to the trace_collector
+        self.trace_collector.w3 = mock_w3_instance
+
+        calls = self.trace_collector.get_calls_by_block({5: {"0xa"}}, "0x1")
+        self.assertEqual(
+            calls,
+            [{"from": "0x1", "to": "0x2", "types": {"CALL": 1}, "depth": 1}],
+        )
+        mock_w3_instance.manager.request_blocking.assert_called_once_with(
+            "debug_traceBlockByNumber", ["0x5", {"tracer": "callTracer"}]
+        )
+
+    def test_get_calls_from_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            self.trace_collector.get_calls_from(1, 5, "0xabc", mode="bogus")
+
+    @patch("web3.Web3")
+    def test_get_calls_retries_and_counts_failures(self, MockWeb3):
+        trace = {"from": "0x1", "to": "0x2", "type": "CALL"}
+        errors = {"0xa": [ValueError("429 Too Many Requests")]}
+
+        def trace_transaction(tx_hash, config):
+            if tx_hash == "0xb":
+                raise ValueError("transaction not found")
+            if errors.get(tx_hash):
+                raise errors[tx_hash].pop()
+            return trace
+
+        mock_w3_instance = MockWeb3.return_value
+        mock_w3_instance.geth.debug.trace_transaction = trace_transaction
+        self.trace_collector.w3 = mock_w3_instance
+        self.trace_collector.retry = RetryPolicy(base_delay=0)
+        self.trace_collector.rate_limits = {"trace": TokenBucket(1000)}
+
+        calls = self.trace_collector.get_calls({"0xa", "0xb"}, "0x1")
+        self.assertEqual(calls[0]["types"], {"CALL": 1})
+        self.assertEqual(self.trace_collector.failed_txs, {"0xb"})
+
+    def test_unknown_method_family(self):
+        with self.assertRaises(ValueError):
+            TraceCollector(
+                "http://mock.ethereum.node",
+                rate_limits={"bogus": TokenBucket(1)},
+            )
+
+    def test_unknown_tracer(self):
+        with self.assertRaises(ValueError):
+            TraceCollector("http://mock.ethereum.node", tracer="bogus")
+
+    @patch("web3.Web3.is_connected", return_value=True)
+    def test_minimal_tracer(self, mock_is_connected):
+        trace_collector = TraceCollector(
+            "http://mock.ethereum.node", tracer="minimal"
+        )
+        trace_collector.w3 = MagicMock()
+        trace_transaction = trace_collector.w3.geth.debug.trace_transaction
+        trace_transaction.return_value = {
+            "from": "0x1",
+            "to": "0x2",
+            "type": "CALL",
+        }
+
+        calls = trace_collector.get_calls({"0xa", "0xb"}, "0x1")
+        self.assertEqual(calls[0]["types"], {"CALL": 2})
+        trace_transaction.assert_called_with("0xb", MINIMAL_TRACER)
+
+    @patch("web3.Web3.is_connected", return_value=True)
+    def test_minimal_tracer_fallback(self, mock_is_connected):
+        trace_collector = TraceCollector(
+            "http://mock.ethereum.node", tracer="minimal"
+        )
+
+        def trace_transaction(tx_hash, config):
+            if config is MINIMAL_TRACER:
+                raise ValueError("JS tracers are disabled")
+            return {"from": "0x1", "to": "0x2", "type": "CALL"}
+
+        trace_collector.w3 = MagicMock()
+        trace_collector.w3.geth.debug.trace_transaction = trace_transaction
+
+        calls = trace_collector.get_calls({"0xa", "0xb"}, "0x1")
+        self.assertEqual(calls[0]["types"], {"CALL": 2})
+        self.assertIs(trace_collector.tracer_config, CALL_TRACER)
+
+    @patch("web3.Web3.is_connected", return_value=True)
+    def test_block_tracer_fallback(self, mock_is_connected):
+        trace_collector = TraceCollector(
+            "http://mock.ethereum.node", tracer="minimal"
+        )
+        errors = {"custom": ValueError("JS tracers are disabled")}
+        trace = {"txHash": "0xa", "result": {}}
+
+        def request_blocking(method, params):
+            if params[1] is MINIMAL_TRACER:
+                raise errors["custom"]
+            if "call" in errors and params[0] == "0x1":
+                raise errors["call"]
+            return [trace]
+
+        trace_collector.w3 = MagicMock()
+        trace_collector.w3.manager.request_blocking = request_blocking
+
+        # The node is unreachable, which says nothing of the tracer
+        errors["custom"] = TimeoutError("timed out")
+        with self.assertRaises(TimeoutError):
+            trace_collector._check_block_tracer(1, 1)
+        self.assertIs(trace_collector.tracer_config, MINIMAL_TRACER)
+
+        # callTracer fails on the block too, the block is at fault
+        errors["custom"] = ValueError("JS tracers are disabled")
+        errors["call"] = ValueError("block too large")
+        trace_collector._check_block_tracer(1, 1)
+        self.assertFalse(trace_collector._tracer_checked)
+        self.assertIs(trace_collector.tracer_config, MINIMAL_TRACER)
+
+        # Only callTracer works, on the next block
+        trace_collector._check_block_tracer(1, 2)
+        self.assertTrue(trace_collector._tracer_checked)
+        self.assertIs(trace_collector.tracer_config, CALL_TRACER)
+
+    @patch("web3.Web3.is_connected", return_value=True)
+    def test_block_tracer_checked_on_block_with_traces(
+        self, mock_is_connected
+    ):
+        trace_collector = TraceCollector(
+            "http://mock.ethereum.node", tracer="minimal"
+        )
+        traced = []
+
+        def request_blocking(method, params):
+            block = int(params[0], 16)
+            traced.append((block, params[1]))
+            if block < 3:
+                # Empty blocks, the tracer is not run
+                return []
+            if params[1] is MINIMAL_TRACER:
+                raise ValueError("JS tracers are disabled")
+            return [{"txHash": "0xa", "result": {}}]
+
+        trace_collector.w3 = MagicMock()
+        trace_collector.w3.manager.request_blocking = request_blocking
+
+        trace_collector._check_block_tracer(1, 4)
+        self.assertEqual(
+            traced,
+            [
+                (1, MINIMAL_TRACER),
+                (2, MINIMAL_TRACER),
+                (3, MINIMAL_TRACER),
+                (3, CALL_TRACER),
+            ],
+        )
+        self.assertIs(trace_collector.tracer_config, CALL_TRACER)
+
+    @patch("scsc.traces.trace_collector.TRACE_FILTER_PAGE_SIZE", 2)
+    @patch("web3.Web3")
+    def test_trace_filter_bisects_and_paginates(self, MockWeb3):
+        # Mock a node that fails on ranges wider than 2 blocks
+        def trace_filter(params):
+            start = int(params["fromBlock"], 16)
+            end = int(params["toBlock"], 16)
+            if end - start > 1:
+                raise TimeoutError("query timeout exceeded")
+            traces = [
+                {"transactionHash": hex(b), "blockNumber": b, "type": "call"}
+                for b in range(start, end + 1)
+                for _ in range(2)
+            ]
+            return traces[params["after"] :][: params["count"]]
+
+        mock_w3_instance = MockWeb3.return_value
+        mock_w3_instance.tracing.trace_filter.side_effect = trace_filter
+
+        # Assign the mock Web3 instance to the trace_collector
+        self.trace_collector.w3 = mock_w3_instance
+
+        traces = self.trace_collector._trace_filter(1, 6, "0x123", 2)
+        self.assertEqual(
+            [t["blockNumber"] for t in traces],
+            [1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6],
+        )
+
+    @patch("web3.Web3")
+    def test_trace_filter_single_block_failure(self, MockWeb3):
+        mock_w3_instance = MockWeb3.return_value
+        mock_w3_instance.tracing.trace_filter.side_effect = Exception("limit")
+
+        # Assign the mock Web3 instance to the trace_collector
+        self.trace_collector.w3 = mock_w3_instance
+
+        with self.assertRaises(RuntimeError):
+            self.trace_collector._filter_txs_from(1, 2, "0x123")
+
+    @patch("web3.Web3")
+    def test_get_calls_from_cache(self, MockWeb3):
+        # Mock a node where only the unfinalized transaction is traced
+        mock_w3_instance = MockWeb3.return_value
+        mock_w3_instance.geth.debug.trace_transaction.return_value = {
+            "from": "0x1",
+            "to": "0x3",
+            "type": "CALL",
+        }
+
+        # Assign the mock Web3 instance and a cache to the trace_collector
+        self.trace_collector.w3 = mock_w3_instance
+        self.trace_collector.cache = MagicMock()
+        self.trace_collector.cache.get_many.return_value = {
+            "0xa": {"from": "0x1", "to": "0x2", "type": "CALL"}
+        }
+
+        calls = self.trace_collector.get_calls(
+            {"0xa", "0xb"}, "0x1", finalized={"0xa"}
+        )
+        self.assertEqual([c["to"] for c in calls], ["0x2", "0x3"])
+        mock_w3_instance.geth.debug.trace_transaction.assert_called_once_with(
+            "0xb", {"tracer": "callTracer"}
+        )
+        self.trace_collector.cache.put.assert_not_called()
+
+    @patch("web3.Web3")
+    def test_validate_contract_code_cache(self, MockWeb3):
+        mock_w3_instance = MockWeb3.return_value
+        mock_w3_instance.eth.get_code.return_value = b"\x60\x80"
+
+        # Assign the mock Web3 instance to the trace_collector
+        self.trace_collector.w3 = mock_w3_instance
+
+        address = "0x000000000000000000000000000000000000dEaD"
+        self.assertTrue(self.trace_collector._validate_contract(address, 10))
+        self.assertTrue(self.trace_collector._validate_contract(address, 20))
+        self.assertEqual(mock_w3_instance.eth.get_code.call_count, 1)
+
+        # An earlier block goes back to the node
+        self.assertTrue(self.trace_collector._validate_contract(address, 5))
+        self.assertEqual(mock_w3_instance.eth.get_code.call_count, 2)
+
+    @patch.object(TraceCollector, "_validate_contract", return_value=False)
+    @patch("web3.Web3")
+    def test_filter_contract_calls_batched(
+        self, MockWeb3, mock_validate_contract
+    ):
+        a = "0x" + "a" * 40
+        b = "0x" + "b" * 40
+        c = "0x" + "c" * 40
+        precompile = "0x" + "0" * 39 + "1"
+        calls = [
+            {"from": a, "to": b, "type": "CALL"},
+            {"from": a, "to": c, "type": "CALL"},
+            {"from": b, "to": c, "type": "CALL"},
+            {"from": a, "to": precompile, "type": "STATICCALL"},
+        ]
+
+        # Mock one batch where c fails and falls back to _validate_contract
+        mock_w3_instance = MockWeb3.return_value
+        mock_w3_instance.provider.make_batch_request.return_value = [
+            {"id": 1, "result": "0x6080"},
+            {"id": 2, "result": "0x6080"},
+            {"id": 3, "error": {"code": -32000, "message": "timeout"}},
+        ]
+
+        # Assign the mock Web3 instance to the trace_collector
+        self.trace_collector.w3 = mock_w3_instance
+
+        filtered = self.trace_collector._filter_contract_calls(calls, 10)
+        self.assertEqual(filtered, calls[:1])
+        mock_w3_instance.provider.make_batch_request.assert_called_once()
+        mock_validate_contract.assert_called_once_with(c, 10)
+
+        # Known contracts are answered by the code cache
+        self.trace_collector._filter_contract_calls(calls[:1], 10)
+        mock_w3_instance.provider.make_batch_request.assert_called_once()
+
+    @patch.object(
+        TraceCollector, "_validate_contracts", side_effect=lambda a, b: a
+    )
+    @patch.object(TraceCollector, "_validate_contract", return_value=True)
+    @patch("web3.Web3")
+    def test_get_calls_many(self, MockWeb3, mock_validate, mock_validate_all):
+        a = "0x" + "a" * 40
+        b = "0x" + "b" * 40
+        # Transaction 0x1 has both contracts making calls, 0x2 only b
+        mock_w3_instance = MockWeb3.return_value
+        mock_w3_instance.tracing.trace_filter.return_value = [
+            {
+                "transactionHash": tx,
+                "blockNumber": 1,
+                "type": "call",
+                "action": {"from": source, "to": "0x3"},
+            }
+            for tx, source in (("0x1", a), ("0x1", b.upper()), ("0x2", b))
+        ]
+        traces = {
+            "0x1": {
+                "from": "0x9",
+                "to": a,
+                "type": "CALL",
+                "calls": [
+                    {
+                        "from": a,
+                        "to": b,
+                        "type": "CALL",
+                        "calls": [{"from": b, "to": "0x3", "type": "CALL"}],
+                    }
+                ],
+            },
+            "0x2": {"from": b, "to": "0x3", "type": "STATICCALL"},
+        }
+        mock_w3_instance.geth.debug.trace_transaction.side_effect = (
+            lambda tx, config: traces[tx]
+        )
+        self.trace_collector.w3 = mock_w3_instance
+
+        calls = self.trace_collector.get_calls_many(1, 2, [a, b])
+        mock_w3_instance.tracing.trace_filter.assert_called_once()
+        params = mock_w3_instance.tracing.trace_filter.call_args.args[0]
+        self.assertEqual(params["fromAddress"], [a, b])
+        # Each transaction is traced once
+        self.assertEqual(
+            mock_w3_instance.geth.debug.trace_transaction.call_count, 2
+        )
+        # The calls of a include those made further down its call tree,
+        # with checksum addresses
+        a, b = Web3.to_checksum_address(a), Web3.to_checksum_address(b)
+        self.assertEqual(
+            [(c["from"], c["to"], c["types"]) for c in calls["0x" + "a" * 40]],
+            [(a, b, {"CALL": 1}), (b, "0x3", {"CALL": 1})],
+        )
+        self.assertEqual(
+            [(c["from"], c["to"], c["types"]) for c in calls["0x" + "b" * 40]],
+            [(b, "0x3", {"CALL": 1, "STATICCALL": 1})],
+        )
+
+    def mock_iter_calls(self):
+        blocks = {10: {"0x1", "0x2"}, 12: {"0x3"}}
+        traces = {
+            "0x1": {"from": "0xa", "to": "0xb", "type": "CALL"},
+            "0x2": {"from": "0xa", "to": "0xc", "type": "CALL"},
+        }
+
+        def trace_transaction(tx_hash, config):
+            if tx_hash not in traces:
+                raise ValueError("execution timeout")
+            return traces[tx_hash]
+
+        mock_w3_instance = MagicMock()
+        mock_w3_instance.geth.debug.trace_transaction.side_effect = (
+            trace_transaction
+        )
+        self.trace_collector.w3 = mock_w3_instance
+        for name, value in (
+            ("_filter_blocks_from", blocks),
+            ("_validate_contract", True),
+        ):
+            patcher = patch.object(TraceCollector, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(
+            TraceCollector, "_validate_contracts", side_effect=lambda a, b: a
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_iter_calls(self):
+        self.mock_iter_calls()
+        records = list(self.trace_collector.iter_calls(10, 14, "0xa"))
+        edges = [r for r in records if r["kind"] == "edges"]
+        self.assertEqual(
+            [(r["block"], r["calls"][0]["to"]) for r in edges],
+            [(10, "0xb"), (10, "0xc")],
+        )
+        progress = [
+            (r["blocks_done"], r["txs_traced"], r["rpc_errors"])
+            for r in records
+            if r["kind"] == "progress"
+        ]
+        self.assertEqual(
+            progress, [(0, 0, 0), (0, 1, 0), (0, 2, 0), (2, 3, 1), (5, 3, 1)]
+        )
+        self.assertEqual(records[0]["txs_total"], 3)
+        self.assertEqual(records[0]["blocks_total"], 5)
+
+    def test_iter_calls_cancel(self):
+        self.mock_iter_calls()
+        cancel = threading.Event()
+        records = []
+        for record in self.trace_collector.iter_calls(
+            10, 14, "0xa", cancel=cancel
+        ):
+            records.append(record)
+            if record["kind"] == "edges":
+                cancel.set()
+        self.assertEqual(
+            [r["kind"] for r in records], ["progress", "edges", "progress"]
+        )
+        self.assertEqual(
+            self.trace_collector.w3.geth.debug.trace_transaction.call_count, 2
+        )
+
+    def test_aiter_calls(self):
+        self.mock_iter_calls()
+
+        async def first_edges():
+            async for record in self.trace_collector.aiter_calls(
+                10, 14, "0xa"
+            ):
+                if record["kind"] == "edges":
+                    return record
+
+        record = asyncio.run(first_edges())
+        self.assertEqual(record["calls"][0]["to"], "0xb")
+
+    def mock_node(self, methods, blocks=None):
+        """
+        Mocks a node serving methods, with block traces keyed by number.
+        """
+
+        def request_blocking(method, params):
+            if method not in methods:
+                raise ValueError({"code": -32601, "message": "not found"})
+            if method == "debug_traceBlockByNumber":
+                return (blocks or {}).get(int(params[0], 16), [])
+            return []
+
+        mock_w3_instance = MagicMock()
+        mock_w3_instance.manager.request_blocking.side_effect = (
+            request_blocking
+        )
+        self.trace_collector.w3 = mock_w3_instance
+        return mock_w3_instance
+
+    def test_resolve_mode(self):
+        w3 = self.mock_node({"debug_traceBlockByNumber"})
+        self.assertEqual(self.trace_collector.resolve_mode("auto"), "scan")
+        self.assertEqual(self.trace_collector.resolve_mode("auto"), "scan")
+        # Probed once per method
+        self.assertEqual(w3.manager.request_blocking.call_count, 3)
+        self.assertEqual(self.trace_collector.resolve_mode("block"), "block")
+
+        self.trace_collector._capabilities = None
+        self.mock_node({"trace_filter", "debug_traceBlockByNumber"})
+        self.assertEqual(
+            self.trace_collector.resolve_mode("auto"), "transaction"
+        )
+
+        self.trace_collector._capabilities = None
+        self.mock_node(set())
+        with self.assertRaises(ValueError):
+            self.trace_collector.resolve_mode("auto")
+
+    @patch.object(TraceCollector, "_validate_contract", return_value=True)
+    def test_iter_calls_scan(self, mock_validate_contract):
+        call = {"from": "0xa", "to": "0xb", "type": "CALL"}
+        blocks = {
+            10: [
+                {"txHash": "0x1", "result": {**call, "from": "0xe"}},
+                {"txHash": "0x2", "result": {**call, "calls": [call]}},
+            ],
+            11: [{"txHash": "0x3", "result": None}],
+            12: [{"txHash": "0x4", "result": call}],
+        }
+        w3 = self.mock_node({"debug_traceBlockByNumber"}, blocks)
+        with patch.object(
+            TraceCollector, "_validate_contracts", side_effect=lambda a, b: a
+        ):
+            records = list(
+                self.trace_collector.iter_calls(
+                    10, 12, "0xA", mode="auto", max_workers=2
+                )
+            )
+        self.assertEqual(
+            [
+                (r["block"], r["calls"][0]["to"])
+                for r in records
+                if r["kind"] == "edges"
+            ],
+            [(10, "0xb"), (12, "0xb")],
+        )
+        self.assertEqual(
+            records[-1],
+            {
+                "kind": "progress",
+                "blocks_done": 3,
+                "blocks_total": 3,
+                "txs_traced": 2,
+                "txs_total": None,
+                "rpc_errors": 1,
+            },
+        )
+        self.assertEqual(self.trace_collector.failed_txs, {"0x3"})
+        # trace_filter is only sent by the probe
+        methods = [
+            c.args[0] for c in w3.manager.request_blocking.call_args_list
+        ]
+        self.assertEqual(methods.count("trace_filter"), 1)
+
+    @patch("scsc.traces.trace_collector.PLAN_SEGMENT_SIZE", 10)
+    @patch.object(TraceCollector, "_validate_contract", return_value=True)
+    def test_plan(self, mock_validate_contract):
+        w3 = self.mock_node(
+            {"trace_filter", "debug_traceBlockByNumber", "trace_block"}
+        )
+        w3.eth.get_block_transaction_count.return_value = 100
+        # Every transaction of blocks 0-9 calls the contract, one of 10-29
+        blocks = {b: {f"0x{b}{i:02}" for i in range(100)} for b in range(10)}
+        blocks[25] = {"0x25"}
+        with patch.object(
+            TraceCollector, "_filter_blocks_from", return_value=blocks
+        ):
+            estimate = self.trace_collector.estimate(0, 29, "0xa")
+        self.assertEqual(
+            [
+                (s["from_block"], s["to_block"], s["mode"], s["requests"])
+                for s in estimate["segments"]
+            ],
+            [(0, 9, "flat", 10), (10, 29, "transaction", 1)],
+        )
+        self.assertEqual(estimate["requests"], 11)
+        self.assertEqual(estimate["matching_txs"], 1001)
+        self.assertEqual(
+            estimate["modes"]["scan"],
+            {"requests": 30, "traced_txs": 3000, "cost": 150.0},
+        )
+        self.assertLess(
+            estimate["cost"],
+            min(m["cost"] for m in estimate["modes"].values()),
+        )
+        # 3 sampled blocks per segment
+        self.assertEqual(w3.eth.get_block_transaction_count.call_count, 9)
+
+        segments = []
+
+        def iter_block_calls(segment, contract, *args):
+            segments.append((sorted(segment), args[2]))
+            return iter(())
+
+        with (
+            patch.object(
+                TraceCollector, "_filter_blocks_from", return_value=blocks
+            ),
+            patch.object(
+                TraceCollector,
+                "_iter_block_calls",
+                side_effect=iter_block_calls,
+            ),
+            patch.object(TraceCollector, "_check_tracer"),
+        ):
+            records = list(
+                self.trace_collector.iter_calls(0, 29, "0xa", mode="plan")
+            )
+        self.assertEqual(
+            segments, [(list(range(10)), "flat"), ([25], "transaction")]
+        )
+        self.assertEqual(records[0]["txs_total"], 1001)
+
+    @patch.object(TraceCollector, "_validate_contract", return_value=True)
+    def test_plan_scan_only(self, mock_validate_contract):
+        w3 = self.mock_node({"debug_traceBlockByNumber"})
+        w3.eth.get_block_transaction_count.return_value = 10
+        estimate = self.trace_collector.estimate(0, 99, "0xa")
+        self.assertEqual(
+            estimate["segments"],
+            [
+                {
+                    "from_block": 0,
+                    "to_block": 99,
+                    "mode": "scan",
+                    "requests": 100,
+                    "traced_txs": 1000,
+                    "cost": 140.0,
+                }
+            ],
+        )
+        self.assertIsNone(estimate["matching_txs"])
+        self.assertEqual(list(estimate["modes"]), ["scan"])
+
+    def test_scan_rejects_stream(self):
+        self.mock_node({"debug_traceBlockByNumber"})
+        with patch.object(
+            TraceCollector, "_validate_contract", return_value=True
+        ):
+            with self.assertRaises(ValueError):
+                list(
+                    self.trace_collector.iter_calls(
+                        1, 2, "0xa", mode="scan", stream=True
+                    )
+                )
+
+    def test_iter_calls_flat(self):
+        self.mock_iter_calls()
+        call = {"from": "0xa", "to": "0xb", "callType": "staticcall"}
+        blocks = {
+            "0xa": [
+                {
+                    "action": {"from": "0xe", "to": "0xa", "callType": "call"},
+                    "traceAddress": [],
+                    "transactionHash": "0x1",
+                    "type": "call",
+                },
+                {
+                    "action": call,
+                    "traceAddress": [0],
+                    "transactionHash": "0x1",
+                    "type": "call",
+                },
+                {
+                    "action": {"from": "0xa", "to": "0xd", "callType": "call"},
+                    "traceAddress": [],
+                    "transactionHash": "0x9",
+                    "type": "call",
+                },
+                {
+                    "action": {"author": "0xf", "rewardType": "block"},
+                    "traceAddress": [],
+                    "transactionHash": None,
+                    "type": "reward",
+                },
+            ],
+        }
+        w3 = self.trace_collector.w3
+        w3.manager.request_blocking.side_effect = lambda method, params: (
+            blocks[params[0]]
+        )
+        calls = self.trace_collector.get_calls_from(10, 14, "0xa", mode="flat")
+        self.assertEqual(
+            calls,
+            [
+                {
+                    "from": "0xa",
+                    "to": "0xb",
+                    "types": {"STATICCALL": 1},
+                    "depth": 1,
+                }
+            ],
+        )
+        # One trace_block request per block, no debug tracing
+        self.assertEqual(
+            [c.args[0] for c in w3.manager.request_blocking.call_args_list],
+            ["trace_block", "trace_block"],
+        )
+        w3.geth.debug.trace_transaction.assert_not_called()
+        self.assertEqual(self.trace_collector.failed_txs, {"0x2", "0x3"})
+
+
+# Lowercase, as nodes send them
+CONTRACT = "0x" + "c" * 40
+CALLEE = "0x" + "d" * 40
+LIBRARY = "0x" + "e" * 40
+EOA = "0x" + "1" * 40
+
+
+def flatten(tree, tx_hash, block, trace_address=()):
+    """
+    Returns the flat Parity traces of a callTracer tree, depth-first.
+    """
+    traces = [
+        {
+            "action": {
+                "from": tree["from"],
+                "to": tree["to"],
+                "callType": tree["type"].lower(),
+            },
+            "blockNumber": block,
+            "traceAddress": list(trace_address),
+            "transactionHash": tx_hash,
+            "type": "call",
+        }
+    ]
+    for i, call in enumerate(tree.get("calls", ())):
+        traces += flatten(call, tx_hash, block, (*trace_address, i))
+    return traces
+
+
+class FakeNode(BaseProvider):
+    """
+    JSON-RPC node serving the trace methods of every collection mode
+    over a small chain, with lowercase addresses as nodes send them.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        def call(source, target, call_type="CALL", calls=()):
+            tree = {"from": source, "to": target, "type": call_type}
+            if calls:
+                tree["calls"] = list(calls)
+            return tree
+
+        self.blocks = {
+            1: {
+                "0x01": call(
+                    EOA,
+                    CONTRACT,
+                    calls=[
+                        call(CONTRACT, CALLEE, calls=[call(CALLEE, LIBRARY)]),
+                        call(CONTRACT, LIBRARY, "DELEGATECALL"),
+                    ],
+                ),
+                "0x02": call(EOA, CALLEE),
+            },
+            2: {
+                f"0x2{i}": call(
+                    EOA, CONTRACT, calls=[call(CONTRACT, CALLEE, "STATICCALL")]
+                )
+                for i in range(3)
+            },
+            3: {"0x03": call(EOA, LIBRARY)},
+        }
+        self.traces = {
+            h: t for txs in self.blocks.values() for h, t in txs.items()
+        }
+
+    def answer(self, method, params):
+        if method == "trace_filter":
+            start = int(params[0]["fromBlock"], 16)
+            end = int(params[0]["toBlock"], 16)
+            sources = {a.lower() for a in params[0].get("fromAddress", ())}
+            return [
+                t
+                for b in range(start, end + 1)
+                for h, tree in self.blocks.get(b, {}).items()
+                for t in flatten(tree, h, b)
+                if t["action"]["from"] in sources
+            ]
+        if method == "debug_traceTransaction":
+            return self.traces[params[0]]
+        if method == "debug_traceBlockByNumber":
+            txs = self.blocks.get(int(params[0], 16), {})
+            return [{"txHash": h, "result": t} for h, t in txs.items()]
+        if method == "trace_block":
+            block = int(params[0], 16)
+            txs = self.blocks.get(block, {})
+            return [
+                t for h, tree in txs.items() for t in flatten(tree, h, block)
+            ]
+        if method == "eth_getBlockTransactionCountByNumber":
+            return hex(len(self.blocks.get(int(params[0], 16), {})))
+        if method == "eth_getCode":
+            return "0x" if params[0].lower() == EOA else "0x6080"
+        if method == "eth_blockNumber":
+            return hex(max(self.blocks))
+        raise ValueError(f"Unknown method {method}")
+
+    def make_request(self, method, params):
+        return {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "result": self.answer(method, params),
+        }
+
+    def make_batch_request(self, requests):
+        return [
+            {"jsonrpc": "2.0", "id": i, "result": self.answer(m, p)}
+            for i, (m, p) in enumerate(requests)
+        ]
+
+    def post(self, body):
+        """
+        Answers an encoded JSON-RPC request, as sent by the RPCClient.
+        """
+        request = json.loads(body)
+        if isinstance(request, list):
+            return [
+                {**self.make_request(r["method"], r["params"]), "id": r["id"]}
+                for r in request
+            ]
+        return {
+            **self.make_request(request["method"], request["params"]),
+            "id": request["id"],
+        }
+
+
+class TestCollectionPaths(unittest.TestCase):
+    """
+    Every collection path gives the same edges, in checksum form, as the
+    default path through the web3.py result formatters.
+    """
+
+    @patch("web3.Web3.is_connected", return_value=True)
+    def collector(self, mock_is_connected, rpc=False):
+        node = FakeNode()
+        client = None
+        if rpc:
+            if orjson is None:
+                self.skipTest("orjson not installed")
+            client = RPCClient("http://mock.ethereum.node")
+            client._post = node.post
+        collector = TraceCollector("http://mock.ethereum.node", rpc=client)
+        collector.w3 = Web3(node)
+        return collector
+
+    def collect(self, collector=None, **kwargs):
+        collector = collector or self.collector()
+        calls = collector.get_calls_from(
+            1, 3, Web3.to_checksum_address(CONTRACT), **kwargs
+        )
+        return sorted(
+            (c["from"], c["to"], c["types"], c["depth"]) for c in calls
+        )
+
+    def test_default_path_checksums(self):
+        calls = self.collect(mode="transaction")
+        self.assertEqual(
+            {(source, target) for source, target, _, _ in calls},
+            {
+                (
+                    Web3.to_checksum_address(CONTRACT),
+                    Web3.to_checksum_address(CALLEE),
+                ),
+                (
+                    Web3.to_checksum_address(CALLEE),
+                    Web3.to_checksum_address(LIBRARY),
+                ),
+                (
+                    Web3.to_checksum_address(CONTRACT),
+                    Web3.to_checksum_address(LIBRARY),
+                ),
+            },
+        )
+
+    def test_batch_matches_single(self):
+        self.assertEqual(
+            self.collect(mode="transaction", batch_size=2),
+            self.collect(mode="transaction"),
+        )
+
+    def test_block_matches_transaction(self):
+        self.assertEqual(
+            self.collect(mode="block"), self.collect(mode="transaction")
+        )
+
+    def test_scan_matches_transaction(self):
+        self.assertEqual(
+            self.collect(mode="scan"), self.collect(mode="transaction")
+        )
+
+    def test_flat_matches_transaction(self):
+        self.assertEqual(
+            self.collect(mode="flat"), self.collect(mode="transaction")
+        )
+
+    def test_addresses_validated_once(self):
+        collector = self.collector()
+        collector.code_cache = MagicMock(has_code=MagicMock(return_value=None))
+        node = collector.w3.provider
+        lookups = []
+        answer = node.answer
+
+        def count(method, params):
+            if method == "eth_getCode":
+                lookups.append(params[0])
+            return answer(method, params)
+
+        node.answer = count
+        self.collect(collector, mode="transaction")
+        # Four transactions call the callee, the contract's own code is
+        # checked first
+        self.assertEqual(
+            sorted(lookups),
+            sorted(
+                Web3.to_checksum_address(a)
+                for a in (CONTRACT, CONTRACT, CALLEE, LIBRARY)
+            ),
+        )
+
+    @patch("scsc.traces.trace_collector.PLAN_SEGMENT_SIZE", 1)
+    def test_mixed_plan_matches_single_mode(self):
+        collector = self.collector()
+        estimate = collector.estimate(1, 3, Web3.to_checksum_address(CONTRACT))
+        self.assertEqual(
+            [s["mode"] for s in estimate["segments"]],
+            ["transaction", "flat", "transaction"],
+        )
+        expected = self.collect(mode="transaction")
+        self.assertEqual(self.collect(collector, mode="plan"), expected)
+        self.assertEqual(self.collect(mode="plan", batch_size=2), expected)
+
+    def test_rpc_client_matches_web3(self):
+        expected = self.collect(mode="transaction")
+        for batch_size in (1, 2):
+            self.assertEqual(
+                self.collect(
+                    self.collector(rpc=True),
+                    mode="transaction",
+                    batch_size=batch_size,
+                ),
+                expected,
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,62 @@
+import io
+import json
+import unittest
+
+from scsc.traces.trace_stream import call_events, ijson
+
+
+@unittest.skipIf(ijson is None, "ijson not installed")
+class TestTraceStream(unittest.TestCase):
+    def events(self, response):
+        body = io.BytesIO(json.dumps(response).encode())
+        return list(call_events(ijson.parse(body)))
+
+    def test_call_events(self):
+        trace = {
+            "type": "CALL",
+            "from": "0x1",
+            "to": "0x2",
+            "input": "0x" + "00" * 1000,
+            "calls": [
+                {"type": "STATICCALL", "from": "0x2", "to": "0x3"},
+                {
+                    "type": "CALL",
+                    "from": "0x2",
+                    "to": "0x4",
+                    "error": "execution reverted",
+                    "calls": [{"type": "CALL", "from": "0x4", "to": "0x5"}],
+                },
+            ],
+        }
+        self.assertEqual(
+            self.events({"jsonrpc": "2.0", "id": 1, "result": trace}),
+            [
+                ("0x1", "0x2", "CALL"),
+                ("0x2", "0x3", "STATICCALL"),
+                None,
+                ("0x2", "0x4", "CALL"),
+                ("0x4", "0x5", "CALL"),
+                None,
+                None,
+                None,
+            ],
+        )
+
+    def test_rpc_error(self):
+        with self.assertRaises(ValueError):
+            self.events(
+                {
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "error": {"code": -32000, "message": "not found"},
+                }
+            )
+
+    def test_calls_before_fields(self):
+        trace = {"calls": [], "type": "CALL", "from": "0x1", "to": "0x2"}
+        with self.assertRaises(ValueError):
+            self.events({"jsonrpc": "2.0", "id": 1, "result": trace})
+
+
+if __name__ == "__main__":
+    unittest.main()
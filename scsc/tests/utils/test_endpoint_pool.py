@@ -0,0 +1,104 @@
+import threading
+import time
+import unittest
+
+from scsc.utils import EndpointPool
+from scsc.utils.endpoint_pool import (
+    is_transient_message,
+    is_transient_response,
+)
+
+
+def fail(index):
+    raise ConnectionError("down")
+
+
+class TestEndpointPool(unittest.TestCase):
+    def test_single_endpoint(self):
+        pool = EndpointPool(["a"])
+        self.assertEqual(pool.call(lambda i: i), 0)
+        self.assertEqual(pool.stats()[0]["requests"], 1)
+        with self.assertRaises(ValueError):
+            EndpointPool([])
+
+    def test_avoids_failing_endpoint(self):
+        pool = EndpointPool(["a", "b"], hedge_percentile=None)
+
+        for _ in range(20):
+            try:
+                pool.call(lambda i: fail(i) if i == 0 else i)
+            except ConnectionError:
+                pass
+        stats = pool.stats()
+        self.assertEqual(stats[0]["errors"], 1)
+        self.assertEqual(stats[1]["requests"], 19)
+        self.assertEqual(pool.pick(), 1)
+
+    def test_takes_out_unhealthy_endpoint(self):
+        pool = EndpointPool(["a", "b"], max_failures=2, cooldown=60)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                pool._run(0, fail, None)
+        self.assertFalse(pool.stats()[0]["healthy"])
+        self.assertEqual({pool.pick() for _ in range(10)}, {1})
+
+    def test_all_unhealthy(self):
+        pool = EndpointPool(["a", "b"], hedge_percentile=None, max_failures=1)
+        pool.endpoints[0].unhealthy_until = time.monotonic() + 20
+        pool.endpoints[1].unhealthy_until = time.monotonic() + 10
+        self.assertEqual(pool.pick(), 1)
+        self.assertIsNone(pool.pick(exclude=1))
+
+    def test_error_results(self):
+        pool = EndpointPool(["a"])
+        error = {"error": {"code": -32005, "message": "Too Many Requests"}}
+        self.assertEqual(
+            pool.call(lambda i: error, is_transient_response), error
+        )
+        self.assertEqual(pool.stats()[0]["errors"], 1)
+        self.assertFalse(is_transient_response([{"result": 1}]))
+        self.assertFalse(
+            is_transient_response({"error": {"message": "execution reverted"}})
+        )
+
+    def test_transient_statuses(self):
+        self.assertTrue(is_transient_message("503 Service Unavailable"))
+        self.assertTrue(is_transient_message("HTTP status 429"))
+        # Digits of a hash or of a block number are not a status
+        self.assertFalse(
+            is_transient_message("transaction 0xab503cd4 not found")
+        )
+        self.assertFalse(is_transient_message("header 15029 not found"))
+        self.assertTrue(
+            is_transient_response({"error": {"code": 429, "message": ""}})
+        )
+        self.assertFalse(
+            is_transient_response(
+                {"error": {"code": -32000, "message": "missing 0x4290"}}
+            )
+        )
+
+    def test_hedging(self):
+        pool = EndpointPool(["slow", "fast"], hedge_min_samples=1)
+        for e in pool.endpoints:
+            e.latencies.append(0.01)
+        release = threading.Event()
+
+        def fn(i):
+            if i == 0:
+                release.wait(1)
+                return "slow"
+            return "fast"
+
+        # Keep picking the slow endpoint first
+        pool.pick = lambda exclude=None: 1 if exclude == 0 else 0
+        self.assertEqual(pool.call(fn), "fast")
+        release.set()
+        stats = pool.stats()
+        self.assertEqual(stats[1]["hedges"], 1)
+        self.assertEqual(stats[1]["hedge_wins"], 1)
+        pool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from web3 import (
+    AsyncHTTPProvider,
+    AsyncIPCProvider,
+    HTTPProvider,
+    IPCProvider,
+    LegacyWebSocketProvider,
+    WebSocketProvider,
+)
+
+from scsc.utils import make_async_provider, make_provider
+from scsc.utils.endpoint_pool import EndpointPool
+from scsc.utils.providers import LockedWebSocketProvider, PooledProvider
+
+
+class TestProviders(unittest.TestCase):
+    def test_make_provider(self):
+        provider = make_provider("ipc:///tmp/node.ipc")
+        self.assertIsInstance(provider, IPCProvider)
+        self.assertEqual(str(provider.ipc_path), "/tmp/node.ipc")
+        self.assertIsInstance(
+            make_provider("ws://localhost:8546"), LegacyWebSocketProvider
+        )
+        self.assertIsInstance(
+            make_provider("https://localhost:8545"), HTTPProvider
+        )
+
+    def test_websocket_requests_serialized(self):
+        in_flight = 0
+        max_in_flight = 0
+        lock = threading.Lock()
+
+        def make_request(provider, method, params):
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+            return {"jsonrpc": "2.0", "id": 1, "result": method}
+
+        provider = make_provider("ws://localhost:8546")
+        self.assertIsInstance(provider, LockedWebSocketProvider)
+        with (
+            patch.object(
+                LegacyWebSocketProvider, "make_request", make_request
+            ),
+            ThreadPoolExecutor(max_workers=4) as executor,
+        ):
+            results = list(
+                executor.map(
+                    lambda i: provider.make_request(f"m{i}", []), range(8)
+                )
+            )
+        self.assertEqual(
+            [r["result"] for r in results], [f"m{i}" for i in range(8)]
+        )
+        self.assertEqual(max_in_flight, 1)
+
+    def test_http_pool_size(self):
+        provider = make_provider("http://localhost:8545", pool_size=4)
+        session = provider._request_session_manager.cache_and_return_session(
+            provider.endpoint_uri
+        )
+        adapter = session.get_adapter("http://localhost:8545")
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+    def test_make_async_provider(self):
+        self.assertIsInstance(
+            make_async_provider("ipc:///tmp/node.ipc"), AsyncIPCProvider
+        )
+        self.assertIsInstance(
+            make_async_provider("wss://localhost:8546"), WebSocketProvider
+        )
+        self.assertIsInstance(
+            make_async_provider("http://localhost:8545"), AsyncHTTPProvider
+        )
+
+    def test_pooled_provider(self):
+        provider = make_provider("http://node1:8545, ipc:///tmp/node.ipc")
+        self.assertIsInstance(provider, PooledProvider)
+        self.assertIsInstance(provider.providers[0], HTTPProvider)
+        self.assertIsInstance(provider.providers[1], IPCProvider)
+        self.assertEqual(
+            [s["url"] for s in provider.stats()],
+            ["http://node1:8545", "ipc:///tmp/node.ipc"],
+        )
+        with self.assertRaises(ValueError):
+            make_async_provider("http://node1:8545,http://node2:8545")
+
+    def test_shared_pool(self):
+        url = "http://node1:8545,http://node2:8545"
+        pool = EndpointPool(["http://node1:8545", "http://node2:8545"])
+        first = make_provider(url, pool=pool)
+        second = make_provider(url, pool=pool)
+        self.assertIsNot(first, second)
+        self.assertIs(first.pool, pool)
+        self.assertIs(second.pool, pool)
+        self.assertIsNot(make_provider(url).pool, pool)
+
+    def test_unsupported_scheme(self):
+        with self.assertRaises(ValueError):
+            make_provider("localhost:8545")
+        with self.assertRaises(ValueError):
+            make_async_provider("ftp://localhost")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,8 +18,14 @@ class Settings(BaseSettings):
     # Request Timeout
     request_timeout: int = 60 * 2  # seconds
 
+    # Transactions traced per JSON-RPC batch request (1 disables batching)
+    trace_batch_size: int = 1
+
+    # Threads fetching transaction traces per analysis
+    trace_workers: int = 1
+
     # maximum block range for analysis
-    MAX_BLOCK_RANGE: int = 7000
+    MAX_BLOCK_RANGE: int = 20000
 
     # Logging Configuration
     log_level: str = "INFO"
@@ -43,6 +49,8 @@ class Settings(BaseSettings):
             "cache_url": "CACHE_URL",
             "api_host": "API_HOST",
             "api_port": "API_PORT",
+            "trace_batch_size": "TRACE_BATCH_SIZE",
+            "trace_workers": "TRACE_WORKERS",
             "log_level": "LOG_LEVEL",
             "allium_api_key": "ALLIUM_API_KEY",
             "github_token": "GITHUB_TOKEN",
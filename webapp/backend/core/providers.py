@@ -0,0 +1,47 @@
+import threading
+from typing import Dict, List, Tuple
+
+from scsc.utils import providers
+from scsc.utils.endpoint_pool import EndpointPool
+from scsc.utils.providers import (
+    URL_SEPARATOR,
+    LockedWebSocketProvider,
+    PooledProvider,
+    split_urls,
+)
+from web3.providers import BaseProvider
+
+__all__ = [
+    "LockedWebSocketProvider",
+    "PooledProvider",
+    "endpoint_pool",
+    "make_provider",
+    "split_urls",
+]
+
+# Endpoint pool of each pooled node URL, kept for the whole process
+# since providers are created per request, so that endpoint health,
+# latencies and the hedging threads outlive a request
+_pools: Dict[Tuple[str, ...], EndpointPool] = {}
+_pools_lock = threading.Lock()
+
+
+def endpoint_pool(urls: List[str]) -> EndpointPool:
+    """
+    Returns the EndpointPool shared by every provider over urls.
+    """
+    key = tuple(urls)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = EndpointPool(urls)
+        return _pools[key]
+
+
+def make_provider(url: str, pool_size: int = 10) -> BaseProvider:
+    """
+    Returns the scsc provider for a node URL, see
+    scsc.utils.providers.make_provider. A comma separated list of URLs
+    shares the EndpointPool of that list with earlier providers.
+    """
+    pool = endpoint_pool(split_urls(url)) if URL_SEPARATOR in url else None
+    return providers.make_provider(url, pool_size, pool)
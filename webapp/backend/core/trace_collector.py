@@ -1,18 +1,55 @@
+import asyncio
 import logging
-from typing import Any, Dict, List, Set
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Set, Tuple
 
 from hexbytes import HexBytes
 from web3 import Web3
+from web3.exceptions import MethodUnavailable
+from web3.types import RPCEndpoint
+
+from core.providers import PooledProvider, make_provider
+
+# Blocks per trace_filter request, and traces per page of a request
+TRACE_FILTER_CHUNK_SIZE = 1000
+TRACE_FILTER_PAGE_SIZE = 10000
+
+# Addresses 0x00..00 to 0x00..0f are precompiles and never hold code
+PRECOMPILE_PREFIX = "0x000000000000000000000000000000000000000"
+# Addresses per eth_getCode batch request
+CODE_BATCH_SIZE = 100
+
+# Substrings of the errors of nodes not serving a method
+UNSUPPORTED_METHOD_ERRORS = (
+    "-32601",
+    "method not found",
+    "does not exist",
+    "not available",
+    "not supported",
+    "unsupported",
+)
+# Methods served by each node URL, probed once per process since a
+# collector is created per request
+_capabilities: Dict[str, Dict[str, bool]] = {}
+_capabilities_lock = threading.Lock()
 
 
 class TraceCollector:
-    def __init__(self, url: str):
+    def __init__(self, url: str, pool_size: int = 10):
         """
-        Initializes the TraceCollector with a URL and log level.
+        Initializes the TraceCollector with a node URL (http(s)://, ws(s)://
+        or ipc://, or several comma separated URLs to spread trace requests
+        over) and the number of HTTP connections kept alive.
         """
         self.logger = logging.getLogger(self.__class__.__name__)
 
-        self.w3 = Web3(Web3.HTTPProvider(url))
+        self.url = url
+        self.w3 = Web3(make_provider(url, pool_size))
+        # Transactions that could not be traced, their calls are missing
+        self.failed_txs: Set[str] = set()
+        # Blocks that could not be traced on nodes without trace_filter
+        self.failed_blocks: Set[int] = set()
         if not self.w3.is_connected():
             raise ConnectionError("Failed to connect to the Ethereum node.")
         self.logger.info("Connected to the Ethereum node.")
@@ -25,7 +62,7 @@ class TraceCollector:
         Validates contract address and checks if it's different from x0
         """
         try:
-            if address.startswith("0x000000000000000000000000000000000000000"):
+            if address.startswith(PRECOMPILE_PREFIX):
                 self.logger.error(f"Address is a precompile address: {address}")
                 return False
             address = Web3.to_checksum_address(address)
@@ -46,40 +83,161 @@ class TraceCollector:
             self.logger.error(f"Error validating contract: {e}")
             return False
 
-    def _filter_txs_from(
-        self, from_block: str, to_block: str, contract_address: str
-    ) -> Set[str]:
+    def _trace_filter_range(
+        self, start: int, end: int, contract_address: str
+    ) -> List[Dict[str, Any]]:
         """
-        Filters transactions from a given block range and contract address.
+        Gets the call traces of a contract in a block range, one page of
+        TRACE_FILTER_PAGE_SIZE traces at a time. The range is bisected
+        when the node fails to answer it.
+        """
+        traces = []
+        after = 0
+        while True:
+            filter_params = {
+                "fromBlock": hex(start),
+                "toBlock": hex(end),
+                "fromAddress": [contract_address],
+                "after": after,
+                "count": TRACE_FILTER_PAGE_SIZE,
+            }
+            try:
+                page = self.w3.tracing.trace_filter(filter_params) or []
+            except Exception as e:
+                if start == end:
+                    self.logger.error(f"Error filtering transactions: {e}")
+                    raise RuntimeError(f"trace_filter failed for block {start}.") from e
+                mid = (start + end) // 2
+                self.logger.warning(
+                    f"trace_filter failed for blocks {start}-{end}, splitting at {mid}: {e}"
+                )
+                # Pages fetched so far are covered again by the halves
+                return self._trace_filter_range(
+                    start, mid, contract_address
+                ) + self._trace_filter_range(mid + 1, end, contract_address)
+            traces.extend(r for r in page if r["type"] == "call")
+            if len(page) < TRACE_FILTER_PAGE_SIZE:
+                return traces
+            after += TRACE_FILTER_PAGE_SIZE
+
+    def _filter_blocks_from(
+        self,
+        from_block: str,
+        to_block: str,
+        contract_address: str,
+        max_workers: int = 1,
+    ) -> Dict[int, Set[str]]:
+        """
+        Filters transactions from a given block range and contract address,
+        grouped by block number.
+        The range is fetched in chunks of TRACE_FILTER_CHUNK_SIZE blocks,
+        in a thread pool when max_workers is above 1.
         """
         self.logger.info(
             f"Filtering transactions from block {from_block} \
               to {to_block} for contract {contract_address}."
         )
-        filter_params = {
-            "fromBlock": from_block,
-            "toBlock": to_block,
-            "fromAddress": [contract_address],
-        }
+        start = int(from_block, 16)
+        end = int(to_block, 16)
+        chunks = [
+            (i, min(i + TRACE_FILTER_CHUNK_SIZE - 1, end))
+            for i in range(start, end + 1, TRACE_FILTER_CHUNK_SIZE)
+        ]
+        blocks = {}
+        for res in self._map_ordered(
+            lambda c: self._trace_filter_range(*c, contract_address),
+            chunks,
+            max_workers,
+        ):
+            for r in res:
+                blocks.setdefault(r["blockNumber"], set()).add(self._tx_hash(r))
+        self.logger.info(
+            f"Found {sum(len(txs) for txs in blocks.values())} transactions."
+        )
+        return blocks
+
+    @staticmethod
+    def _tx_hash(trace: Dict[str, Any]) -> str:
+        """
+        Returns the transaction hash of a trace as a hex string.
+        """
+        tx_hash = trace["transactionHash"]
+        return tx_hash.to_0x_hex() if type(tx_hash) is HexBytes else tx_hash
+
+    def _serves(self, method: str, params: List[Any]) -> bool:
+        """
+        Returns whether the node serves a method, sending it params.
+        Errors other than an unknown method still show that it is served.
+        """
         try:
-            res = self.w3.tracing.trace_filter(filter_params)
+            self.w3.manager.request_blocking(RPCEndpoint(method), params)
+        except MethodUnavailable:
+            return False
         except Exception as e:
-            self.logger.error(f"Error filtering transactions: {e}")
-            return set()
-
-        if res is None:
-            return set()
-        tx_hashes = {
-            (
-                r["transactionHash"].to_0x_hex()
-                if type(r["transactionHash"]) is HexBytes
-                else r["transactionHash"]
+            message = str(e).lower()
+            return not any(m in message for m in UNSUPPORTED_METHOD_ERRORS)
+        return True
+
+    def capabilities(self) -> Dict[str, bool]:
+        """
+        Returns whether the node serves trace_filter and
+        debug_traceBlockByNumber, probed on the genesis block the first
+        time only.
+        """
+        with _capabilities_lock:
+            if self.url not in _capabilities:
+                _capabilities[self.url] = {
+                    "trace_filter": self._serves(
+                        "trace_filter",
+                        [{"fromBlock": "0x0", "toBlock": "0x0", "count": 1}],
+                    ),
+                    "debug_traceBlockByNumber": self._serves(
+                        "debug_traceBlockByNumber",
+                        ["0x0", {"tracer": "callTracer"}],
+                    ),
+                }
+                self.logger.info(f"Node capabilities: {_capabilities[self.url]}")
+            return _capabilities[self.url]
+
+    def _scan_block(
+        self, block: int, contract_address: str
+    ) -> Tuple[int, Dict[Tuple[str, str], Dict[str, Any]]]:
+        """
+        Traces every transaction of a block with debug_traceBlockByNumber,
+        for nodes without trace_filter. Returns the number of transactions
+        calling the contract and their calls.
+        """
+        self.logger.info(f"Scanning block {block}.")
+        try:
+            traces = self.w3.manager.request_blocking(
+                RPCEndpoint("debug_traceBlockByNumber"),
+                [hex(block), {"tracer": "callTracer"}],
             )
-            for r in res
-            if r["type"] == "call"
-        }
-        self.logger.info(f"Found {len(tx_hashes)} transactions.")
-        return tx_hashes
+        except Exception as e:
+            self.logger.error(f"Error tracing block {block}: {e}")
+            self.failed_blocks.add(block)
+            return 0, {}
+        matching = 0
+        calls = {}
+        for t in traces:
+            res = t.get("result")
+            if not res:
+                self.failed_txs.add(t["txHash"])
+                continue
+            tx_calls = {}
+            self._extract_calls(res, contract_address, tx_calls)
+            if not tx_calls:
+                continue
+            matching += 1
+            for key, edge in tx_calls.items():
+                total = calls.get(key)
+                if total is None:
+                    calls[key] = edge
+                    continue
+                total["depth"] = min(total["depth"], edge["depth"])
+                for call_type, count in edge["types"].items():
+                    total["types"][call_type] = total["types"].get(call_type, 0) + count
+        return matching, calls
 
     def _get_calls_from_tx(self, tx_hash: str) -> Dict[str, Any]:
         """
@@ -92,75 +250,279 @@ class TraceCollector:
             )
         except Exception as e:
             self.logger.error(f"Error tracing transaction {tx_hash}: {e}")
+            self.failed_txs.add(tx_hash)
             return {}
         return res
 
+    def _make_batch_request(self, requests: List[Tuple[str, List[Any]]]) -> List[Any]:
+        """
+        Sends requests as a single JSON-RPC batch request.
+        Returns the result of each request in order, None for failed items.
+        """
+        try:
+            responses = self.w3.provider.make_batch_request(requests)
+        except Exception as e:
+            self.logger.error(f"Error in batch request: {e}")
+            return [None] * len(requests)
+        if not isinstance(responses, list):
+            # The node rejected the batch as a whole
+            self.logger.error(f"Error in batch request: {responses.get('error')}")
+            return [None] * len(requests)
+        if len(responses) != len(requests):
+            self.logger.error(
+                f"Batch returned {len(responses)} responses "
+                f"for {len(requests)} requests."
+            )
+            return [None] * len(requests)
+
+        # Responses are sorted by their request id, which follows the
+        # order in which the requests were encoded.
+        results = []
+        for (method, params), r in zip(requests, responses, strict=True):
+            if r.get("error") or not r.get("result"):
+                self.logger.error(f"Error in {method} {params[0]}: {r.get('error')}")
+                results.append(None)
+            else:
+                results.append(r["result"])
+        return results
+
+    def _trace_batch(self, tx_hashes: List[str]) -> Dict[str, Any]:
+        """
+        Traces transactions in a single JSON-RPC batch request.
+        Returns the traces keyed by transaction hash, failed items are omitted.
+        """
+        results = self._make_batch_request(
+            [
+                ("debug_traceTransaction", [h, {"tracer": "callTracer"}])
+                for h in tx_hashes
+            ]
+        )
+        return {
+            h: res
+            for h, res in zip(tx_hashes, results, strict=True)
+            if res is not None
+        }
+
+    def _get_calls_from_txs(
+        self, tx_hashes: List[str], max_retries: int = 2
+    ) -> Dict[str, Any]:
+        """
+        Gets calls from a batch of transaction hashes, retrying only
+        the items that failed.
+        """
+        self.logger.info(f"Tracing batch of {len(tx_hashes)} transactions.")
+        traces = {}
+        pending = tx_hashes
+        for attempt in range(max_retries + 1):
+            if attempt > 0:
+                self.logger.info(
+                    f"Retrying {len(pending)} transactions (attempt {attempt}/{max_retries})."
+                )
+            traces.update(self._trace_batch(pending))
+            pending = [h for h in pending if h not in traces]
+            if not pending:
+                break
+        for h in pending:
+            self.logger.error(f"Giving up on transaction {h}.")
+        self.failed_txs.update(pending)
+        return traces
+
     def _extract_all_subcalls(
-        self, call: Dict[str, Any], calls: List[Dict[str, str]], caller: str, depth: int = 0
+        self, call: Dict[str, Any], calls: Dict[Tuple[str, str], Dict[str, Any]]
     ) -> None:
         """
-        Recursively extracts all subcalls from a call.
+        Extracts all subcalls below a call, walking the tree with an explicit
+        stack so that deep traces do not hit the recursion limit.
         """
-        depth += 1
-        key = (caller, call["to"])
-        if key not in calls:
-            calls[key] = {"source": caller, "target": call["to"], "types": {}, "depth": depth }
-        if call["type"] not in calls[key]["types"]:
-            calls[key]["types"][call["type"]] = 0
-        calls[key]["types"][call["type"]] += 1
-        calls[key]["depth"] = min(calls[key]["depth"], depth)
-
-        for subcall in call.get("calls", []):
-            self._extract_all_subcalls(subcall, calls, call["to"], depth)
+        # (subcall, caller, depth)
+        stack = [(subcall, call["to"], 1) for subcall in reversed(call.get("calls", []))]
+        while stack:
+            subcall, caller, depth = stack.pop()
+            key = (caller, subcall["to"])
+            edge = calls.get(key)
+            if edge is None:
+                edge = calls[key] = {"source": caller, "target": subcall["to"], "types": {}, "depth": depth}
+            elif depth < edge["depth"]:
+                edge["depth"] = depth
+            types = edge["types"]
+            types[subcall["type"]] = types.get(subcall["type"], 0) + 1
+            for child in reversed(subcall.get("calls", [])):
+                stack.append((child, subcall["to"], depth + 1))
 
     def _extract_calls(
         self,
         call: Dict[str, Any],
         contract_address: str,
-        calls: List[Dict[str, str]],
+        calls: Dict[Tuple[str, str], Dict[str, Any]],
     ) -> None:
         """
-        Extracts calls from a call and its subcalls.
+        Extracts the subcalls of every call to the contract address.
+        """
+        contract_address = contract_address.lower()
+        stack = [call]
+        while stack:
+            call = stack.pop()
+            if call["to"].lower() == contract_address:
+                self._extract_all_subcalls(call, calls)
+            else:
+                stack.extend(reversed(call.get("calls", [])))
+
+    def _map_ordered(
+        self, fetch: Callable[[Any], Any], jobs: List[Any], max_workers: int
+    ) -> Iterator[Any]:
         """
-        if call["to"].lower() == contract_address.lower():
-            for subcall in call.get("calls", []):
-                self._extract_all_subcalls(subcall, calls, call["to"], 0)
+        Yields fetch(job) for each job in order, fetching in a thread pool
+        when max_workers is above 1.
+        """
+        if max_workers > 1:
+            # map() hands results back in submission order, whichever
+            # request finishes first
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                yield from executor.map(fetch, jobs)
         else:
-            for subcall in call.get("calls", []):
-                self._extract_calls(subcall, contract_address, calls)
+            for job in jobs:
+                yield fetch(job)
+
+    def _trace_txs(
+        self, tx_hashes: List[str], batch_size: int, max_workers: int
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the trace of each transaction in the order of tx_hashes,
+        or an empty dict for transactions that could not be traced.
+        """
+        if batch_size > 1:
+            jobs = [
+                tx_hashes[i:i + batch_size]
+                for i in range(0, len(tx_hashes), batch_size)
+            ]
+
+            def fetch(batch: List[str]) -> List[Dict[str, Any]]:
+                traces = self._get_calls_from_txs(batch)
+                return [traces.get(h, {}) for h in batch]
+        else:
+            jobs = [[h] for h in tx_hashes]
+
+            def fetch(batch: List[str]) -> List[Dict[str, Any]]:
+                return [self._get_calls_from_tx(batch[0])]
+
+        for traces in self._map_ordered(fetch, jobs, max_workers):
+            yield from traces
 
     def get_calls(
-        self, tx_hashes: Set[str], contract_address: str
+        self,
+        tx_hashes: Set[str],
+        contract_address: str,
+        batch_size: int = 1,
+        max_workers: int = 1,
     ) -> List[Dict[str, str]]:
         """
         Gets calls for a given set of transaction hashes and contract address.
+        With a batch_size above 1, transactions are traced in JSON-RPC
+        batches of that size instead of one request per transaction.
+        With max_workers above 1, traces are fetched in a thread pool while
+        the calling thread extracts them in transaction hash order.
         """
         self.logger.info(f"Getting calls for contract {contract_address}.")
         calls = {}
-        for h in tx_hashes:
-            res = self._get_calls_from_tx(h)
+        for res in self._trace_txs(sorted(tx_hashes), batch_size, max_workers):
             if res:
                 self._extract_calls(res, contract_address, calls)
         self.logger.info(f"Extracted {len(calls)} calls.")
         return calls.values()
 
+    def _validate_contracts(self, addresses: Set[str], block: str) -> Set[str]:
+        """
+        Returns the addresses holding contract code at block. Precompiles
+        are ruled out without I/O and the rest are looked up in JSON-RPC
+        batches of eth_getCode, falling back to _validate_contract for
+        failed items.
+        """
+        contracts = set()
+        lookups = []
+        unresolved = []
+        for address in sorted(addresses):
+            if address.startswith(PRECOMPILE_PREFIX):
+                continue
+            if Web3.is_address(address):
+                lookups.append(address)
+            else:
+                unresolved.append(address)
+
+        self.logger.info(f"Validating {len(lookups)} of {len(addresses)} addresses.")
+        for i in range(0, len(lookups), CODE_BATCH_SIZE):
+            batch = lookups[i:i + CODE_BATCH_SIZE]
+            results = self._make_batch_request(
+                [
+                    ("eth_getCode", [Web3.to_checksum_address(a), block])
+                    for a in batch
+                ]
+            )
+            for address, code in zip(batch, results, strict=True):
+                if code is None:
+                    unresolved.append(address)
+                elif code[2:] and code[2:] != self.x0_bytecode:
+                    contracts.add(address)
+
+        for address in unresolved:
+            if self._validate_contract(address, block):
+                contracts.add(address)
+        return contracts
+
     def _filter_contract_calls(
-        self, calls: List[Dict[str, str]], to_block
+        self,
+        calls: List[Dict[str, str]],
+        to_block,
+        validated: Dict[str, bool] | None = None,
     ) -> List[Dict[str, str]]:
         """
-        Filters calls to contract addresses.
+        Filters calls to contract addresses. Targets in validated, a memo of
+        the addresses already checked at to_block, are not looked up again and
+        the others are added to it, so that filtering the edges of each
+        transaction of a range sends one eth_getCode per unique address.
         """
-        return [
-            c
-            for c in calls
-            if self._validate_contract(c["target"], to_block)
-        ]
+        if validated is None:
+            validated = {}
+        unknown = {c["target"] for c in calls} - validated.keys()
+        if unknown:
+            contracts = self._validate_contracts(unknown, to_block)
+            validated.update((a, a in contracts) for a in unknown)
+        return [c for c in calls if validated[c["target"]]]
 
-    def get_calls_from(
-        self, from_block: str | int, to_block: str | int, contract_address: str
-    ) -> List[Dict[str, str]]:
+    def endpoint_stats(self) -> List[Dict[str, Any]]:
+        """
+        Returns the per-endpoint stats of a pooled node URL, empty for a
+        single endpoint.
         """
-        Gets calls from a given block range and contract address.
+        if isinstance(self.w3.provider, PooledProvider):
+            return self.w3.provider.stats()
+        return []
+
+    def iter_calls(
+        self,
+        from_block: str | int,
+        to_block: str | int,
+        contract_address: str,
+        batch_size: int = 1,
+        max_workers: int = 1,
+        cancel: threading.Event | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Collects calls from a given block range and contract address,
+        yielding records as the traces are processed:
+        - {"kind": "edges", "block": ..., "edges": [...]}, the edges of a
+          traced transaction
+        - {"kind": "progress", "blocks_done": ..., "blocks_total": ...,
+          "txs_traced": ..., "txs_total": ..., "rpc_errors": ...}, after
+          the matching transactions are found and after each traced
+          transaction. blocks_done counts the blocks before the one being
+          traced, and rpc_errors the transactions, and scanned blocks, that
+          could not be traced.
+        The collection stops once cancel is set or when the caller stops
+        iterating.
+        On nodes without trace_filter, such as Geth, every block of the
+        range is traced instead, see _scan_block: edges are then yielded
+        per block, txs_total is None and txs_traced counts the matching
+        transactions found so far.
         """
         self.logger.info(
             f"Getting calls from block {from_block} \
@@ -172,26 +534,144 @@ class TraceCollector:
         if not self._validate_contract(contract_address, to_block_hex):
             raise ValueError("Invalid contract address or bytecode.")
         contract_address = Web3.to_checksum_address(contract_address)
-        tx_hashes = self._filter_txs_from(
-            from_block_hex, to_block_hex, contract_address
-        )
-        calls = self.get_calls(tx_hashes, contract_address)
-        filtered_calls = self._filter_contract_calls(calls, to_block_hex)
-        
-        edges = filtered_calls
+        start = int(from_block_hex, 16)
+        end = int(to_block_hex, 16)
+        scan = not self.capabilities()["trace_filter"]
+        if scan:
+            self.logger.info("trace_filter is not served, scanning blocks instead.")
+            txs = []
+        else:
+            blocks = self._filter_blocks_from(
+                from_block_hex, to_block_hex, contract_address, max_workers
+            )
+            txs = [(b, h) for b in sorted(blocks) for h in sorted(blocks[b])]
+
+        failed_before = len(self.failed_txs) + len(self.failed_blocks)
+        # Targets checked for code at to_block, across records
+        validated: Dict[str, bool] = {}
+        progress = {
+            "kind": "progress",
+            "blocks_done": 0,
+            "blocks_total": end - start + 1,
+            "txs_traced": 0,
+            "txs_total": None if scan else len(txs),
+            "rpc_errors": 0,
+        }
+        yield dict(progress)
+        if scan:
+            scanned = self._map_ordered(
+                lambda b: self._scan_block(b, contract_address),
+                range(start, end + 1),
+                max_workers,
+            )
+            for block, (matching, calls) in enumerate(scanned, start):
+                if cancel is not None and cancel.is_set():
+                    self.logger.info("Collection cancelled.")
+                    return
+                edges = self._filter_contract_calls(
+                    list(calls.values()), to_block_hex, validated
+                )
+                if edges:
+                    yield {"kind": "edges", "block": block, "edges": edges}
+                progress["blocks_done"] = block - start
+                progress["txs_traced"] += matching
+                progress["rpc_errors"] = (
+                    len(self.failed_txs) + len(self.failed_blocks) - failed_before
+                )
+                yield dict(progress)
+            progress["blocks_done"] = progress["blocks_total"]
+            yield dict(progress)
+            return
+
+        traces = self._trace_txs([h for _, h in txs], batch_size, max_workers)
+        for (block, _), res in zip(txs, traces, strict=True):
+            if cancel is not None and cancel.is_set():
+                self.logger.info("Collection cancelled.")
+                return
+            calls = {}
+            if res:
+                self._extract_calls(res, contract_address, calls)
+            edges = self._filter_contract_calls(
+                list(calls.values()), to_block_hex, validated
+            )
+            if edges:
+                yield {"kind": "edges", "block": block, "edges": edges}
+            progress["blocks_done"] = block - start
+            progress["txs_traced"] += 1
+            progress["rpc_errors"] = (
+                len(self.failed_txs) + len(self.failed_blocks) - failed_before
+            )
+            yield dict(progress)
+        progress["blocks_done"] = progress["blocks_total"]
+        yield dict(progress)
+
+    async def aiter_calls(self, *args: Any, **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Asynchronous counterpart of iter_calls, taking the same arguments,
+        which runs the collection in a worker thread. Cancelling the
+        consuming task, or leaving the loop, cancels the collection.
+        """
+        cancel = kwargs.pop("cancel", None) or threading.Event()
+        records = self.iter_calls(*args, cancel=cancel, **kwargs)
+        done = object()
+        try:
+            while True:
+                record = await asyncio.to_thread(next, records, done)
+                if record is done:
+                    return
+                yield record
+        finally:
+            cancel.set()
+            try:
+                records.close()
+            except ValueError:
+                # Still running in its thread, it stops at the next transaction
+                pass
+
+    def get_calls_from(
+        self,
+        from_block: str | int,
+        to_block: str | int,
+        contract_address: str,
+        batch_size: int = 1,
+        max_workers: int = 1,
+    ) -> Dict[str, Any]:
+        """
+        Gets calls from a given block range and contract address,
+        aggregating the edges yielded by iter_calls.
+        """
+        calls: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for record in self.iter_calls(
+            from_block, to_block, contract_address, batch_size, max_workers
+        ):
+            if record["kind"] == "progress":
+                progress = record
+                continue
+            for edge in record["edges"]:
+                key = (edge["source"], edge["target"])
+                total = calls.get(key)
+                if total is None:
+                    calls[key] = {**edge, "types": dict(edge["types"])}
+                    continue
+                total["depth"] = min(total["depth"], edge["depth"])
+                for call_type, count in edge["types"].items():
+                    total["types"][call_type] = total["types"].get(call_type, 0) + count
+
+        edges = list(calls.values())
         nodes: Set[str] = set()
         for edge in edges:
             nodes.add(edge["source"])
             nodes.add(edge["target"])
-        
+
         return {
-            "contract_address": contract_address,
-            "from_block": int(from_block_hex, 16),
-            "to_block": int(to_block_hex, 16),
+            "contract_address": Web3.to_checksum_address(contract_address),
+            "from_block": int(self.validate_and_convert_block(from_block), 16),
+            "to_block": int(self.validate_and_convert_block(to_block), 16),
             "n_nodes": len(nodes),
             "nodes": list(nodes),
             "edges": edges,
-            "n_matching_transactions": len(tx_hashes),
+            "n_matching_transactions": progress["txs_traced"],
+            "n_failed_transactions": len(self.failed_txs),
         }
 
     def get_network(
@@ -200,6 +680,8 @@ class TraceCollector:
         from_block: str | int | None,
         to_block: str | int | None,
         blocks: int = 10,
+        batch_size: int = 1,
+        max_workers: int = 1,
     ) -> dict:
         """
         Collects calls from the last 10 blocks and returns the call graph in JSON format.
@@ -210,7 +692,7 @@ class TraceCollector:
             from_block = latest_block - blocks
             to_block = latest_block
 
-        res =self.get_calls_from(from_block, to_block, contract_address)
+        res =self.get_calls_from(from_block, to_block, contract_address, batch_size, max_workers)
         return res
     
     def validate_and_convert_block(self, block: str) -> str:
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Query, status, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from loguru import logger
 from fastapi_cache.decorator import cache
@@ -15,6 +16,7 @@ from schemas.response import ErrorResponse
 from services.analysis_service import (
     analyze_contract_dependencies,
     calculate_contract_risk,
+    stream_contract_calls,
 )
 
 router = APIRouter(
@@ -71,11 +73,47 @@ async def get_contract_dependencies(
         to_block=network["to_block"],
         n_nodes=network["n_nodes"],
         n_matching_transactions=network["n_matching_transactions"],
+        n_failed_transactions=network.get("n_failed_transactions", 0),
         nodes=network["nodes"],
         edges=network["edges"],
     )
 
 
+@router.get(
+    "/{address}/dependencies/stream",
+    responses={
+        422: {
+            "description": "Input validation error",
+            "model": ErrorResponse,
+        },
+    },
+    status_code=status.HTTP_200_OK,
+    summary="Stream contract dependencies",
+    description="Stream the call edges and progress of a contract analysis as NDJSON.",
+)
+async def stream_contract_dependencies(
+    address: str,
+    from_block: str = Query(None, description="Start block"),
+    to_block: str = Query(None, description="End block"),
+):
+    """
+    Stream the dependency network for a contract, one JSON record per line:
+    edge increments as transactions are traced, and progress records.
+    Disconnecting stops the analysis.
+
+    - **address**: Ethereum contract address
+    - **from_block**: Optional start block for analysis
+    - **to_block**: Optional end block for analysis
+    """
+    request = ContractDependenciesRequest(
+        address=address, from_block=from_block, to_block=to_block
+    )
+    return StreamingResponse(
+        stream_contract_calls(request.address, request.from_block, request.to_block),
+        media_type="application/x-ndjson",
+    )
+
+
 @router.get(
     "/{address}/risk",
     response_model=ContractRiskResponse,
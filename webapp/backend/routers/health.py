@@ -3,6 +3,7 @@ from loguru import logger
 from web3 import Web3
 
 from core.config import settings
+from core.providers import PooledProvider, make_provider
 
 router = APIRouter(
     prefix="/health",
@@ -34,12 +35,19 @@ async def eth_node_health_check():
     Check if the Ethereum node connection is working.
     """
     try:
-        w3 = Web3(Web3.HTTPProvider(settings.eth_node_url))
-        connected = w3.is_connected()
-        return {
+        provider = make_provider(settings.eth_node_url)
+        connected = Web3(provider).is_connected()
+        response = {
             "status": "healthy",
             "eth_node": "connected" if connected else "disconnected",
         }
+        if isinstance(provider, PooledProvider):
+            # Report each endpoint of a pooled node URL
+            response["endpoints"] = {
+                stats["url"]: "connected" if p.is_connected() else "disconnected"
+                for stats, p in zip(provider.stats(), provider.providers)
+            }
+        return response
     except Exception as e:
         logger.error(f"Ethereum node health check failed: {e}")
         return {
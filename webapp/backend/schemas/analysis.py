@@ -28,6 +28,10 @@ class ContractDependenciesResponse(BaseModel):
     to_block: int
     n_nodes: int
     n_matching_transactions: int
+    n_failed_transactions: int = Field(
+        0,
+        description="Matching transactions that could not be traced, their calls are missing from the graph",
+    )
     nodes: Dict[str, str]
     edges: List[Edge] = Field(
         ...,
@@ -1,5 +1,6 @@
-from typing import Any, Dict, Optional, List
+from typing import Any, AsyncIterator, Dict, Optional, List
 
+import json
 import secrets
 from datetime import datetime
 
@@ -42,8 +43,19 @@ def analyze_contract_dependencies(
         logger.info(f"Analyzing contract {address}")
 
         _validate_block_range(from_block, to_block)
-        collector = TraceCollector(settings.eth_node_url)
-        network = collector.get_network(address, from_block, to_block)
+        # One pooled connection per worker thread
+        collector = TraceCollector(
+            settings.eth_node_url, pool_size=max(settings.trace_workers, 1)
+        )
+        network = collector.get_network(
+            address,
+            from_block,
+            to_block,
+            batch_size=settings.trace_batch_size,
+            max_workers=settings.trace_workers,
+        )
+        for stats in collector.endpoint_stats():
+            logger.info(f"Endpoint stats: {stats}")
         network["nodes"] = _process_node_labels(session, network)
         network["edges"] = assess_edge_risk(network.get("edges", []))
         logger.info(f"Analysis completed for {address}")
@@ -56,6 +68,51 @@ def analyze_contract_dependencies(
         logger.error(f"Internal server error: {e}")
         raise InternalServerError(f"Failed to analyze contract: {str(e)}") from e
 
+def stream_contract_calls(
+    address: str,
+    from_block: Optional[str] = None,
+    to_block: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream the edges and progress of a contract analysis as NDJSON lines,
+    see TraceCollector.iter_calls for the records. The collection is
+    cancelled when the client disconnects.
+
+    Raises:
+        InputValidationError: If the block range is invalid
+    """
+    try:
+        _validate_block_range(from_block, to_block)
+    except ValueError as e:
+        raise InputValidationError(str(e)) from e
+
+    collector = TraceCollector(
+        settings.eth_node_url, pool_size=max(settings.trace_workers, 1)
+    )
+    if from_block is None and to_block is None:
+        # Same default range as TraceCollector.get_network
+        to_block = collector.w3.eth.block_number
+        from_block = to_block - 10
+    return _ndjson_calls(collector, address, from_block, to_block)
+
+
+async def _ndjson_calls(
+    collector: TraceCollector, address: str, from_block: Any, to_block: Any
+) -> AsyncIterator[str]:
+    try:
+        async for record in collector.aiter_calls(
+            from_block,
+            to_block,
+            address,
+            batch_size=settings.trace_batch_size,
+            max_workers=settings.trace_workers,
+        ):
+            yield json.dumps(record) + "\n"
+    except Exception as e:
+        # The response status is already sent, report the error in the stream
+        logger.error(f"Stream contract calls: {e}")
+        yield json.dumps({"kind": "error", "message": str(e)}) + "\n"
+
 def _validate_block_range(from_block: Optional[str], to_block: Optional[str]) -> None:
     """Validate the block range if provided."""
     if to_block is not None and from_block is not None:
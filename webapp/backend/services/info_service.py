@@ -9,6 +9,7 @@ import subprocess
 from sqlmodel import Session
 
 from core.config import settings
+from core.providers import make_provider
 from core.exceptions import InternalServerError, NotFoundError, InputValidationError
 from core.metadata import get_deployment
 from core.proxy import detect_delegatecall_and_address
@@ -27,7 +28,7 @@ def get_latest_block_number() -> int:
         Latest block number
     """
     try:
-        w3 = Web3(Web3.HTTPProvider(settings.eth_node_url))
+        w3 = Web3(make_provider(settings.eth_node_url))
         latest_block = w3.eth.get_block_number()
         return latest_block
     except Exception as e:
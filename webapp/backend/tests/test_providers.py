@@ -0,0 +1,32 @@
+import unittest
+
+from core.providers import (
+    LockedWebSocketProvider,
+    PooledProvider,
+    make_provider,
+)
+
+
+class TestMakeProvider(unittest.TestCase):
+    def test_pool_shared_across_requests(self):
+        first = make_provider("http://a:8545,http://b:8545")
+        second = make_provider("http://a:8545, http://b:8545")
+        self.assertIsInstance(first, PooledProvider)
+        self.assertIsNot(first, second)
+        # Endpoint health outlives the provider of a request
+        self.assertIs(first.pool, second.pool)
+
+    def test_pool_per_url_set(self):
+        first = make_provider("http://a:8545,http://b:8545")
+        other = make_provider("http://a:8545,http://c:8545")
+        self.assertIsNot(first.pool, other.pool)
+
+    def test_websocket_provider_locked(self):
+        # Providers are shared by the worker threads of a request
+        self.assertIsInstance(
+            make_provider("ws://localhost:8546"), LockedWebSocketProvider
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
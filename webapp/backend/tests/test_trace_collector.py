@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from core.trace_collector import TraceCollector
+
+CONTRACT = "0x" + "c" * 40
+PROXY = "0x" + "9" * 40
+ROUTER = "0x" + "8" * 40
+X = "0x" + "1" * 40
+Y = "0x" + "2" * 40
+
+
+def call(source, target, call_type="CALL", calls=()):
+    frame = {"from": source, "to": target, "type": call_type}
+    if calls:
+        frame["calls"] = list(calls)
+    return frame
+
+
+class TestExtractCalls(unittest.TestCase):
+    @patch("web3.Web3.is_connected", return_value=True)
+    def setUp(self, mock_is_connected):
+        self.collector = TraceCollector("http://mock.ethereum.node")
+
+    def extract(self, trace):
+        calls = {}
+        self.collector._extract_calls(trace, CONTRACT, calls)
+        return {
+            (c["source"], c["target"]): (c["types"], c["depth"])
+            for c in calls.values()
+        }
+
+    def test_delegatecall_entry(self):
+        # The proxy runs the contract's code, its calls count as the contract's
+        trace = call(
+            "0xe",
+            ROUTER,
+            calls=[
+                call(X, Y),
+                call(ROUTER, CONTRACT, calls=[call(CONTRACT, X)]),
+                call(
+                    ROUTER,
+                    PROXY,
+                    calls=[
+                        call(
+                            PROXY,
+                            CONTRACT,
+                            "DELEGATECALL",
+                            calls=[call(PROXY, Y)],
+                        )
+                    ],
+                ),
+            ],
+        )
+        self.assertEqual(
+            self.extract(trace),
+            {(CONTRACT, X): ({"CALL": 1}, 1), (CONTRACT, Y): ({"CALL": 1}, 1)},
+        )
+
+    def test_filter_blocks_from(self):
+        traces = [
+            {
+                "action": {"from": CONTRACT, "to": X, "callType": "call"},
+                "blockNumber": 5,
+                "traceAddress": [0, 0],
+                "transactionHash": "0x1",
+                "type": "call",
+            },
+            {
+                "action": {"from": CONTRACT, "to": Y, "callType": "call"},
+                "blockNumber": 5,
+                "traceAddress": [0, 1],
+                "transactionHash": "0x1",
+                "type": "call",
+            },
+        ]
+        self.collector.w3 = MagicMock()
+        trace_filter = self.collector.w3.tracing.trace_filter
+        trace_filter.return_value = traces
+        blocks = self.collector._filter_blocks_from("0x5", "0x6", CONTRACT)
+        self.assertEqual(blocks, {5: {"0x1"}})
+        # Only the calls made by the contract are filtered
+        trace_filter.assert_called_once()
+        self.assertEqual(
+            trace_filter.call_args.args[0]["fromAddress"], [CONTRACT]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -170,8 +170,8 @@ export function validateBlockRange(
         return { valid: false, reason: "Range check: From block must be less than to block." };
     }
     const blockRange = Number(toBlock) - Number(fromBlock);
-    if (blockRange > 7000) {
-        return { valid: false, reason: "Block range is larger than 7000, please select a smaller range." };
+    if (blockRange > 20000) {
+        return { valid: false, reason: "Block range is larger than 20000, please select a smaller range." };
     }
     return { valid: true };
 }
\ No newline at end of file